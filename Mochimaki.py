@@ -2,9 +2,11 @@ import flet as ft
 from utils import (
     on_container_dialog_result,
     refresh_container_status,
+    on_update_dockerfiles_click,
     initialize_mermaid_container,
     on_system_graph_button_click
 )
+from utils.update_scheduler import request_update
 
 # グローバル変数の宣言
 global docker_compose_dir
@@ -42,7 +44,7 @@ def main(page: ft.Page):
     def on_resized(e):  # on_resizeの代わりにon_resizedを使用
         # ウィンドウサイズが変更されたときにコンテナの高さを更新
         scrollable_container.height = get_container_height()
-        page.update()
+        request_update(page)
 
     # ウィンドウサイズ変更イベントのハンドラを設定
     page.on_resized = on_resized  # on_resizeの代わりにon_resizedを使用
@@ -70,6 +72,12 @@ def main(page: ft.Page):
         on_click=lambda _: refresh_container_status(page, container_list)
     )
 
+    update_dockerfiles_button = ft.ElevatedButton(
+        "Dockerfileを更新",
+        icon=ft.Icons.SYNC,
+        on_click=lambda _: on_update_dockerfiles_click(page)
+    )
+
     system_graph_button = ft.ElevatedButton(
         "システムグラフを表示",
         icon=ft.Icons.ACCOUNT_TREE,
@@ -78,7 +86,7 @@ def main(page: ft.Page):
 
     # ボタンを横に並べるためのRowを作成
     buttons_row = ft.Row(
-        [select_container_button, refresh_button, system_graph_button],
+        [select_container_button, refresh_button, update_dockerfiles_button, system_graph_button],
         alignment=ft.MainAxisAlignment.CENTER,
         spacing=20,  # ボタン間の間隔を追加
     )
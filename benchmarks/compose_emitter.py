@@ -0,0 +1,91 @@
+"""
+docker-compose.ymlのコマンドの出力方式ごとの処理時間を計測するスクリプト
+
+リポジトリのルートで python benchmarks/compose_emitter.py を実行する。
+200サービスの構成で、正規表現による書き換えとリテラルブロックの直接出力を比較する。
+"""
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+# リポジトリのルートからutilsをインポートできるようにする
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.generate_docker_compose import DockerComposeGenerator, dump_compose  # noqa: E402
+
+def dump_compose_with_regex(compose_data: Dict[str, Any]) -> str:
+    """比較用: 引用符付きで出力した後に、正規表現でコマンドをリテラルブロックへ書き換える以前の方式"""
+    services = {
+        name: dict(config, command=str(config["command"])) for name, config in compose_data["services"].items()
+    }
+    yaml_str = dump_compose(dict(compose_data, services=services))
+    pattern = r"command: '(/bin/bash -c) ''(.+?)'''$"
+
+    def replace_command(match):
+        processed_lines = [f"      {match.group(1)} '"]
+        for line in match.group(2).split('\n'):
+            line = line.strip()
+            if line:
+                processed_lines.append(f"      {line}")
+        processed_lines.append("      '")
+        return f"command: |\n{chr(10).join(processed_lines)}"
+
+    return re.sub(pattern, replace_command, yaml_str, flags=re.MULTILINE | re.DOTALL)
+
+def make_synthetic_project_info(service_count: int = 200, apps_per_service: int = 3) -> Dict[str, Any]:
+    """ベンチマーク用の大規模なproject_infoを作成する"""
+    services = {}
+    for i in range(service_count):
+        apps = {
+            f"app{j}": {
+                "venv": f"venv{j % 2}",
+                "main": f"program{j}/main.py",
+                "container_port": 8000 + j,
+                "data_roots": [f"/data/service{i}/app{j}"],
+                "args": {"--device": f"192.168.{i % 256}.{j + 1}"}
+            }
+            for j in range(apps_per_service)
+        }
+        services[f"service{i}"] = {
+            "user": "mochimaki",
+            "working_dir": "/home/mochimaki",
+            "image": f"service{i}:latest",
+            "Dockerfile": "python311",
+            "apps": apps
+        }
+    return {"services": services}
+
+def benchmark(service_count: int = 200, repeat: int = 5) -> Dict[str, Any]:
+    """合成したproject_infoで、正規表現による書き換えとリテラルブロックの直接出力の処理時間を比較する
+
+    Returns:
+        Dict[str, Any]: 各方式の1回あたりの処理時間（ミリ秒）、出力のサイズ、両方式の出力が一致したかどうか
+    """
+    generator = DockerComposeGenerator("project_info.json", make_synthetic_project_info(service_count))
+    compose_data = generator.generate()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        legacy = dump_compose_with_regex(compose_data)
+    regex_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        direct = dump_compose(compose_data)
+    direct_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    return {
+        'services': service_count,
+        'regex_ms': regex_ms,
+        'direct_ms': direct_ms,
+        'bytes': len(direct.encode('utf-8')),
+        'identical': legacy == direct,
+    }
+
+if __name__ == "__main__":
+    result = benchmark()
+    print(f"サービス数: {result['services']}, 出力: {result['bytes']} bytes, 出力の一致: {result['identical']}")
+    print(f"正規表現で書き換え: {result['regex_ms']:.1f} ms")
+    print(f"リテラルブロックを直接出力: {result['direct_ms']:.1f} ms")
@@ -0,0 +1,75 @@
+"""
+システム構成グラフの詳細度ごとの生成時間と出力サイズを計測するスクリプト
+
+リポジトリのルートで python benchmarks/graph_detail_levels.py を実行する。
+40サービス × 16台の計測器の構成で計測する。
+"""
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# リポジトリのルートからutilsをインポートできるようにする
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.graph_model import DEFAULT_NODE_BUDGET, DETAIL_LEVELS, GraphBuilder, render_mermaid  # noqa: E402
+
+def make_synthetic_project_info(service_count: int = 40, apps_per_service: int = 1,
+                                targets_per_device: int = 16) -> Dict[str, Any]:
+    """ベンチマーク用の大規模なproject_infoを作成する"""
+    services = {}
+    for i in range(service_count):
+        apps = {}
+        for j in range(apps_per_service):
+            apps[f"app{j}"] = {
+                "container_port": 8000 + j,
+                "data_roots": [f"data{i % 4}"],
+                "devices": {
+                    "instrument": {"target": [f"192.168.{i}.{k + 1}" for k in range(targets_per_device)]},
+                    "camera": {"target": [f"192.168.100.{i + 1}"]},
+                }
+            }
+        services[f"service{i}"] = {"image": "python:3.11", "apps": apps}
+    return {"services": services}
+
+def benchmark_detail_levels(project_info: Dict[str, Any], repeat: int = 20) -> List[Dict[str, Any]]:
+    """詳細度ごとにグラフの生成時間と出力サイズを計測する
+
+    Returns:
+        List[Dict[str, Any]]: 詳細度ごとのノード数、辺の数、Mermaidの文字数、
+            キャッシュなし（cold_ms）とキャッシュあり（warm_ms）の1回あたりの生成時間
+    """
+    results = []
+    for level in DETAIL_LEVELS:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            graph = GraphBuilder().build(project_info, level)
+            mermaid = render_mermaid(graph.node_list(), graph.edge_list())
+        cold_ms = (time.perf_counter() - start) * 1000 / repeat
+
+        builder = GraphBuilder()
+        builder.build(project_info, level)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            graph = builder.build(project_info, level)
+            mermaid = render_mermaid(graph.node_list(), graph.edge_list())
+        warm_ms = (time.perf_counter() - start) * 1000 / repeat
+
+        results.append({
+            'level': level,
+            'nodes': len(graph.nodes),
+            'edges': len(graph.edge_list()),
+            'mermaid_chars': len(mermaid),
+            'cold_ms': cold_ms,
+            'warm_ms': warm_ms,
+        })
+    return results
+
+if __name__ == "__main__":
+    info = make_synthetic_project_info(service_count=40, targets_per_device=16)
+    print(f"{'level':<16}{'nodes':>8}{'edges':>8}{'chars':>10}{'cold ms':>10}{'warm ms':>10}")
+    for result in benchmark_detail_levels(info):
+        print(f"{result['level']:<16}{result['nodes']:>8}{result['edges']:>8}{result['mermaid_chars']:>10}"
+              f"{result['cold_ms']:>10.2f}{result['warm_ms']:>10.2f}")
+    level, graph = GraphBuilder().build_within_budget(info, DEFAULT_NODE_BUDGET)
+    print(f"ノード数の上限 {DEFAULT_NODE_BUDGET} で選ばれた詳細度: {level}（ノード: {len(graph.nodes)}）")
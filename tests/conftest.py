@@ -0,0 +1,8 @@
+"""
+テスト共通の設定
+"""
+import sys
+from pathlib import Path
+
+# リポジトリのルートからutilsをインポートできるようにする
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
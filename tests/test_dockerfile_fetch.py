@@ -0,0 +1,180 @@
+"""
+Dockerfileの取得（settings._fetch_dockerfile）のテスト
+
+テストごとにローカルのbareリポジトリを作成し、file://のURLで取得する。
+ミラーのキャッシュはXDG_CACHE_HOMEで一時ディレクトリに置く。
+"""
+import subprocess
+from unittest import mock
+
+import pytest
+
+from utils import git_cache, settings
+from utils.git_cache import get_mirror_path, git_mirror_cache
+from utils.settings import DOCKERFILE_COMMIT_FILE, DockerfileModifiedError, _fetch_dockerfile
+
+def git(*args, cwd=None) -> str:
+    result = subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args),
+                            cwd=cwd, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+class DockerfileRepository:
+    """Dockerfileを含むbareリポジトリと、コミットを追加するための作業ディレクトリ"""
+    def __init__(self, root):
+        self.bare = root / 'dockerfile.git'
+        self.work = root / 'work'
+        git('init', '--bare', '-b', 'main', str(self.bare))
+        # 部分クローン（--filter=blob:none）を受け付ける
+        git('config', 'uploadpack.allowFilter', 'true', cwd=self.bare)
+        git('clone', str(self.bare), str(self.work))
+        self.url = self.bare.as_uri()
+
+    def commit(self, content: str) -> str:
+        (self.work / 'Dockerfile').write_text(content, encoding='utf-8')
+        (self.work / 'README.md').write_text(content * 100, encoding='utf-8')
+        git('add', '-A', cwd=self.work)
+        git('commit', '-m', content.splitlines()[0], cwd=self.work)
+        git('push', 'origin', 'HEAD:main', cwd=self.work)
+        return git('rev-parse', 'HEAD', cwd=self.work)
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setattr(git_mirror_cache, '_last_fetch', {})
+    return DockerfileRepository(tmp_path)
+
+@pytest.fixture
+def git_calls(monkeypatch):
+    """run_gitに渡された引数を記録する"""
+    calls = []
+    run_git = git_cache.run_git
+
+    def record(args, *rest, **kwargs):
+        calls.append(list(args))
+        return run_git(args, *rest, **kwargs)
+    monkeypatch.setattr(git_cache, 'run_git', record)
+    return calls
+
+def fetch(repository, dockerfiles_dir, update=False):
+    started = []
+    info = {'url': repository.url, 'branch': 'main'}
+    fetched = _fetch_dockerfile('app', info, dockerfiles_dir, None, lambda: started.append(True), update)
+    return fetched, bool(started)
+
+def read_source(dockerfiles_dir):
+    return (dockerfiles_dir / 'app' / DOCKERFILE_COMMIT_FILE).read_text(encoding='utf-8').split()[0]
+
+def test_cold_fetch_uses_shallow_partial_clone(repository, tmp_path, git_calls):
+    commit = repository.commit("FROM python:3.11\n")
+    dockerfiles_dir = tmp_path / 'dockerfiles'
+    dockerfiles_dir.mkdir()
+
+    assert fetch(repository, dockerfiles_dir) == (True, True)
+
+    assert (dockerfiles_dir / 'app' / 'Dockerfile').read_text(encoding='utf-8') == "FROM python:3.11\n"
+    assert read_source(dockerfiles_dir) == commit
+    # 1ファイルのためにミラーを作成しない
+    assert not get_mirror_path(repository.url).exists()
+    clones = [args for args in git_calls if args[0] == 'clone']
+    assert len(clones) == 1
+    assert '--mirror' not in clones[0]
+    assert '--depth' in clones[0] and '--filter=blob:none' in clones[0]
+
+def test_existing_dockerfile_is_not_checked_without_update(repository, tmp_path, monkeypatch):
+    repository.commit("FROM python:3.11\n")
+    dockerfiles_dir = tmp_path / 'dockerfiles'
+    dockerfiles_dir.mkdir()
+    fetch(repository, dockerfiles_dir)
+    repository.commit("FROM python:3.12\n")
+
+    def fail(url, branch):
+        raise AssertionError("更新しない場合はリモートに問い合わせない")
+    monkeypatch.setattr(settings, 'resolve_remote_commit', fail)
+
+    assert fetch(repository, dockerfiles_dir) == (False, False)
+    assert (dockerfiles_dir / 'app' / 'Dockerfile').read_text(encoding='utf-8') == "FROM python:3.11\n"
+
+def test_update_skips_when_remote_commit_is_unchanged(repository, tmp_path, git_calls):
+    commit = repository.commit("FROM python:3.11\n")
+    dockerfiles_dir = tmp_path / 'dockerfiles'
+    dockerfiles_dir.mkdir()
+    fetch(repository, dockerfiles_dir)
+    git_calls.clear()
+
+    assert fetch(repository, dockerfiles_dir, update=True) == (False, False)
+
+    assert git_calls == []
+    assert read_source(dockerfiles_dir) == commit
+
+def test_update_fetches_new_commit(repository, tmp_path):
+    repository.commit("FROM python:3.11\n")
+    dockerfiles_dir = tmp_path / 'dockerfiles'
+    dockerfiles_dir.mkdir()
+    fetch(repository, dockerfiles_dir)
+    commit = repository.commit("FROM python:3.12\n")
+
+    assert fetch(repository, dockerfiles_dir, update=True) == (True, True)
+
+    assert (dockerfiles_dir / 'app' / 'Dockerfile').read_text(encoding='utf-8') == "FROM python:3.12\n"
+    assert read_source(dockerfiles_dir) == commit
+
+def test_update_reads_from_existing_mirror(repository, tmp_path, git_calls):
+    repository.commit("FROM python:3.11\n")
+    dockerfiles_dir = tmp_path / 'dockerfiles'
+    dockerfiles_dir.mkdir()
+    fetch(repository, dockerfiles_dir)
+    # プログラムのクローンなどで同じURLのミラーが作成済みの場合
+    assert git_mirror_cache.ensure_mirror(repository.url) is not None
+    commit = repository.commit("FROM python:3.12\n")
+    git_calls.clear()
+
+    assert fetch(repository, dockerfiles_dir, update=True) == (True, True)
+
+    assert (dockerfiles_dir / 'app' / 'Dockerfile').read_text(encoding='utf-8') == "FROM python:3.12\n"
+    assert read_source(dockerfiles_dir) == commit
+    assert [args[0] for args in git_calls] == ['fetch']
+
+def test_update_refuses_locally_modified_dockerfile(repository, tmp_path):
+    repository.commit("FROM python:3.11\n")
+    dockerfiles_dir = tmp_path / 'dockerfiles'
+    dockerfiles_dir.mkdir()
+    fetch(repository, dockerfiles_dir)
+    dockerfile = dockerfiles_dir / 'app' / 'Dockerfile'
+    dockerfile.write_text("FROM python:3.11\nRUN echo local\n", encoding='utf-8')
+    repository.commit("FROM python:3.12\n")
+
+    with pytest.raises(DockerfileModifiedError):
+        fetch(repository, dockerfiles_dir, update=True)
+
+    assert dockerfile.read_text(encoding='utf-8') == "FROM python:3.11\nRUN echo local\n"
+
+def test_update_keeps_edited_dockerfile_without_source(repository, tmp_path):
+    repository.commit("FROM python:3.11\n")
+    dockerfiles_dir = tmp_path / 'dockerfiles'
+    dockerfiles_dir.mkdir()
+    fetch(repository, dockerfiles_dir)
+    # 取得元を記録していなかった以前のバージョンで取得し、手元で変更したDockerfile
+    (dockerfiles_dir / 'app' / DOCKERFILE_COMMIT_FILE).unlink()
+    dockerfile = dockerfiles_dir / 'app' / 'Dockerfile'
+    dockerfile.write_text("FROM python:3.11\nRUN echo local\n", encoding='utf-8')
+    repository.commit("FROM python:3.12\n")
+    info = {'dockerfiles': {'app': {'url': repository.url, 'branch': 'main'}}}
+
+    with mock.patch.object(settings, 'show_status'), mock.patch.object(settings, 'show_error_dialog') as error:
+        assert not settings.update_dockerfiles(info, str(tmp_path), None)
+
+    assert dockerfile.read_text(encoding='utf-8') == "FROM python:3.11\nRUN echo local\n"
+    assert not (dockerfiles_dir / 'app' / DOCKERFILE_COMMIT_FILE).exists()
+    assert '取得元の記録がなく' in error.call_args.args[2]
+
+def test_update_records_source_of_unchanged_dockerfile_without_source(repository, tmp_path):
+    commit = repository.commit("FROM python:3.11\n")
+    dockerfiles_dir = tmp_path / 'dockerfiles'
+    dockerfile = dockerfiles_dir / 'app' / 'Dockerfile'
+    dockerfile.parent.mkdir(parents=True)
+    dockerfile.write_text("FROM python:3.11\n", encoding='utf-8')
+
+    assert fetch(repository, dockerfiles_dir, update=True) == (False, False)
+
+    assert dockerfile.read_text(encoding='utf-8') == "FROM python:3.11\n"
+    assert read_source(dockerfiles_dir) == commit
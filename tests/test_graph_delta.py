@@ -0,0 +1,171 @@
+"""
+MermaidContainerManager.update_graphの差分送信と再送のテスト
+
+ビューアーの代わりに/api/health, /api/update, /api/deltaを受け付けるローカルのHTTPサーバーを起動し、
+GraphDeltaReceiverで受信した内容が送信側の最新の内容と一致することを確認する。
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.graph_delta import GraphDeltaReceiver
+from utils.mermaid_container_manager import MermaidContainerManager
+
+VERSIONS = [
+    "graph TD\n    A[\"Host\"]\n    A --> B",
+    "graph TD\n    A[\"Host\"]\n    B[\"App: a\"]\n    A --> B",
+    "graph TD\n    A[\"Host\"]\n    B[\"App: a\"]\n    C[\"Device\"]\n    A --> B\n    B --> C",
+    "graph TD\n    A[\"Host\"]\n    B[\"App: b\"]\n    C[\"Device\"]\n    A --> B\n    B --> C",
+]
+
+class StandinViewer:
+    """ビューアーの代わりのサーバー
+
+    差分を適用できない場合はビューアーと同じく409を返す。
+    drop_next_delta()を呼び出すと、次の差分を200で受け付けたうえで適用せずに捨てる（取りこぼしの再現）。
+    delta_supported=Falseの場合は/api/deltaに404を返す（差分に対応していないビューアー）。
+    """
+    def __init__(self, delta_supported: bool = True):
+        self.receiver = GraphDeltaReceiver()
+        self.delta_supported = delta_supported
+        self.requests = []
+        self._drop_next = False
+        viewer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/api/health':
+                    self._reply(200, {'status': 'healthy'})
+                else:
+                    self._reply(404, {})
+
+            def do_POST(self):
+                message = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                viewer.requests.append((self.path, message))
+                if self.path == '/api/update':
+                    ok = viewer.receiver.receive(message)
+                    self._reply(200 if ok else 400, {'success': ok})
+                elif self.path == '/api/delta' and viewer.delta_supported:
+                    if viewer._drop_next:
+                        viewer._drop_next = False
+                        self._reply(200, {'success': True})
+                        return
+                    ok = viewer.receiver.receive(message)
+                    self._reply(200 if ok else 409, {'success': ok, 'resync': not ok})
+                else:
+                    self._reply(404, {})
+
+            def _reply(self, status, result):
+                body = json.dumps(result).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def drop_next_delta(self) -> None:
+        self._drop_next = True
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+def make_manager(viewer: StandinViewer) -> MermaidContainerManager:
+    """代わりのサーバーに送信するマネージャーを作成する（Dockerには問い合わせない）"""
+    manager = MermaidContainerManager()
+    manager.api_base_url = "http://127.0.0.1"
+    manager._port_cache = (None, viewer.port)
+    manager._viewer_active = True
+    return manager
+
+@pytest.fixture
+def viewer():
+    viewer = StandinViewer()
+    yield viewer
+    viewer.close()
+
+def test_sends_full_then_delta_and_skips_unchanged(viewer):
+    manager = make_manager(viewer)
+
+    assert manager.update_graph(VERSIONS[0], "graph.txt", None)
+    assert not manager.update_graph(VERSIONS[0], "graph.txt", None)
+    assert manager.update_graph(VERSIONS[1], "graph.txt", None)
+
+    assert viewer.paths() == ['/api/update', '/api/delta']
+    assert manager.get_push_stats() == {'full': 1, 'delta': 1, 'skipped': 1, 'resyncs': 0}
+    assert viewer.receiver.content == VERSIONS[1]
+    assert viewer.receiver.seq == manager._pushed_seq
+
+def test_resends_full_after_missed_sequence(viewer):
+    manager = make_manager(viewer)
+    assert manager.update_graph(VERSIONS[0], "graph.txt", None)
+    assert manager.update_graph(VERSIONS[1], "graph.txt", None)
+
+    # 送信側は適用されたものとして扱うが、ビューアーは受け取っていない
+    viewer.drop_next_delta()
+    assert manager.update_graph(VERSIONS[2], "graph.txt", None)
+    assert viewer.receiver.content == VERSIONS[1]
+
+    # 次の差分はbase_seqが一致しないため409になり、全体が再送される
+    assert manager.update_graph(VERSIONS[3], "graph.txt", None)
+
+    assert viewer.paths() == ['/api/update', '/api/delta', '/api/delta', '/api/delta', '/api/update']
+    assert manager.get_push_stats() == {'full': 2, 'delta': 2, 'skipped': 0, 'resyncs': 1}
+    assert viewer.receiver.resyncs == 1
+    assert viewer.receiver.content == VERSIONS[3]
+    assert viewer.receiver.seq == manager._pushed_seq
+
+    # 再送後は再び差分で送信される
+    assert manager.update_graph(VERSIONS[1], "graph.txt", None)
+    assert viewer.paths()[-1] == '/api/delta'
+    assert viewer.receiver.content == VERSIONS[1]
+
+def test_falls_back_to_full_when_viewer_has_no_delta_endpoint():
+    viewer = StandinViewer(delta_supported=False)
+    try:
+        manager = make_manager(viewer)
+        for content in VERSIONS:
+            assert manager.update_graph(content, "graph.txt", None)
+
+        # 404を受け取った後は/api/deltaを送信しない
+        assert viewer.paths() == ['/api/update', '/api/delta', '/api/update', '/api/update', '/api/update']
+        assert manager.get_push_stats()['full'] == 4
+        assert manager.get_push_stats()['delta'] == 0
+        assert viewer.receiver.content == VERSIONS[3]
+    finally:
+        viewer.close()
+
+def test_force_resends_full_even_when_unchanged(viewer):
+    manager = make_manager(viewer)
+    assert manager.update_graph(VERSIONS[0], "graph.txt", None)
+    assert manager.update_graph(VERSIONS[0], "graph.txt", None, force=True)
+
+    assert viewer.paths() == ['/api/update', '/api/update']
+    assert viewer.receiver.content == VERSIONS[0]
+
+def test_holds_graph_pending_after_viewer_stops(viewer, monkeypatch):
+    manager = make_manager(viewer)
+    monkeypatch.setattr(manager, '_resolve_container_port', lambda: (None, viewer.port))
+    monkeypatch.setattr(manager, '_container_is_running', lambda: False)
+    assert manager.update_graph(VERSIONS[0], "graph.txt", None)
+
+    # アプリの外でビューアーのコンテナが停止された場合
+    viewer.close()
+    assert not manager.update_graph(VERSIONS[1], "graph.txt", None)
+    assert manager._viewer_active is None
+
+    # 次の更新ではDockerに問い合わせ直し、送信せずに保留する
+    assert not manager.update_graph(VERSIONS[2], "graph.txt", None)
+    assert manager._pending_graph == (VERSIONS[2], "graph.txt")
@@ -0,0 +1,21 @@
+"""
+GraphBuilderのフラグメントの再利用のテスト
+"""
+from utils.graph_model import GraphBuilder, render_mermaid
+
+def make_project_info(container_id):
+    return {"services": {"svc": {"id": container_id, "image": "python:3.11", "apps": {"app": {"devices": {
+        "instrument": {"target": ["192.168.0.1"]}
+    }}}}}}
+
+def test_container_id_change_reuses_service_fragment():
+    builder = GraphBuilder()
+    first = builder.build(make_project_info("a" * 64))
+    assert builder.fragments_built == 1
+
+    # 作り直されたコンテナのIDはグラフに表示しないため、フラグメントを再利用する
+    second = builder.build(make_project_info("b" * 64))
+
+    assert builder.fragments_built == 1
+    assert builder.fragments_reused == 1
+    assert render_mermaid(second.node_list(), second.edge_list()) == render_mermaid(first.node_list(), first.edge_list())
@@ -0,0 +1,77 @@
+"""
+GraphEventChannelのSSEの配信と、follow_graph_eventsによる受信・再同期のテスト
+"""
+import threading
+import time
+
+import pytest
+
+from utils.graph_delta import GraphDeltaReceiver
+from utils.graph_stream import GraphEventChannel, follow_graph_events
+
+VERSIONS = [
+    "graph TD\n    A[\"Host\"]\n    A --> B",
+    "graph TD\n    A[\"Host\"]\n    B[\"App: a\"]\n    A --> B",
+    "graph TD\n    A[\"Host\"]\n    B[\"App: a\"]\n    C[\"Device\"]\n    A --> B\n    B --> C",
+]
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("タイムアウトしました")
+        time.sleep(0.02)
+
+@pytest.fixture
+def channel():
+    channel = GraphEventChannel(heartbeat=0.2)
+    channel.start()
+    yield channel
+    channel.stop()
+
+@pytest.fixture
+def subscribe(channel):
+    stop = threading.Event()
+    threads = []
+
+    def start(receiver):
+        updates = []
+        thread = threading.Thread(target=follow_graph_events, args=(channel.url, receiver, stop, updates.append),
+                                  kwargs={'reconnect_delay': 0.05, 'heartbeat': 0.2}, daemon=True)
+        thread.start()
+        threads.append(thread)
+        return updates
+    yield start
+    stop.set()
+    channel.stop()
+    for thread in threads:
+        thread.join(2.0)
+
+def test_subscriber_receives_full_then_deltas(channel, subscribe):
+    channel.publish(VERSIONS[0])
+    receiver = GraphDeltaReceiver()
+    updates = subscribe(receiver)
+    wait_until(lambda: receiver.content == VERSIONS[0])
+
+    assert channel.publish(VERSIONS[1])['type'] == 'delta'
+    assert channel.publish(VERSIONS[1]) is None
+    assert channel.publish(VERSIONS[2])['type'] == 'delta'
+    wait_until(lambda: receiver.content == VERSIONS[2])
+
+    assert updates == VERSIONS
+    assert receiver.seq == 3
+    assert receiver.resyncs == 0
+
+def test_subscriber_resyncs_after_sequence_gap(channel, subscribe):
+    channel.publish(VERSIONS[0])
+    receiver = GraphDeltaReceiver()
+    subscribe(receiver)
+    wait_until(lambda: receiver.seq == 1)
+
+    # 途中のメッセージを取りこぼした状態を再現する
+    receiver.seq = 0
+    channel.publish(VERSIONS[1])
+
+    # 差分を適用できないため接続し直し、全体を受信し直す
+    wait_until(lambda: receiver.content == VERSIONS[1] and receiver.seq == 2)
+    assert receiver.resyncs == 1
@@ -0,0 +1,70 @@
+"""
+ProjectInfoStore.save()の書き込みと失敗時の扱い、まとめた書き込みのテスト
+"""
+import json
+import time
+
+import pytest
+
+from utils import project_info_store
+from utils.file_utils import atomic_write_bytes
+from utils.project_info_store import ProjectInfoStore
+from utils.ui.app_utils import update_container_info_in_project_info
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / 'project_info.json'
+    path.write_text(json.dumps({'services': {}}, indent=2), encoding='utf-8')
+    return ProjectInfoStore(path)
+
+def test_immediate_save_writes_and_raises_on_failure(store, monkeypatch):
+    store.save({'services': {'a': {}}}, delay=0)
+    assert json.loads(store.path.read_text(encoding='utf-8')) == {'services': {'a': {}}}
+
+    def fail(path, data):
+        raise OSError("disk full")
+    monkeypatch.setattr(project_info_store, 'atomic_write_bytes', fail)
+    # ユーザーの操作による保存は呼び出し側で失敗を検出できる
+    with pytest.raises(OSError):
+        store.save({'services': {'b': {}}}, delay=0)
+    assert store.load() == {'services': {'b': {}}}
+
+def test_background_failure_retries_write(store, monkeypatch):
+    def fail(path, data):
+        raise OSError("disk full")
+    monkeypatch.setattr(project_info_store, 'WRITE_RETRY_DELAY', 0.3)
+    monkeypatch.setattr(project_info_store, 'atomic_write_bytes', fail)
+    store.save({'services': {'a': {}}}, delay=0.01)
+    time.sleep(0.1)
+    assert store._pending
+    assert store._flush_timer is not None
+
+    # 失敗した変更は次のsave()を待たずに再度書き込まれる
+    monkeypatch.setattr(project_info_store, 'atomic_write_bytes', atomic_write_bytes)
+    time.sleep(0.5)
+    assert not store._pending
+    assert json.loads(store.path.read_text(encoding='utf-8')) == {'services': {'a': {}}}
+
+def test_coalesces_background_saves(store):
+    store.save({'services': {'a': {}}}, delay=0.05)
+    store.save({'services': {'b': {}}}, delay=0.05)
+    time.sleep(0.3)
+    assert store.writes == 1
+    assert store.writes_coalesced == 1
+    assert json.loads(store.path.read_text(encoding='utf-8')) == {'services': {'b': {}}}
+
+def test_container_info_updates_are_coalesced(tmp_path):
+    context = tmp_path / 'context'
+    context.mkdir()
+    (context / 'project_info.json').write_text(json.dumps({'services': {'svc': {}}}, indent=2), encoding='utf-8')
+    store = project_info_store.get_project_info_store(context)
+    name = f"{context.name}-svc-1"
+
+    update_container_info_in_project_info(context, [{'name': name, 'id': 'aaa', 'image': 'img:1'}])
+    update_container_info_in_project_info(context, [{'name': name, 'id': 'bbb', 'image': 'img:1'}])
+    assert store.get_service('svc')['id'] == 'bbb'
+    store.flush()
+
+    assert store.writes == 1
+    assert store.writes_coalesced == 1
+    assert json.loads((context / 'project_info.json').read_text(encoding='utf-8'))['services']['svc']['id'] == 'bbb'
@@ -0,0 +1,92 @@
+"""
+SignalWatcherのテスト
+"""
+import ctypes
+import errno
+import os
+import sys
+
+import pytest
+
+from utils.ui import signal_watcher
+from utils.ui.signal_watcher import SignalWatcher, get_signal_watcher, stop_other_signal_watchers
+
+class FailingLibc:
+    """指定したパスのinotify_add_watchを失敗させるlibc"""
+    def __init__(self, libc, failing_name: str):
+        self._libc = libc
+        self._failing_name = failing_name
+
+    def inotify_add_watch(self, fd, path, mask):
+        if os.path.basename(os.fsdecode(path)) == self._failing_name:
+            ctypes.set_errno(errno.ENOSPC)
+            return -1
+        return self._libc.inotify_add_watch(fd, path, mask)
+
+    def __getattr__(self, name):
+        return getattr(self._libc, name)
+
+@pytest.fixture
+def failing_libc(monkeypatch):
+    fd = signal_watcher._open_inotify()
+    if fd is None:
+        pytest.skip("inotifyを利用できない環境")
+    os.close(fd)
+
+    def install(failing_name):
+        monkeypatch.setattr(signal_watcher, '_libc', FailingLibc(signal_watcher._libc, failing_name))
+    return install
+
+def touch_signal(build_context, service_name, app_name):
+    (build_context / 'signal' / service_name / f"{app_name}_startup_signal.txt").write_text('', encoding='utf-8')
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="inotifyはLinuxのみ")
+def test_service_without_watch_falls_back_to_polling(tmp_path, failing_libc, capsys):
+    (tmp_path / 'signal' / 'svc').mkdir(parents=True)
+    (tmp_path / 'signal' / 'other').mkdir()
+    failing_libc('svc')
+    watcher = SignalWatcher(tmp_path, poll_interval=0.05)
+    watcher.start()
+    try:
+        assert watcher.mode == 'inotify'
+        touch_signal(tmp_path, 'svc', 'app')
+        touch_signal(tmp_path, 'other', 'app')
+
+        assert watcher.wait_for_service('svc', timeout=2)
+        assert watcher.wait_for_service('other', timeout=2)
+        output = capsys.readouterr().out
+        assert f"errno={errno.ENOSPC}" in output
+        assert "svc" in output and "other" not in output
+    finally:
+        watcher.stop()
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="inotifyはLinuxのみ")
+def test_signal_dir_without_watch_switches_to_polling(tmp_path, failing_libc):
+    (tmp_path / 'signal' / 'svc').mkdir(parents=True)
+    failing_libc('signal')
+    watcher = SignalWatcher(tmp_path, poll_interval=0.05)
+    watcher.start()
+    try:
+        touch_signal(tmp_path, 'svc', 'app')
+        assert watcher.wait_for_service('svc', timeout=2)
+        assert watcher.mode == 'polling'
+    finally:
+        watcher.stop()
+
+def test_stop_other_signal_watchers(tmp_path):
+    first = tmp_path / 'first'
+    second = tmp_path / 'second'
+    first.mkdir()
+    second.mkdir()
+    first_watcher = get_signal_watcher(first)
+    second_watcher = get_signal_watcher(second)
+
+    stop_other_signal_watchers(second)
+
+    first_watcher._thread.join(timeout=2)
+    assert not first_watcher._thread.is_alive()
+    assert second_watcher._thread.is_alive()
+    assert get_signal_watcher(second) is second_watcher
+    assert get_signal_watcher(first) is not first_watcher
+
+    stop_other_signal_watchers(tmp_path)
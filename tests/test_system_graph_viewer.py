@@ -0,0 +1,39 @@
+"""
+システム構成グラフの展開表示のテスト
+"""
+import json
+
+from utils.graph_model import GraphNode
+from utils.system_graph_viewer import SystemGraphViewer, get_expanded_groups, toggle_group_expansion
+
+def make_context(root, name):
+    context = root / name
+    context.mkdir()
+    services = {
+        "svc": {"image": "python:3.11", "apps": {"app": {"devices": {
+            "instrument": {"target": [f"192.168.0.{i}" for i in range(1, 5)]}
+        }}}}
+    }
+    (context / 'project_info.json').write_text(json.dumps({"services": services}), encoding='utf-8')
+    return context
+
+def node_types(context):
+    viewer = SystemGraphViewer(detail_level="service")
+    assert viewer.load_project_info(context)
+    graph = viewer.build_graph_model()
+    return {node.ntype for node in graph.nodes}
+
+def test_expansion_is_kept_per_build_context(tmp_path):
+    first = make_context(tmp_path, 'first')
+    second = make_context(tmp_path, 'second')
+    node = GraphNode(("container", "svc"), "Container: svc", "container")
+
+    assert toggle_group_expansion(node, first)
+
+    assert get_expanded_groups(first) == {"svc"}
+    assert get_expanded_groups(second) == set()
+    assert "device" in node_types(first)
+    assert "device" not in node_types(second)
+
+    assert toggle_group_expansion(node, str(first))
+    assert get_expanded_groups(first) == set()
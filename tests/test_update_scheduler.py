@@ -0,0 +1,35 @@
+"""
+UpdateSchedulerがpage.update()を1フレームに1回にまとめることのテスト
+"""
+import time
+
+from utils.update_scheduler import UpdateScheduler
+
+class FakePage:
+    def __init__(self):
+        self.updates = 0
+
+    def update(self):
+        self.updates += 1
+
+def test_requests_within_one_frame_update_page_once():
+    scheduler = UpdateScheduler(interval=0.05)
+    page = FakePage()
+
+    for _ in range(20):
+        scheduler.request_update(page)
+    time.sleep(0.3)
+
+    assert page.updates == 1
+    assert scheduler.get_stats() == {'requested': 20, 'flushed': 1}
+
+def test_flush_updates_immediately_and_cancels_pending_frame():
+    scheduler = UpdateScheduler(interval=0.05)
+    page = FakePage()
+
+    scheduler.request_update(page)
+    scheduler.flush()
+    time.sleep(0.2)
+
+    assert page.updates == 1
+    assert scheduler.get_stats() == {'requested': 1, 'flushed': 1}
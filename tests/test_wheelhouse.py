@@ -0,0 +1,54 @@
+"""
+ホイールのディレクトリの作成のタイミングと、ホイールの作成の進捗・打ち切りのテスト
+"""
+import subprocess
+import sys
+
+import pytest
+
+from utils.generate_docker_compose import DockerComposeGenerator
+from utils.wheelhouse import WheelhouseBuilder, get_wheelhouse_root
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.delenv('MOCHIMAKI_WHEELHOUSE', raising=False)
+
+def test_generating_compose_does_not_create_wheelhouse_root(tmp_path):
+    project_info = {"services": {"svc": {
+        "user": "mochimaki", "working_dir": "/home/mochimaki", "image": "svc:latest", "Dockerfile": "python311",
+        "apps": {"app": {"venv": "venv", "main": "program/main.py", "container_port": 8000, "data_roots": []}}
+    }}}
+    generator = DockerComposeGenerator(str(tmp_path / 'project_info.json'), project_info)
+    generator.fingerprint()
+    generator.generate()
+
+    assert not get_wheelhouse_root().exists()
+    assert WheelhouseBuilder().ensure_root() == get_wheelhouse_root()
+    assert get_wheelhouse_root().is_dir()
+
+def python_command(script):
+    return [sys.executable, '-c', script]
+
+def test_pip_wheel_reports_progress():
+    lines = []
+    script = "print('Collecting numpy'); print('Looking in indexes'); print('Saved /wheels/numpy.whl')"
+    WheelhouseBuilder()._run_pip_wheel(python_command(script), 'unused', lines.append, timeout=30)
+
+    assert lines == ['Collecting numpy', 'Saved /wheels/numpy.whl']
+
+def test_pip_wheel_is_stopped_after_timeout(monkeypatch):
+    run = subprocess.run
+
+    def fake_run(cmd, *args, **kwargs):
+        # docker killの代わりに何もしない
+        if cmd[:2] == ['docker', 'kill']:
+            return subprocess.CompletedProcess(cmd, 0)
+        return run(cmd, *args, **kwargs)
+    monkeypatch.setattr(subprocess, 'run', fake_run)
+
+    script = "import time; print('Collecting numpy', flush=True); time.sleep(30)"
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        WheelhouseBuilder()._run_pip_wheel(python_command(script), 'unused', None, timeout=0.5)
+
+    assert '打ち切りました' in error.value.stderr
@@ -1,7 +1,8 @@
 # サブモジュールの関数を直接インポートできるようにする
 from .ui_utils import (
     on_container_dialog_result,
-    refresh_container_status
+    refresh_container_status,
+    on_update_dockerfiles_click
 )
 from .mermaid_ui import (
     initialize_mermaid_container,
@@ -14,6 +15,7 @@ from .mermaid_ui import (
 __all__ = [
     'on_container_dialog_result',
     'refresh_container_status',
+    'on_update_dockerfiles_click',
     'initialize_mermaid_container',
     'on_system_graph_button_click'
 ]
\ No newline at end of file
@@ -1,55 +1,148 @@
 import json
+import hashlib
+import threading
 from pathlib import Path
+from typing import Dict, Tuple
 import re
+from .project_info_store import get_project_info_store
+
+# parse_project_infoが書き込んだファイルの情報
+# パス -> (内容のSHA-256, st_mtime_ns, st_size)
+_written_file_digests: Dict[str, Tuple[str, int, int]] = {}
+_written_file_lock = threading.Lock()
+
+def _write_if_changed(path: Path, content: bytes) -> bool:
+    """内容が変化している場合のみファイルを書き込む
+
+    container_info.jsonとapp_info.jsonはコンテナに単一ファイルとしてバインドマウントされるため、
+    os.replaceによる置き換えではなく同じinodeへ上書きする。
+
+    Args:
+        path (Path): 書き込み先のパス
+        content (bytes): 書き込む内容
+
+    Returns:
+        bool: 書き込んだ場合はTrue
+    """
+    key = str(path)
+    digest = hashlib.sha256(content).hexdigest()
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        st = None
+
+    with _written_file_lock:
+        cached = _written_file_digests.get(key)
+    if st is not None:
+        if cached and cached == (digest, st.st_mtime_ns, st.st_size):
+            return False
+        if st.st_size == len(content) and hashlib.sha256(path.read_bytes()).hexdigest() == digest:
+            # 他のプロセスが書いたファイルでも内容が同じなら書き込まない
+            with _written_file_lock:
+                _written_file_digests[key] = (digest, st.st_mtime_ns, st.st_size)
+            return False
+
+    with path.open('wb') as f:
+        f.write(content)
+    st = path.stat()
+    with _written_file_lock:
+        _written_file_digests[key] = (digest, st.st_mtime_ns, st.st_size)
+    return True
+
+def _remove_managed_file(path: Path) -> bool:
+    """parse_project_infoが生成したファイルを削除する"""
+    with _written_file_lock:
+        _written_file_digests.pop(str(path), None)
+    if path.exists():
+        path.unlink()
+        return True
+    return False
+
+def _remove_dir_if_empty(path: Path) -> None:
+    """ディレクトリが空であれば削除する"""
+    try:
+        path.rmdir()
+    except OSError:
+        pass
 
 def parse_project_info(build_context_path: str) -> None:
     """
     project_info.jsonをパースしてcontainer_infoディレクトリに階層構造で保存する
+
+    各ファイルの内容を計算し、ディスク上の内容と異なるファイルのみを書き込む。
+    project_info.jsonから削除されたサービスやアプリケーションのファイルは削除する。
     
     Args:
         build_context_path: ビルドコンテキストのパス
     """
     try:
         # project_info.jsonを読み込む
-        project_info_path = Path(build_context_path) / 'project_info.json'
-        with project_info_path.open('r') as f:
-            project_info = json.load(f)
+        store = get_project_info_store(build_context_path)
+        project_info = store.load()
 
         # container_infoディレクトリを作成
         container_info_dir = Path(build_context_path) / 'container_info'
         container_info_dir.mkdir(exist_ok=True)
 
+        written = 0
+        removed = 0
+        services = project_info['services']
+
         # サービスごとにcontainer_info.jsonとapp_info.jsonを作成
-        for service_name, service_info in project_info['services'].items():
+        for service_name, service_info in services.items():
             # サービスディレクトリを作成
             service_dir = container_info_dir / service_name
             service_dir.mkdir(exist_ok=True)
 
             # container_info.jsonを作成
-            container_info_path = service_dir / 'container_info.json'
-            with container_info_path.open('w') as f:
-                container_info = {
-                    'name': service_name,
-                    'image': service_info.get('image', ''),
-                    'id': service_info.get('id', ''),
-                    'Dockerfile': service_info.get('Dockerfile', ''),
-                    'apps': service_info.get('apps', {})
-                }
-                json.dump(container_info, f, indent=2)
+            container_info = {
+                'name': service_name,
+                'image': service_info.get('image', ''),
+                'id': service_info.get('id', ''),
+                'Dockerfile': service_info.get('Dockerfile', ''),
+                'apps': service_info.get('apps', {})
+            }
+            if _write_if_changed(service_dir / 'container_info.json',
+                                 json.dumps(container_info, indent=2).encode('utf-8')):
+                written += 1
 
             # アプリケーションごとにapp_info.jsonを作成
-            for app_name, app_info in service_info.get('apps', {}).items():
+            apps = service_info.get('apps', {})
+            for app_name, app_info in apps.items():
                 # アプリケーションディレクトリを作成
                 app_dir = service_dir / app_name
                 app_dir.mkdir(exist_ok=True)
 
                 # app_info.jsonを作成
-                app_info_path = app_dir / 'app_info.json'
-                with app_info_path.open('w') as f:
-                    json.dump(app_info, f, indent=2)
+                if _write_if_changed(app_dir / 'app_info.json',
+                                     json.dumps(app_info, indent=2).encode('utf-8')):
+                    written += 1
+
+            # 削除されたアプリケーションのファイルを削除
+            for app_dir in service_dir.iterdir():
+                if app_dir.is_dir() and app_dir.name not in apps:
+                    if _remove_managed_file(app_dir / 'app_info.json'):
+                        removed += 1
+                    _remove_dir_if_empty(app_dir)
+
+        # 削除されたサービスのファイルを削除
+        for service_dir in container_info_dir.iterdir():
+            if not service_dir.is_dir() or service_dir.name in services:
+                continue
+            for app_dir in service_dir.iterdir():
+                if app_dir.is_dir():
+                    if _remove_managed_file(app_dir / 'app_info.json'):
+                        removed += 1
+                    _remove_dir_if_empty(app_dir)
+            if _remove_managed_file(service_dir / 'container_info.json'):
+                removed += 1
+            _remove_dir_if_empty(service_dir)
+
+        if written or removed:
+            print(f"container_infoを更新しました（書き込み: {written}件, 削除: {removed}件）")
     
     except FileNotFoundError:
-        print(f"エラー: project_info.jsonが見つかりません: {project_info_path}")
+        print(f"エラー: project_info.jsonが見つかりません: {store.path}")
     except json.JSONDecodeError:
         print(f"エラー: project_info.jsonの解析に失敗しました")
     except Exception as e:
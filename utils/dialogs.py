@@ -1,4 +1,5 @@
 import flet as ft
+from .update_scheduler import request_update, flush_update
 
 # グローバル変数の宣言
 snack_bar = None
@@ -7,7 +8,7 @@ def show_error_dialog(page: ft.Page, title: str, message: str):
     """エラーダイアログを表示する"""
     def close_dialog(e):
         dialog.open = False
-        page.update()
+        flush_update(page)
         page.overlay.remove(dialog)  # overlayからダイアログを削除
 
     dialog = ft.AlertDialog(
@@ -21,7 +22,7 @@ def show_error_dialog(page: ft.Page, title: str, message: str):
 
     page.overlay.append(dialog)
     dialog.open = True
-    page.update()
+    flush_update(page)
 
 def show_status(page: ft.Page, message: str):
     """ステータスメッセージをSnackBarで表示する"""
@@ -36,4 +37,4 @@ def show_status(page: ft.Page, message: str):
     
     snack_bar.content.value = message
     snack_bar.open = True
-    page.update()
+    request_update(page)
@@ -0,0 +1,353 @@
+"""
+Docker Engine APIをUnixソケット経由で直接呼び出すクライアントを提供するモジュール
+
+docker/docker-composeコマンドをサブプロセスとして起動する代わりに、
+/var/run/docker.sockへのキープアライブ接続を使い回してAPIを呼び出す。
+ソケットが利用できない環境（Windowsやtcp://のDOCKER_HOSTなど）では
+DockerAPIUnavailableを送出するため、呼び出し側は従来のサブプロセス処理にフォールバックする。
+"""
+import http.client
+import json
+import os
+import queue
+import re
+import socket
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+DEFAULT_SOCKET_PATH = '/var/run/docker.sock'
+COMPOSE_PROJECT_LABEL = 'com.docker.compose.project'
+COMPOSE_SERVICE_LABEL = 'com.docker.compose.service'
+
+class DockerAPIUnavailable(Exception):
+    """Docker Engine APIに接続できない場合の例外"""
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """Unixソケットに接続するHTTPConnection"""
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+def get_default_socket_path() -> Optional[str]:
+    """利用するDockerソケットのパスを取得する
+
+    Returns:
+        Optional[str]: ソケットのパス。Unixソケットを利用できない場合はNone
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+
+    docker_host = os.environ.get('DOCKER_HOST', '')
+    if docker_host:
+        if docker_host.startswith('unix://'):
+            return docker_host[len('unix://'):]
+        # tcp://やssh://はdocker CLIに任せる
+        return None
+
+    if os.path.exists(DEFAULT_SOCKET_PATH):
+        return DEFAULT_SOCKET_PATH
+
+    # rootlessモードのソケット
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.exists(os.path.join(runtime_dir, 'docker.sock')):
+        return os.path.join(runtime_dir, 'docker.sock')
+    return DEFAULT_SOCKET_PATH
+
+def compose_project_name(docker_compose_dir) -> str:
+    """ディレクトリ名からDocker Composeのプロジェクト名を求める"""
+    return re.sub(r'[^a-z0-9_-]', '', Path(docker_compose_dir).name.lower())
+
+def parse_api_ports(ports: List[Dict[str, Any]]) -> Dict[int, int]:
+    """APIのPorts情報を{コンテナポート: ホストポート}の辞書に変換する"""
+    result = {}
+    for port in ports or []:
+        if port.get('Type') == 'tcp' and port.get('PublicPort'):
+            result[int(port['PrivatePort'])] = int(port['PublicPort'])
+    return result
+
+def parse_inspect_ports(ports: Dict[str, Any]) -> Dict[int, int]:
+    """inspectのNetworkSettings.Portsを{コンテナポート: ホストポート}の辞書に変換する"""
+    result = {}
+    for key, bindings in (ports or {}).items():
+        port, _, proto = key.partition('/')
+        if proto != 'tcp' or not bindings:
+            continue
+        for binding in bindings:
+            if binding.get('HostPort'):
+                result[int(port)] = int(binding['HostPort'])
+                break
+    return result
+
+class DockerEngineClient:
+    """Docker Engine APIのクライアント
+
+    接続はプールに保持して再利用する。
+    """
+    def __init__(self, socket_path: Optional[str] = None, pool_size: int = 4, timeout: float = 10.0):
+        self.socket_path = socket_path if socket_path is not None else get_default_socket_path()
+        self.timeout = timeout
+        self._pool: "queue.LifoQueue[UnixHTTPConnection]" = queue.LifoQueue(maxsize=pool_size)
+
+    def is_available(self) -> bool:
+        """Unixソケットが利用可能かどうかを確認する"""
+        return bool(self.socket_path) and os.path.exists(self.socket_path)
+
+    def _get_connection(self) -> UnixHTTPConnection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return UnixHTTPConnection(self.socket_path, self.timeout)
+
+    def _release_connection(self, conn: UnixHTTPConnection) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+        """APIを呼び出す
+
+        Args:
+            method (str): HTTPメソッド
+            path (str): APIのパス（例：/containers/json）
+            params (Optional[Dict[str, Any]]): クエリパラメータ
+
+        Returns:
+            Tuple[int, Any]: ステータスコードとJSONとして解釈したレスポンス
+
+        Raises:
+            DockerAPIUnavailable: ソケットに接続できない場合
+        """
+        if not self.is_available():
+            raise DockerAPIUnavailable(f"Dockerソケットが見つかりません: {self.socket_path}")
+
+        url = path
+        if params:
+            url += '?' + urlencode(params)
+
+        # プールの接続がデーモン側で閉じられている場合があるため、1回だけ再接続して再試行する
+        for attempt in range(2):
+            conn = self._get_connection()
+            try:
+                conn.request(method, url, headers={'Host': 'docker'})
+                response = conn.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if attempt == 0:
+                    continue
+                raise DockerAPIUnavailable(f"Docker Engine APIの呼び出しに失敗しました: {e}")
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._release_connection(conn)
+
+            data = None
+            if body:
+                try:
+                    data = json.loads(body)
+                except json.JSONDecodeError:
+                    data = body.decode('utf-8', errors='replace')
+            return response.status, data
+
+    def list_containers(self, all: bool = True, filters: Optional[Dict[str, List[str]]] = None) -> List[Dict[str, Any]]:
+        """コンテナの一覧を取得する（GET /containers/json）"""
+        params = {'all': '1' if all else '0'}
+        if filters:
+            params['filters'] = json.dumps(filters)
+        status, data = self.request('GET', '/containers/json', params)
+        if status != 200:
+            raise DockerAPIUnavailable(f"コンテナ一覧の取得に失敗しました: {status} {data}")
+        return data or []
+
+    def inspect_container(self, name: str) -> Optional[Dict[str, Any]]:
+        """コンテナの詳細を取得する（GET /containers/{name}/json）
+
+        Returns:
+            Optional[Dict[str, Any]]: コンテナの詳細。コンテナが存在しない場合はNone
+        """
+        status, data = self.request('GET', f"/containers/{quote(name, safe='')}/json")
+        if status == 404:
+            return None
+        if status != 200:
+            raise DockerAPIUnavailable(f"コンテナ情報の取得に失敗しました: {status} {data}")
+        return data
+
+    def image_exists(self, image: str) -> bool:
+        """イメージが存在するかどうかを確認する（GET /images/{name}/json）"""
+        status, data = self.request('GET', f"/images/{quote(image, safe='')}/json")
+        if status == 404:
+            return False
+        if status != 200:
+            raise DockerAPIUnavailable(f"イメージ情報の取得に失敗しました: {status} {data}")
+        return True
+
+    def list_compose_containers(self, project_name: str) -> List[Dict[str, Any]]:
+        """Docker Composeプロジェクトのコンテナ情報を1回の呼び出しで取得する
+
+        Args:
+            project_name (str): Docker Composeのプロジェクト名
+
+        Returns:
+            List[Dict[str, Any]]: name, id, state, ports, image, serviceを持つ辞書のリスト
+        """
+        containers = self.list_containers(
+            all=True,
+            filters={'label': [f"{COMPOSE_PROJECT_LABEL}={project_name}"]}
+        )
+        result = []
+        for container in containers:
+            names = container.get('Names') or ['']
+            labels = container.get('Labels') or {}
+            result.append({
+                'name': names[0].lstrip('/'),
+                'id': container.get('Id', '')[:12],
+                'state': container.get('State', ''),
+                'ports': parse_api_ports(container.get('Ports')),
+                'image': container.get('Image', ''),
+                'service': labels.get(COMPOSE_SERVICE_LABEL, '')
+            })
+        return result
+
+    def get_host_port(self, name: str, container_port: str) -> Optional[int]:
+        """コンテナポートに割り当てられたホストポートを取得する
+
+        Args:
+            name (str): コンテナ名
+            container_port (str): コンテナポート（例：8080/tcp）
+
+        Returns:
+            Optional[int]: ホストポート。割り当てがない場合はNone
+        """
+        info = self.inspect_container(name)
+        if not info:
+            return None
+        bindings = (info.get('NetworkSettings', {}).get('Ports') or {}).get(container_port) or []
+        for binding in bindings:
+            if binding.get('HostPort'):
+                return int(binding['HostPort'])
+        return None
+
+class DockerEventSubscriber:
+    """Docker Engine APIのイベントストリーム（GET /events）を購読するクラス
+
+    Docker Composeプロジェクトのコンテナイベントのみを受け取り、バックグラウンドスレッドから
+    on_eventを呼び出す。接続が切れた場合は指数バックオフで再接続し、
+    再接続後は取りこぼしたイベントを補うためにon_resyncを呼び出す。
+    """
+    # 状態の変化を伴うコンテナイベント
+    CONTAINER_ACTIONS = {
+        'create', 'start', 'restart', 'die', 'stop', 'kill', 'oom',
+        'pause', 'unpause', 'destroy', 'health_status'
+    }
+
+    def __init__(self, project_name: str, on_event: Callable[[str, str, Dict[str, Any]], None],
+                 on_resync: Callable[[], None], socket_path: Optional[str] = None,
+                 min_backoff: float = 0.5, max_backoff: float = 30.0):
+        self.project_name = project_name
+        self.on_event = on_event
+        self.on_resync = on_resync
+        self.socket_path = socket_path if socket_path is not None else get_default_socket_path()
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[UnixHTTPConnection] = None
+        self._conn_lock = threading.Lock()
+
+    def start(self) -> bool:
+        """購読を開始する
+
+        Returns:
+            bool: 購読を開始した場合はTrue。ソケットを利用できない場合はFalse
+        """
+        if not self.socket_path or not os.path.exists(self.socket_path):
+            return False
+        self._thread = threading.Thread(target=self._run, name=f"docker-events-{self.project_name}", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """購読を停止する"""
+        self._stop_event.set()
+        with self._conn_lock:
+            conn = self._conn
+        if conn is not None and conn.sock is not None:
+            # ブロックしているreadlineを解除する
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _run(self) -> None:
+        backoff = self.min_backoff
+        connected_before = False
+        params = urlencode({'filters': json.dumps({
+            'type': ['container'],
+            'label': [f"{COMPOSE_PROJECT_LABEL}={self.project_name}"]
+        })})
+
+        while not self._stop_event.is_set():
+            conn = UnixHTTPConnection(self.socket_path, timeout=None)
+            with self._conn_lock:
+                self._conn = conn
+            try:
+                conn.request('GET', f"/events?{params}", headers={'Host': 'docker'})
+                response = conn.getresponse()
+                if response.status != 200:
+                    raise DockerAPIUnavailable(f"イベントの購読に失敗しました: {response.status}")
+
+                if connected_before:
+                    self._call(self.on_resync)
+                connected_before = True
+                backoff = self.min_backoff
+
+                while not self._stop_event.is_set():
+                    line = response.readline()
+                    if not line:
+                        break  # デーモン側でストリームが閉じられた
+                    line = line.strip()
+                    if line:
+                        self._dispatch(json.loads(line))
+            except (OSError, http.client.HTTPException, DockerAPIUnavailable, ValueError) as e:
+                if not self._stop_event.is_set():
+                    print(f"Dockerイベントの購読が切断されました（{backoff:.1f}秒後に再接続します）: {e}")
+            finally:
+                with self._conn_lock:
+                    self._conn = None
+                conn.close()
+
+            if self._stop_event.wait(backoff):
+                break
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        # health_statusは"health_status: healthy"の形式で届く
+        action = (event.get('Action') or event.get('status') or '').split(':')[0].strip()
+        if action not in self.CONTAINER_ACTIONS:
+            return
+        name = event.get('Actor', {}).get('Attributes', {}).get('name', '')
+        if name:
+            self._call(self.on_event, name, action, event)
+
+    def _call(self, func, *args) -> None:
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"Dockerイベントの処理中にエラーが発生: {e}")
+
+# シングルトンインスタンス
+docker_client = DockerEngineClient()
@@ -1,6 +1,7 @@
 import os
 import subprocess
 import shutil
+import tempfile
 from pathlib import Path
 from .dialogs import show_error_dialog
 
@@ -59,4 +60,61 @@ def create_symlink(src: str, dst: str, page = None):
             dst_path.symlink_to(src_path)
 
     except Exception as e:
-        raise Exception(f"ファイルのリンクの作成に失敗しました: {e}") 
\ No newline at end of file
+        raise Exception(f"ファイルのリンクの作成に失敗しました: {e}")
+
+def atomic_write_bytes(path, data: bytes) -> None:
+    """一時ファイルへの書き込みとos.replaceでファイルを原子的に置き換える
+
+    書き込み途中でプロセスが終了しても、対象ファイルが途中まで書かれた状態で残ることはない。
+    既存ファイルがある場合はそのパーミッションを引き継ぐ。
+
+    Args:
+        path: 書き込み先のパス
+        data (bytes): 書き込む内容
+    """
+    path = Path(path)
+    fd, temp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            mode = path.stat().st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o644  # mkstempの既定値(0600)ではなく通常のファイルと同じ権限にする
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+def get_cache_path(*parts: str) -> Path:
+    """Mochimakiのキャッシュディレクトリのパスを取得する（ディレクトリは作成しない）
+
+    XDG_CACHE_HOMEが設定されている場合はその下、それ以外は~/.cacheの下のパスを返す。
+
+    Args:
+        *parts (str): キャッシュディレクトリ内のサブディレクトリ名
+
+    Returns:
+        Path: キャッシュディレクトリのパス
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or str(Path.home() / '.cache')
+    return Path(base, 'mochimaki', *parts)
+
+def get_cache_dir(*parts: str) -> Path:
+    """Mochimakiのキャッシュディレクトリを取得する（存在しない場合は作成する）
+
+    Args:
+        *parts (str): キャッシュディレクトリ内のサブディレクトリ名
+
+    Returns:
+        Path: キャッシュディレクトリのパス
+    """
+    cache_dir = get_cache_path(*parts)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
@@ -1,20 +1,44 @@
+import hashlib
 import json
+import os
 import yaml
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 from pathlib import Path
 from yaml.dumper import SafeDumper
+from .project_info_store import get_project_info_store
+from .project_info_keys import VOLATILE_SERVICE_KEYS
+from .wheelhouse import CONTAINER_WHEELHOUSE_DIR, COMPLETE_MARKER, get_wheelhouse_root, is_wheelhouse_enabled
+
+# 生成されるdocker-compose.ymlの内容が変わる変更を加えた場合は値を上げる
+GENERATOR_VERSION = "4"
+# 仮想環境を作成した時のrequirements.txtとPythonのバージョンのハッシュを記録するファイル（仮想環境の中に作成）
+VENV_HASH_FILE = ".mochimaki_requirements_hash"
+
+class ServiceCommand(str):
+    """
+    bash -cで実行するサービスのコマンド。
+    文字列としては「/bin/bash -c '<スクリプト>'」と同じ値を持ち、
+    docker-compose.ymlにはCustomDumperがリテラルブロック（|）で出力します。
+    """
+    def __new__(cls, script: str):
+        command = super().__new__(cls, f"/bin/bash -c '{script}'")
+        command.script = script
+        return command
 
 class DockerComposeGenerator:
-    def __init__(self, project_info_path: str):
+    def __init__(self, project_info_path: str, project_info: Dict[str, Any] = None):
         self.project_info_path = project_info_path
-        self.project_info = self._load_project_info(project_info_path)
+        if project_info is None:
+            project_info = self._load_project_info(project_info_path)
+        self.project_info = project_info
+        self.requirement_conflicts: List[Dict[str, Any]] = []
         
     def _load_project_info(self, path: str) -> Dict[str, Any]:
         try:
             project_info_path = Path(path)
-            with project_info_path.open('r', encoding='utf-8') as f:
-                return json.load(f)
+            store = get_project_info_store(project_info_path.parent, project_info_path.name)
+            return store.load()
         except FileNotFoundError:
             raise FileNotFoundError(f"project_info.jsonが見つかりません: {path}")
         except json.JSONDecodeError:
@@ -45,26 +69,108 @@ class DockerComposeGenerator:
                     ])
         return "\n".join(commands)
 
+    def _group_apps_by_venv(self, apps: Dict[str, Any]) -> Dict[str, List[str]]:
+        """仮想環境名ごとに、その仮想環境を使用するアプリケーション名を定義順にまとめます。"""
+        groups: Dict[str, List[str]] = {}
+        for app_name, app_info in apps.items():
+            groups.setdefault(app_info['venv'], []).append(app_name)
+        return groups
+
     def _generate_venv_setup_commands(self, user: str, apps: Dict[str, Any]) -> str:
         def normalize_path(path):
             return str(Path(path)).replace('\\', '/')
 
+        # 同じ仮想環境を使用するアプリケーションのrequirements.txtはまとめて1回でインストールする。
+        # 仮想環境は名前付きボリュームに保存されるため、requirements.txtとPythonのバージョンが
+        # 前回作成した時と同じ場合は作成とインストールを省略する
         commands = []
-        for app_name, app_info in apps.items():
-            venv_name = app_info['venv']
+        for venv_name, app_names in self._group_apps_by_venv(apps).items():
             venv_path = normalize_path(Path("/home") / user / "venv" / venv_name)
-            app_path = normalize_path(Path("/home") / user / "apps" / app_name / Path(app_info['main']).stem)
+            requirements = [
+                normalize_path(Path("/home") / user / "apps" / app_name / Path(apps[app_name]['main']).stem
+                               / "requirements.txt")
+                for app_name in app_names
+            ]
+            requirement_args = " ".join(f"-r {path}" for path in requirements)
+            hash_file = f"{venv_path}/{VENV_HASH_FILE}"
+            app_list = ", ".join(app_names)
             
             commands.extend([
-                f'echo "Setting up virtual environment for {app_name}..."',
+                f'REQ_HASH="$$({{ echo $${{FULL_VERSION}}; cat {" ".join(requirements)}; }} | sha256sum | cut -d" " -f1)"',
+                f'if [ -x {venv_path}/bin/python3 ] && [ "$$(cat {hash_file} 2>/dev/null)" = "$${{REQ_HASH}}" ]; then',
+                f'echo "Requirements for {app_list} are unchanged, reusing virtual environment {venv_name}"',
+                'else',
+                f'echo "Setting up virtual environment {venv_name} for {app_list}..."',
                 f'python3 -m venv {venv_path} --clear --system-site-packages',
-                f'echo "Installing requirements for {app_name}..."',
-                f'{venv_path}/bin/pip install --no-cache-dir -r {app_path}/requirements.txt',
-                f'# {app_name}のパッケージリストを保存',
-                f'{venv_path}/bin/pip freeze > /opt/version_info/{app_name}_requirements.txt'
+                # ホスト側で作成したホイールがあればネットワークを使わずにインストールする
+                f'WHEELHOUSE="{CONTAINER_WHEELHOUSE_DIR}/$${{REQ_HASH}}"',
+                f'if [ -f "$${{WHEELHOUSE}}/{COMPLETE_MARKER}" ]; then',
+                f'echo "Installing requirements for {app_list} from the wheelhouse..."',
+                f'{venv_path}/bin/pip install --no-index --find-links "$${{WHEELHOUSE}}" {requirement_args}',
+                'else',
+                f'echo "Installing requirements for {app_list}..."',
+                f'{venv_path}/bin/pip install --no-cache-dir {requirement_args}',
+                'fi',
+                '# インストールが完了してからハッシュを記録する',
+                f'echo "$${{REQ_HASH}}" > {hash_file}',
+                'fi',
+                f'# {venv_name}のパッケージリストを保存'
             ])
+            first_app = app_names[0]
+            commands.append(f'{venv_path}/bin/pip freeze > /opt/version_info/{first_app}_requirements.txt')
+            for app_name in app_names[1:]:
+                commands.append(f'cp /opt/version_info/{first_app}_requirements.txt /opt/version_info/{app_name}_requirements.txt')
         return "\n".join(commands)
 
+    def wheelhouse_requirements(self, service_name: str) -> List[Tuple[str, List[Path]]]:
+        """
+        サービスの仮想環境ごとに、ホイールの作成に使用するイメージ名とプログラムのディレクトリ（ホスト側）を取得します。
+        ディレクトリの順序はコンテナ内でrequirements.txtを指定する順序と同じです。
+        """
+        service_info = self.project_info["services"][service_name]
+        apps = service_info["apps"]
+        programs_dir = Path(self.project_info_path).parent / "programs"
+        return [
+            (service_info["image"], [programs_dir / self._program_dir_name(apps[app_name]) for app_name in app_names])
+            for app_names in self._group_apps_by_venv(apps).values()
+        ]
+
+    def _find_requirement_conflicts(self, service_name: str, apps: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        同じ仮想環境を使用するアプリケーションのrequirements.txt（ホスト側のprograms以下）で、
+        同じパッケージに異なるバージョン指定をしているものを探します。
+
+        Returns:
+            List[Dict[str, Any]]: service, venv, package, specs（アプリケーション名 -> 指定）と
+                definite（==で異なるバージョンに固定しているかどうか）のリスト
+        """
+        programs_dir = Path(self.project_info_path).parent / "programs"
+        conflicts = []
+        for venv_name, app_names in self._group_apps_by_venv(apps).items():
+            if len(app_names) < 2:
+                continue
+            specs: Dict[str, Dict[str, str]] = {}
+            for app_name in app_names:
+                requirements_path = programs_dir / self._program_dir_name(apps[app_name]) / "requirements.txt"
+                for package, spec in _parse_requirements(requirements_path).items():
+                    specs.setdefault(package, {})[app_name] = spec
+            for package, app_specs in specs.items():
+                # バージョンを指定していないアプリケーションは他の指定と競合しない
+                specified = {spec for spec in app_specs.values() if spec}
+                if len(specified) < 2:
+                    continue
+                # ==で異なるバージョンに固定している場合は必ず競合する。それ以外の異なる指定は
+                # 両立する場合もあるため、pipの依存関係の解決に任せて注意として報告する
+                pins = {spec for spec in specified if spec.startswith('==') and ',' not in spec and '*' not in spec}
+                conflicts.append({
+                    "service": service_name,
+                    "venv": venv_name,
+                    "package": package,
+                    "specs": app_specs,
+                    "definite": len(pins) > 1
+                })
+        return conflicts
+
     def _generate_pythonpath_commands(self, user: str, apps: Dict[str, Any]) -> str:
         commands = []
         # 仮想環境名でグループ化してPYTHONPATHを設定
@@ -110,7 +216,7 @@ class DockerComposeGenerator:
                 )
         return "\n".join(commands)
 
-    def _generate_service_command(self, user: str, apps: Dict[str, Any]) -> str:
+    def _generate_service_command(self, user: str, apps: Dict[str, Any]) -> ServiceCommand:
         # 最初の仮想環境名を取得（テスト用）
         first_venv = next(iter(apps.values()))['venv']
         first_venv_path = f"/home/{user}/venv/{first_venv}"
@@ -147,23 +253,34 @@ class DockerComposeGenerator:
         ]
         
         command_str = '\n'.join(filter(None, commands))
-        return f'/bin/bash -c \'{command_str}\''
+        return ServiceCommand(command_str)
+
+    @staticmethod
+    def _program_dir_name(app_info: Dict[str, Any]) -> str:
+        # 後方互換性のため、program_dir_nameが指定されていない場合は
+        # メインプログラムのパスから親ディレクトリ名を取得
+        if 'program_dir_name' in app_info:
+            return app_info['program_dir_name']
+        # 既存の動作を維持：メインプログラムの親ディレクトリ名を使用
+        return Path(app_info['main']).parent.name
+
+    @staticmethod
+    def _venv_volume_name(service_name: str) -> str:
+        return f"{service_name}_venv"
 
     def _generate_volumes(self, user: str, apps: Dict[str, Any], service_name: str) -> list:
         volumes = [
             f"./version_info/{service_name}:/home/{user}/version_info",
             f"./container_info/{service_name}/container_info.json:/home/{user}/container_info.json",
-            f"./signal/{service_name}:/home/{user}/signal"  # シグナル用ボリュームを追加
+            f"./signal/{service_name}:/home/{user}/signal",  # シグナル用ボリュームを追加
+            # 仮想環境はコンテナを作り直しても残るよう名前付きボリュームに保存する
+            f"{self._venv_volume_name(service_name)}:/home/{user}/venv"
         ]
+        if is_wheelhouse_enabled():
+            volumes.append(f"{get_wheelhouse_root()}:{CONTAINER_WHEELHOUSE_DIR}:ro")
         
         for app_name, app_info in apps.items():
-            # 後方互換性のため、program_dir_nameが指定されていない場合は
-            # メインプログラムのパスから親ディレクトリ名を取得
-            if 'program_dir_name' in app_info:
-                program_dir_name = app_info['program_dir_name']
-            else:
-                # 既存の動作を維持：メインプログラムの親ディレクトリ名を使用
-                program_dir_name = Path(app_info['main']).parent.name
+            program_dir_name = self._program_dir_name(app_info)
             
             # コンテナ側のパスはメインプログラム名（拡張子除く）を使用
             main_program_path = Path(app_info['main']).stem
@@ -214,54 +331,107 @@ class DockerComposeGenerator:
                 service_config["ports"].append(f"{app_info['container_port']}")
             
             compose["services"][service_name] = service_config
+            compose.setdefault("volumes", {})[self._venv_volume_name(service_name)] = {}
         
         return compose
     
-    def save(self, output_path: str = None):
+    def check_requirement_conflicts(self) -> List[Dict[str, Any]]:
+        """
+        全てのサービスについて、同じ仮想環境を使用するアプリケーション間で異なるパッケージの指定を探して表示します。
+        requirements.txtはdocker-compose.ymlの入力のハッシュに含まれないため、saveでは生成を省略する場合も確認します。
+
+        Returns:
+            List[Dict[str, Any]]: 見つかった指定（requirement_conflictsにも保持します）
+        """
+        self.requirement_conflicts = []
+        for service_name, service_info in self.project_info.get("services", {}).items():
+            for conflict in self._find_requirement_conflicts(service_name, service_info["apps"]):
+                self.requirement_conflicts.append(conflict)
+                specs = ", ".join(f"{app_name}: {spec or '指定なし'}" for app_name, spec in conflict["specs"].items())
+                state = "競合しています" if conflict["definite"] else "異なります"
+                print(f"警告: {service_name}の仮想環境{conflict['venv']}で{conflict['package']}の指定が{state} ({specs})")
+        return self.requirement_conflicts
+
+    def fingerprint(self) -> str:
+        """
+        docker-compose.ymlの生成に使用する入力（services、ホイールのディレクトリとジェネレーターのバージョン）のハッシュを計算します。
+        アプリケーションの順序は生成される内容に影響するため、キーの順序を保ったままハッシュを計算します。
+        """
+        services = {
+            service_name: {key: value for key, value in service_info.items() if key not in VOLATILE_SERVICE_KEYS}
+            for service_name, service_info in self.project_info.get("services", {}).items()
+        }
+        wheelhouse = str(get_wheelhouse_root()) if is_wheelhouse_enabled() else None
+        data = json.dumps({"version": GENERATOR_VERSION, "services": services, "wheelhouse": wheelhouse},
+                          ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _fingerprint_path(output_path: Path) -> Path:
+        return output_path.with_name(f".{output_path.name}.fingerprint")
+
+    def save(self, output_path: str = None, force: bool = False) -> bool:
         """
         docker-compose.ymlを生成して保存します。
         output_pathが指定されていない場合は、project_info.jsonと同じディレクトリに保存します。
+        入力のハッシュが前回保存した時と同じ場合は、ファイルを変更せずにスキップします
+        （Docker Composeが設定の変更と判断してコンテナを作り直さないようにするため）。
+
+        Returns:
+            bool: docker-compose.ymlを書き込んだ場合はTrue。スキップした場合はFalse
         """
         if output_path is None:
             # project_info.jsonと同じディレクトリにdocker-compose.ymlを生成
             output_path = Path(self.project_info_path).parent / 'docker-compose.yml'
-            
+        output_path = Path(output_path)
+        self.check_requirement_conflicts()
+        fingerprint_path = self._fingerprint_path(output_path)
+        fingerprint = self.fingerprint()
+        if not force and output_path.exists() and fingerprint_path.exists():
+            try:
+                if fingerprint_path.read_text(encoding='utf-8').strip() == fingerprint:
+                    return False
+            except OSError:
+                pass
+
         compose_data = self.generate()
-        
-        yaml_str = yaml.dump(
-            compose_data, 
-            Dumper=CustomDumper,
-            allow_unicode=True,
-            sort_keys=False, 
-            indent=2,
-            default_flow_style=False,
-            default_style='',
-            width=float("inf")
-        )
-        
-        pattern = r"command: '(/bin/bash -c) ''(.+?)'''$"
-        
-        def replace_command(match):
-            bash_cmd = match.group(1)
-            command = match.group(2)
-            lines = command.split('\n')
-            processed_lines = []
-            processed_lines.append(f"      {bash_cmd} '")
-            for line in lines:
-                line = line.strip()
-                if line:
-                    processed_lines.append(f"      {line}")
-            processed_lines.append("      '")
-            return f"command: |\n{chr(10).join(processed_lines)}"
-        
-        fixed_yaml = re.sub(pattern, replace_command, yaml_str, flags=re.MULTILINE | re.DOTALL)
-        
+
+        # 書き込み途中のファイルをDocker Composeが読まないよう、一時ファイルに書き込んでから置き換える
+        temp_path = output_path.with_name(f"{output_path.name}.tmp")
         try:
-            output_path = Path(output_path)
-            with output_path.open('w', encoding='utf-8', newline='\n') as f:
-                f.write(fixed_yaml)
+            with temp_path.open('w', encoding='utf-8', newline='\n') as f:
+                dump_compose(compose_data, f)
+            os.replace(temp_path, output_path)
+            # docker-compose.ymlの書き込みが完了してからハッシュを保存する
+            fingerprint_path.write_text(fingerprint + '\n', encoding='utf-8')
         except Exception as e:
+            temp_path.unlink(missing_ok=True)
             raise Exception(f"docker-compose.ymlの保存中にエラーが発生しました: {str(e)}")
+        return True
+
+_REQUIREMENT_NAME_PATTERN = re.compile(r'^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*(.*)$')
+
+def _parse_requirements(path: Path) -> Dict[str, str]:
+    """
+    requirements.txtからパッケージ名（正規化した名前）とバージョン指定を読み取ります。
+    オプションの行（-r, -e, --index-urlなど）とURLによる指定は無視します。
+    ファイルがない場合は空の辞書を返します。
+    """
+    try:
+        text = path.read_text(encoding='utf-8')
+    except (OSError, UnicodeDecodeError):
+        return {}
+    requirements = {}
+    for line in text.splitlines():
+        line = line.split(' #', 1)[0].strip()
+        if not line or line.startswith(('#', '-')):
+            continue
+        match = _REQUIREMENT_NAME_PATTERN.match(line)
+        if not match or match.group(3).startswith('@'):
+            continue
+        package = re.sub(r'[-_.]+', '-', match.group(1)).lower()
+        requirements[package] = re.sub(r'\s+', '', match.group(3))
+    return requirements
 
 class CustomDumper(SafeDumper):
     def increase_indent(self, flow=False, indentless=False):
@@ -272,6 +442,41 @@ class CustomDumper(SafeDumper):
         if len(self.indents) == 1:
             super().write_line_break()
 
+def represent_service_command(dumper: CustomDumper, data: ServiceCommand):
+    """
+    サービスのコマンドをリテラルブロックとして出力します。
+    スクリプトの各行は前後の空白を除き、空行は出力しません。
+    シングルクォートは従来の出力と同じく''と書きます（bash -c '...'の中では前後の文字列と連結されるため、
+    シェルでの意味は変わりません）。
+    リテラルブロックで表せない文字を含む場合は、PyYAMLが引用符付きの形式で出力します。
+    """
+    lines = [line.strip().replace("'", "''") for line in data.script.split('\n')]
+    body = ''.join(f"{line}\n" for line in lines if line)
+    return dumper.represent_scalar('tag:yaml.org,2002:str', f"/bin/bash -c '\n{body}'\n", style='|')
+
+CustomDumper.add_representer(ServiceCommand, represent_service_command)
+
+def dump_compose(compose_data: Dict[str, Any], stream=None):
+    """
+    docker-compose.ymlの内容をYAMLとして出力します。
+    streamを指定した場合は出力をstreamへ書き込みます（YAMLの表現はcompose_data全体を一度に組み立てるため、
+    メモリ上に出力全体を保持しないのは最終的な文字列だけです）。
+
+    Returns:
+        streamを指定しなかった場合はYAMLの文字列。指定した場合はNone
+    """
+    return yaml.dump(
+        compose_data,
+        stream,
+        Dumper=CustomDumper,
+        allow_unicode=True,
+        sort_keys=False,
+        indent=2,
+        default_flow_style=False,
+        default_style='',
+        width=float("inf")
+    )
+
 if __name__ == "__main__":
     generator = DockerComposeGenerator("project_info.json")
-    generator.save()
\ No newline at end of file
+    generator.save()
@@ -0,0 +1,233 @@
+"""
+gitリポジトリのミラーをマシン全体で共有するキャッシュを提供するモジュール
+
+リポジトリごとに ~/.cache/mochimaki/git/<URLのハッシュ>.git にミラー（bare）を保持し、
+ビルドコンテキストへのクローンはミラーのオブジェクトを参照して行う。
+2つ目以降のビルドコンテキストでは差分のみを取得し、ネットワークに接続できない場合は
+ミラーからクローンする。
+リポジトリの中の1ファイルだけが必要な場合は、クローンせずに既存のミラーまたは浅い部分クローンから読み出す。
+"""
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from .file_utils import get_cache_dir
+
+# ミラーのキャッシュを使用しない場合は0を設定する
+GIT_CACHE_ENV = 'MOCHIMAKI_GIT_CACHE'
+# 同じURLのミラーを続けて更新しない間隔（秒）
+MIRROR_FETCH_INTERVAL = 60.0
+
+_PROGRESS_PATTERN = re.compile(r'^(?:remote: )?([A-Za-z ]+):\s+(\d+)%')
+
+def run_git(args: List[str], cwd=None, on_progress: Optional[Callable[[str, int], None]] = None) -> None:
+    """gitコマンドを実行し、進捗をon_progress(処理名, パーセント)で通知する
+
+    Raises:
+        subprocess.CalledProcessError: gitコマンドが失敗した場合（stderrに出力を格納する）
+    """
+    cmd = ['git'] + args
+    if on_progress is not None and args and args[0] in ('clone', 'fetch'):
+        cmd.insert(2, '--progress')
+    process = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    output = []
+    buffer = b''
+    last_reported = None
+    while True:
+        chunk = process.stderr.read1(4096) if hasattr(process.stderr, 'read1') else process.stderr.read(4096)
+        if not chunk:
+            break
+        buffer += chunk
+        # gitは進捗を\rで上書きしながら出力する
+        *lines, buffer = re.split(rb'[\r\n]', buffer)
+        for raw in lines:
+            line = raw.decode('utf-8', errors='replace').strip()
+            if not line:
+                continue
+            output.append(line)
+            match = _PROGRESS_PATTERN.match(line)
+            if match and on_progress is not None:
+                phase, percent = match.group(1).strip(), int(match.group(2))
+                # 同じ処理では10%ごとに通知する
+                reported = (phase, percent // 10)
+                if reported != last_reported:
+                    last_reported = reported
+                    on_progress(phase, percent)
+    if buffer.strip():
+        output.append(buffer.decode('utf-8', errors='replace').strip())
+    returncode = process.wait()
+    if returncode != 0:
+        # 進捗の行を除いたエラー出力を残す
+        stderr = '\n'.join(line for line in output if not _PROGRESS_PATTERN.match(line))
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+
+def git_output(args: List[str], cwd=None) -> bytes:
+    """gitコマンドを実行し、標準出力を取得する
+
+    Raises:
+        subprocess.CalledProcessError: gitコマンドが失敗した場合
+    """
+    cmd = ['git'] + args
+    result = subprocess.run(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, cmd, output=result.stdout,
+                                            stderr=result.stderr.decode('utf-8', errors='replace').strip())
+    return result.stdout
+
+def resolve_remote_commit(url: str, branch: str) -> Optional[str]:
+    """リモートのブランチが指しているコミットを取得する（git ls-remote）
+
+    Returns:
+        Optional[str]: コミットのハッシュ。リモートに接続できない場合やブランチがない場合はNone
+    """
+    try:
+        output = git_output(['ls-remote', url, f'refs/heads/{branch}'])
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"リモートのコミットを取得できませんでした: {url}: {getattr(e, 'stderr', '') or e}")
+        return None
+    fields = output.decode('utf-8', errors='replace').split()
+    return fields[0] if fields else None
+
+def _read_blob(repo: Path, commit: str, path: str) -> Optional[bytes]:
+    """コミットに含まれるファイルの内容を読み出す（ファイルがない場合はNone）"""
+    # ツリーだけを参照して存在を確認する（部分クローンでもblobの取得は発生しない）
+    if not git_output(['ls-tree', commit, '--', path], cwd=repo).strip():
+        return None
+    return git_output(['cat-file', 'blob', f'{commit}:{path}'], cwd=repo)
+
+def is_cache_enabled() -> bool:
+    """ミラーのキャッシュを使用するかどうか"""
+    return os.environ.get(GIT_CACHE_ENV, '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+def get_mirror_path(url: str) -> Path:
+    """URLに対応するミラーのパスを取得する"""
+    digest = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    return get_cache_dir('git') / f"{digest}.git"
+
+class GitMirrorCache:
+    """URLごとのミラーを作成・更新するクラス
+
+    同じURLへの操作はロックで直列化する（異なるURLは並行して処理できる）。
+    """
+    def __init__(self, fetch_interval: float = MIRROR_FETCH_INTERVAL):
+        self.fetch_interval = fetch_interval
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._last_fetch: Dict[str, float] = {}
+
+    def _get_lock(self, url: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(url, threading.Lock())
+
+    def ensure_mirror(self, url: str, on_progress=None, force: bool = False) -> Optional[Path]:
+        """ミラーを作成または更新する
+
+        更新に失敗した場合（オフラインなど）は既存のミラーをそのまま使用する。
+        forceがTrueの場合は前回の更新からの間隔にかかわらず更新する。
+
+        Returns:
+            Optional[Path]: ミラーのパス。ミラーを作成できなかった場合はNone
+        """
+        mirror = get_mirror_path(url)
+        with self._get_lock(url):
+            if mirror.exists():
+                last_fetch = self._last_fetch.get(url)
+                if not force and last_fetch is not None and time.monotonic() - last_fetch < self.fetch_interval:
+                    return mirror
+                try:
+                    run_git(['fetch', '--prune', 'origin'], cwd=mirror, on_progress=on_progress)
+                    self._last_fetch[url] = time.monotonic()
+                except (subprocess.CalledProcessError, OSError) as e:
+                    print(f"ミラーの更新に失敗したため、キャッシュを使用します: {url}: {getattr(e, 'stderr', '') or e}")
+                return mirror
+
+            # 作成途中のミラーが残らないよう、一時ディレクトリに作成してから名前を変更する
+            temp = mirror.with_name(f"{mirror.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+            try:
+                run_git(['clone', '--mirror', url, str(temp)], on_progress=on_progress)
+                os.replace(temp, mirror)
+                self._last_fetch[url] = time.monotonic()
+                return mirror
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"ミラーの作成に失敗しました: {url}: {getattr(e, 'stderr', '') or e}")
+                shutil.rmtree(temp, ignore_errors=True)
+                return None
+
+    def clone(self, url: str, dest: Path, branch: Optional[str] = None, extra_args: Optional[List[str]] = None,
+              on_progress=None) -> None:
+        """ミラーを参照してリポジトリをクローンする
+
+        クローン先はミラーに依存しない（--dissociate）ため、キャッシュを削除しても影響しない。
+        リモートに接続できない場合はミラーからクローンし、originを元のURLに設定し直す。
+
+        Raises:
+            subprocess.CalledProcessError: クローンに失敗した場合
+        """
+        branch_args = ['-b', branch] if branch else []
+        extra_args = list(extra_args or [])
+        mirror = self.ensure_mirror(url, on_progress) if is_cache_enabled() else None
+        if mirror is None:
+            run_git(['clone'] + extra_args + branch_args + [url, str(dest)], on_progress=on_progress)
+            return
+
+        try:
+            run_git(['clone', '--reference-if-able', str(mirror), '--dissociate'] + extra_args + branch_args
+                    + [url, str(dest)], on_progress=on_progress)
+        except subprocess.CalledProcessError as e:
+            print(f"リモートからのクローンに失敗したため、ミラーからクローンします: {url}: {e.stderr or e}")
+            shutil.rmtree(dest, ignore_errors=True)
+            run_git(['clone'] + extra_args + branch_args + [str(mirror), str(dest)], on_progress=on_progress)
+            run_git(['remote', 'set-url', 'origin', url], cwd=dest)
+
+    def read_file(self, url: str, branch: str, path: str, commit: Optional[str] = None,
+                  on_progress=None) -> Tuple[str, Optional[bytes]]:
+        """リポジトリをクローンせずに1つのファイルを読み出す
+
+        同じURLのミラーが既にある場合はミラーから読み出す（ミラーにcommitがなければ更新する）。
+        ミラーがない場合は1ファイルのためにミラーを作成せず、履歴とblobを取得しない浅い部分クローン
+        （--depth 1 --filter=blob:none）を作成し、必要なblobだけを取得する。
+
+        Args:
+            url (str): リポジトリのURL
+            branch (str): ブランチ名
+            path (str): リポジトリ内のファイルのパス
+            commit (Optional[str]): 読み出すコミット（省略時はブランチの先頭）
+
+        Returns:
+            Tuple[str, Optional[bytes]]: 読み出したコミットとファイルの内容（ファイルがない場合はNone）
+
+        Raises:
+            subprocess.CalledProcessError: 取得に失敗した場合
+        """
+        mirror = get_mirror_path(url)
+        if is_cache_enabled() and mirror.exists():
+            if not (commit and self._has_commit(mirror, commit)):
+                self.ensure_mirror(url, on_progress, force=commit is not None)
+            # ミラーを更新できずcommitがない場合は浅い部分クローンで取得する
+            if not commit or self._has_commit(mirror, commit):
+                ref = commit or f'refs/heads/{branch}'
+                resolved = git_output(['rev-parse', '--verify', f'{ref}^{{commit}}'], cwd=mirror)
+                resolved = resolved.decode('utf-8').strip()
+                return resolved, _read_blob(mirror, resolved, path)
+
+        with tempfile.TemporaryDirectory(prefix='mochimaki-git-') as temp:
+            run_git(['clone', '--depth', '1', '--filter=blob:none', '--no-checkout', '-b', branch, url, temp],
+                    on_progress=on_progress)
+            resolved = git_output(['rev-parse', 'HEAD'], cwd=temp).decode('utf-8').strip()
+            return resolved, _read_blob(Path(temp), resolved, path)
+
+    def _has_commit(self, mirror: Path, commit: str) -> bool:
+        try:
+            git_output(['cat-file', '-e', f'{commit}^{{commit}}'], cwd=mirror)
+            return True
+        except (subprocess.CalledProcessError, OSError):
+            return False
+
+# シングルトンインスタンス
+git_mirror_cache = GitMirrorCache()
@@ -0,0 +1,130 @@
+"""
+Mermaidグラフの差分（デルタ）を作成・適用する関数を提供するモジュール
+
+グラフ全体を毎回送信する代わりに、前回送信した内容からの行単位の差分を
+連番（seq）付きで送信する。受信側は前回適用した連番（base_seq）と一致する場合のみ差分を適用し、
+一致しない場合や適用後のハッシュが一致しない場合は全体の再送（resync）を要求する。
+差分はHTTPのPOST /api/deltaで送信するほか、utils/graph_stream.pyのSSEの配信（GET /api/events）で
+接続し続けている購読者へ順に配信する。
+
+メッセージの形式:
+    全体: {"type": "full", "seq": 3, "hash": "...", "mermaid_content": "..."}
+    差分: {"type": "delta", "seq": 4, "base_seq": 3, "hash": "...",
+           "ops": [{"op": "replace", "start": 5, "end": 7,
+                    "lines": [{"kind": "node", "text": "    N3[\"App: a\"]"}]}]}
+"""
+import difflib
+import hashlib
+import re
+from typing import Any, Dict, Optional
+
+_EDGE_PATTERN = re.compile(r'^\s*\S+\s*-->')
+_NODE_PATTERN = re.compile(r'^\s*[A-Za-z0-9_]+\[')
+
+def content_hash(mermaid_content: str) -> str:
+    """グラフの内容のハッシュを計算する"""
+    return hashlib.sha256(mermaid_content.encode('utf-8')).hexdigest()
+
+def classify_line(line: str) -> str:
+    """Mermaidの行の種類を判定する
+
+    Returns:
+        str: "edge", "node", "class", "header"のいずれか
+    """
+    stripped = line.strip()
+    if stripped.startswith('class ') or stripped.startswith('classDef '):
+        return 'class'
+    if _EDGE_PATTERN.match(line):
+        return 'edge'
+    if _NODE_PATTERN.match(line):
+        return 'node'
+    return 'header'
+
+def make_full(mermaid_content: str, seq: int) -> Dict[str, Any]:
+    """グラフ全体を送信するメッセージを作成する"""
+    return {
+        'type': 'full',
+        'seq': seq,
+        'hash': content_hash(mermaid_content),
+        'mermaid_content': mermaid_content
+    }
+
+def make_delta(old_content: str, new_content: str, base_seq: int, seq: int) -> Dict[str, Any]:
+    """前回の内容からの差分メッセージを作成する
+
+    Args:
+        old_content (str): 受信側が保持している内容（base_seqの内容）
+        new_content (str): 新しい内容
+        base_seq (int): old_contentの連番
+        seq (int): new_contentの連番
+
+    Returns:
+        Dict[str, Any]: 差分メッセージ
+    """
+    old_lines = old_content.split('\n')
+    new_lines = new_content.split('\n')
+    ops = []
+    matcher = difflib.SequenceMatcher(a=old_lines, b=new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        ops.append({
+            'op': tag,
+            'start': i1,
+            'end': i2,
+            'lines': [{'kind': classify_line(line), 'text': line} for line in new_lines[j1:j2]]
+        })
+    return {
+        'type': 'delta',
+        'seq': seq,
+        'base_seq': base_seq,
+        'hash': content_hash(new_content),
+        'ops': ops
+    }
+
+def apply_delta(content: str, delta: Dict[str, Any]) -> str:
+    """差分メッセージを内容に適用する"""
+    lines = content.split('\n')
+    # 後ろの操作から適用すれば、前の操作の行番号がずれない
+    for op in reversed(delta['ops']):
+        lines[op['start']:op['end']] = [line['text'] for line in op['lines']]
+    return '\n'.join(lines)
+
+class GraphDeltaReceiver:
+    """差分メッセージを受信してグラフを復元するクラス（ビューアー側の参照実装）
+
+    /api/updateと/api/delta、またはSSEで受信したメッセージをreceive()に渡す。
+    Falseが返された場合は送信側に全体の再送を要求する（SSEの場合は接続し直す）。
+    """
+    def __init__(self):
+        self.seq: Optional[int] = None
+        self.content: Optional[str] = None
+        self.resyncs = 0
+
+    def receive(self, message: Dict[str, Any]) -> bool:
+        """メッセージを適用する
+
+        Returns:
+            bool: 適用できた場合はTrue。全体の再送が必要な場合はFalse
+        """
+        if message.get('type') == 'full':
+            if content_hash(message['mermaid_content']) != message['hash']:
+                return self._need_resync()
+            self.content = message['mermaid_content']
+            self.seq = message['seq']
+            return True
+
+        if message.get('type') != 'delta' or self.content is None or message.get('base_seq') != self.seq:
+            # 連番が飛んだ（途中のメッセージを取りこぼした）場合
+            return self._need_resync()
+
+        content = apply_delta(self.content, message)
+        if content_hash(content) != message['hash']:
+            return self._need_resync()
+        self.content = content
+        self.seq = message['seq']
+        return True
+
+    def _need_resync(self) -> bool:
+        self.resyncs += 1
+        return False
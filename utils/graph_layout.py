@@ -0,0 +1,146 @@
+"""
+有向グラフを階層（レイヤー）状に配置するレイアウト計算を提供するモジュール
+
+Mermaidコンテナを使わずにFletの画面上でシステム構成グラフを描画するために使用する。
+描画には依存せず、ノードの座標のみを計算する。
+
+1. 最長パス法でノードをレイヤーに割り当てる（入力辺のないノードが最上段）
+2. 重心法（barycenter）で上下のレイヤーを交互に参照してレイヤー内の順序を並べ替え、辺の交差を減らす
+3. レイヤー内の順序から座標を求める
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+NODE_WIDTH = 220
+NODE_HEIGHT = 44
+H_GAP = 24
+V_GAP = 56
+ORDERING_SWEEPS = 4
+LAYOUT_CACHE_SIZE = 32
+
+class GraphLayout:
+    """レイアウトの計算結果"""
+    __slots__ = ('positions', 'layers', 'width', 'height')
+
+    def __init__(self, positions: Dict[Hashable, Tuple[float, float]], layers: List[List[Hashable]],
+                 width: float, height: float):
+        self.positions = positions  # ノードID -> ノード左上の(x, y)
+        self.layers = layers
+        self.width = width
+        self.height = height
+
+def assign_layers(nodes: Sequence[Hashable], edges: Sequence[Tuple[Hashable, Hashable]]) -> Dict[Hashable, int]:
+    """最長パス法で各ノードのレイヤー番号を求める
+
+    閉路がある場合は、閉路に含まれる辺を無視して残りのノードを配置する。
+    """
+    successors: Dict[Hashable, List[Hashable]] = {node: [] for node in nodes}
+    in_degree: Dict[Hashable, int] = {node: 0 for node in nodes}
+    for src, dst in edges:
+        if src in successors and dst in in_degree and src != dst:
+            successors[src].append(dst)
+            in_degree[dst] += 1
+
+    layer = {node: 0 for node in nodes}
+    queue = [node for node in nodes if in_degree[node] == 0]
+    visited = set()
+    while True:
+        while queue:
+            node = queue.pop(0)
+            visited.add(node)
+            for dst in successors[node]:
+                layer[dst] = max(layer[dst], layer[node] + 1)
+                in_degree[dst] -= 1
+                if in_degree[dst] == 0:
+                    queue.append(dst)
+        remaining = [node for node in nodes if node not in visited]
+        if not remaining:
+            break
+        # 閉路の途中のノードから再開する
+        in_degree[remaining[0]] = 0
+        queue.append(remaining[0])
+    return layer
+
+def order_layers(layers: List[List[Hashable]], edges: Sequence[Tuple[Hashable, Hashable]],
+                 sweeps: int = ORDERING_SWEEPS) -> List[List[Hashable]]:
+    """重心法でレイヤー内のノードの順序を並べ替える"""
+    predecessors: Dict[Hashable, List[Hashable]] = {}
+    successors: Dict[Hashable, List[Hashable]] = {}
+    for src, dst in edges:
+        predecessors.setdefault(dst, []).append(src)
+        successors.setdefault(src, []).append(dst)
+
+    layers = [list(layer) for layer in layers]
+    position = {node: index for layer in layers for index, node in enumerate(layer)}
+
+    def reorder(layer: List[Hashable], neighbors: Dict[Hashable, List[Hashable]]) -> None:
+        def barycenter(node):
+            linked = [position[n] for n in neighbors.get(node, ()) if n in position]
+            # 隣接ノードがない場合は現在の位置を保つ
+            return sum(linked) / len(linked) if linked else position[node]
+        # 重心が同じ場合は現在の順序を保つ（安定ソート）
+        layer.sort(key=barycenter)
+        for index, node in enumerate(layer):
+            position[node] = index
+
+    for sweep in range(sweeps):
+        if sweep % 2 == 0:
+            for layer in layers[1:]:
+                reorder(layer, predecessors)
+        else:
+            for layer in reversed(layers[:-1]):
+                reorder(layer, successors)
+    return layers
+
+def compute_layout(nodes: Sequence[Hashable], edges: Sequence[Tuple[Hashable, Hashable]]) -> GraphLayout:
+    """ノードと辺からレイアウトを計算する
+
+    Args:
+        nodes: ノードIDのリスト（この順序がレイヤー内の初期順序になる）
+        edges: (始点ID, 終点ID)のリスト
+
+    Returns:
+        GraphLayout: ノードの座標とグラフ全体の大きさ
+    """
+    layer_of = assign_layers(nodes, edges)
+    layer_count = max(layer_of.values(), default=-1) + 1
+    layers: List[List[Hashable]] = [[] for _ in range(layer_count)]
+    for node in nodes:
+        layers[layer_of[node]].append(node)
+    layers = order_layers(layers, edges)
+
+    widest = max((len(layer) for layer in layers), default=0)
+    width = max(widest * (NODE_WIDTH + H_GAP) - H_GAP, 0)
+    height = max(layer_count * (NODE_HEIGHT + V_GAP) - V_GAP, 0)
+
+    positions = {}
+    for layer_index, layer in enumerate(layers):
+        # レイヤーごとに中央揃えにする
+        layer_width = len(layer) * (NODE_WIDTH + H_GAP) - H_GAP
+        offset = (width - layer_width) / 2
+        y = layer_index * (NODE_HEIGHT + V_GAP)
+        for index, node in enumerate(layer):
+            positions[node] = (offset + index * (NODE_WIDTH + H_GAP), y)
+    return GraphLayout(positions, layers, width, height)
+
+def graph_hash(nodes: Sequence[Hashable], edges: Sequence[Tuple[Hashable, Hashable]]) -> str:
+    """グラフの構造（ノードと辺）のハッシュを計算する"""
+    data = json.dumps([list(map(str, nodes)), [[str(src), str(dst)] for src, dst in edges]], ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+_layout_cache: "OrderedDict[str, GraphLayout]" = OrderedDict()
+
+def get_layout(nodes: Sequence[Hashable], edges: Sequence[Tuple[Hashable, Hashable]]) -> GraphLayout:
+    """レイアウトを取得する（同じ構造のグラフは計算済みの結果を返す）"""
+    key = graph_hash(nodes, edges)
+    layout = _layout_cache.get(key)
+    if layout is not None:
+        _layout_cache.move_to_end(key)
+        return layout
+    layout = compute_layout(nodes, edges)
+    _layout_cache[key] = layout
+    if len(_layout_cache) > LAYOUT_CACHE_SIZE:
+        _layout_cache.popitem(last=False)
+    return layout
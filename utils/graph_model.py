@@ -0,0 +1,323 @@
+"""
+システム構成グラフのデータモデルと、project_infoからグラフを組み立てる処理を提供するモジュール
+
+ノードIDはサービス名・アプリケーション名・デバイス名などのキーから求めるため、
+project_infoの他の部分が変わっても同じノードには同じIDが付く。
+サービスごとの部分グラフ（フラグメント）はそのサービスの設定が変わった場合のみ作り直す。
+"""
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .project_info_keys import VOLATILE_SERVICE_KEYS
+
+# 詳細度（詳細 → 簡略の順）
+#   full: デバイスのターゲットごと、データルートごとにノードを作成する
+#   device_summary: アプリケーションごとにデバイスを1つのノードにまとめ、ターゲット数を表示する
+#   service: サービス（ホストマシン）ごとに1つのノードにまとめる
+DETAIL_LEVELS = ("full", "device_summary", "service")
+# 詳細度を自動で選ぶ場合のノード数の上限
+DEFAULT_NODE_BUDGET = 150
+
+MERMAID_HEADER = ["%%{init: {'theme': 'dark'}}%%", "graph TD"]
+MERMAID_CLASS_DEFS = [
+    '    classDef host fill:#2d3748,stroke:#e2e8f0,stroke-width:2px,color:#ffffff;',
+    '    classDef section fill:#38a169,stroke:#e2e8f0,stroke-width:3px,color:#ffffff;',
+    '    classDef docker_section fill:#3182ce,stroke:#e2e8f0,stroke-width:1px,color:#ffffff;',
+    '    classDef app fill:#805ad5,stroke:#e2e8f0,stroke-width:1px,color:#ffffff;',
+    '    classDef host_app fill:#805ad5,stroke:#e2e8f0,stroke-width:3px,color:#ffffff;',
+    '    classDef device fill:#d69e2e,stroke:#e2e8f0,stroke-width:1px,color:#ffffff;',
+    '    classDef container fill:#38a169,stroke:#e2e8f0,stroke-width:1px,color:#ffffff;',
+    '    classDef data fill:#2f855a,stroke:#e2e8f0,stroke-width:1px,color:#ffffff;',
+]
+
+class GraphNode:
+    """グラフのノード"""
+    __slots__ = ('id', 'key', 'label', 'ntype')
+
+    def __init__(self, key: Tuple[str, ...], label: str, ntype: str):
+        self.id = stable_node_id(key)
+        self.key = key
+        self.label = label
+        self.ntype = ntype
+
+class GraphEdge:
+    """グラフの辺"""
+    __slots__ = ('src', 'dst')
+
+    def __init__(self, src: str, dst: str):
+        self.src = src
+        self.dst = dst
+
+class GraphFragment:
+    """サービス（またはホストマシン）1つ分の部分グラフ"""
+    __slots__ = ('nodes', 'edges')
+
+    def __init__(self):
+        self.nodes: List[GraphNode] = []
+        self.edges: List[GraphEdge] = []
+
+    def add_node(self, key: Tuple[str, ...], label: str, ntype: str) -> str:
+        node = GraphNode(key, label, ntype)
+        self.nodes.append(node)
+        return node.id
+
+    def add_edge(self, src: str, dst: str) -> None:
+        self.edges.append(GraphEdge(src, dst))
+
+class SystemGraph:
+    """フラグメントを結合したグラフ全体
+
+    同じIDのノード（複数のアプリケーションが使うデータやデバイスなど）は1つにまとめる。
+    """
+    __slots__ = ('nodes', 'edges', '_node_index')
+
+    def __init__(self):
+        self.nodes: List[GraphNode] = []
+        self.edges: List[GraphEdge] = []
+        self._node_index: Dict[str, GraphNode] = {}
+
+    def merge(self, fragment: GraphFragment) -> None:
+        """フラグメントのノードと辺を追加する"""
+        for node in fragment.nodes:
+            if node.id not in self._node_index:
+                self._node_index[node.id] = node
+                self.nodes.append(node)
+        self.edges.extend(fragment.edges)
+
+    def get_node(self, node_id: str) -> Optional[GraphNode]:
+        return self._node_index.get(node_id)
+
+    def node_list(self) -> List[Tuple[str, str, str]]:
+        """[(ノードID, ラベル, 種類)]のリストを取得する"""
+        return [(node.id, node.label, node.ntype) for node in self.nodes]
+
+    def edge_list(self) -> List[Tuple[str, str]]:
+        """[(始点ID, 終点ID)]のリストを取得する（重複は除く）"""
+        seen = set()
+        result = []
+        for edge in self.edges:
+            pair = (edge.src, edge.dst)
+            if pair not in seen:
+                seen.add(pair)
+                result.append(pair)
+        return result
+
+def stable_node_id(key: Tuple[str, ...]) -> str:
+    """キーからMermaidで使用できるノードIDを求める"""
+    digest = hashlib.sha1(json.dumps(list(key), ensure_ascii=False).encode('utf-8')).hexdigest()
+    return f"n{digest[:12]}"
+
+def render_mermaid(node_list: List[Tuple[str, str, str]], edge_list: List[Tuple[str, str]]) -> str:
+    """ノードと辺のリストからMermaidの定義を作成する"""
+    lines = list(MERMAID_HEADER)
+    for node_id, label, ntype in node_list:
+        lines.append(f'    {node_id}["{label}"]')
+        lines.append(f'    class {node_id} {ntype};')
+    for src, dst in edge_list:
+        lines.append(f'    {src} --> {dst}')
+    # classDefでスタイル共通化
+    lines.extend(MERMAID_CLASS_DEFS)
+    return "\n".join(lines)
+
+def diff_graphs(old: SystemGraph, new: SystemGraph) -> Dict[str, List[Any]]:
+    """2つのグラフのノード単位の差分を求める
+
+    Returns:
+        Dict[str, List[Any]]: added_nodes, removed_nodes, changed_nodes（ノードID）と
+            added_edges, removed_edges（(始点ID, 終点ID)）
+    """
+    old_nodes = {node.id: node for node in old.nodes}
+    new_nodes = {node.id: node for node in new.nodes}
+    old_edges = set(old.edge_list())
+    new_edges = set(new.edge_list())
+    return {
+        'added_nodes': [node_id for node_id in new_nodes if node_id not in old_nodes],
+        'removed_nodes': [node_id for node_id in old_nodes if node_id not in new_nodes],
+        'changed_nodes': [
+            node_id for node_id, node in new_nodes.items()
+            if node_id in old_nodes
+            and (old_nodes[node_id].label, old_nodes[node_id].ntype) != (node.label, node.ntype)
+        ],
+        'added_edges': [edge for edge in new.edge_list() if edge not in old_edges],
+        'removed_edges': [edge for edge in old.edge_list() if edge not in new_edges],
+    }
+
+def _resource_summary(apps: Iterable[Dict[str, Any]]) -> str:
+    """アプリケーションが使用するデバイスの数を表すラベルの一部を作成する"""
+    device_count = sum(
+        len(device_info.get("target", [])) if "target" in device_info else 1
+        for app_info in apps for device_info in app_info.get("devices", {}).values()
+    )
+    return f", Devices: {device_count}" if device_count else ""
+
+def _slice_digest(data: Any) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+class GraphBuilder:
+    """project_infoからSystemGraphを組み立てるクラス
+
+    ホストマシンとサービスごとのフラグメントを、その部分の設定のハッシュとともに保持し、
+    設定が変わっていないフラグメントは再利用する。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fragments: Dict[str, Tuple[str, GraphFragment]] = {}
+        self.fragments_built = 0
+        self.fragments_reused = 0
+
+    def build(self, project_info: Dict[str, Any], level: str = "full", expanded: Iterable[str] = ()) -> SystemGraph:
+        """統合されたシステム構成グラフを組み立てる
+
+        Args:
+            project_info (Dict[str, Any]): プロジェクト情報
+            level (str): 詳細度（DETAIL_LEVELSのいずれか）
+            expanded (Iterable[str]): 詳細度にかかわらず全て表示するサービス名（ホストマシンは"host_machine"）
+        """
+        if level not in DETAIL_LEVELS:
+            raise ValueError(f"不明な詳細度です: {level}")
+        expanded = set(expanded)
+        graph = SystemGraph()
+        with self._lock:
+            used = set()
+
+            # Host Machine Apps
+            host_apps = project_info.get("desktop_apps", {}).get("host_machine", {}).get("apps", {})
+            if host_apps:
+                host_level = "full" if "host_machine" in expanded else level
+                fragment_key = f"host:{host_level}"
+                used.add("host")
+                graph.merge(self._get_fragment(
+                    fragment_key, host_apps,
+                    lambda apps: self._build_host_fragment(apps, host_level)
+                ))
+
+            # Services
+            services = project_info.get("services", {})
+            if services:
+                section = GraphFragment()
+                section.add_node(("section", "docker"), "Docker", "docker_section")
+                graph.merge(section)
+                for service_name, service_info in services.items():
+                    service_level = "full" if service_name in expanded else level
+                    fragment_key = f"service:{service_name}:{service_level}"
+                    used.add(f"service:{service_name}")
+                    # コンテナIDなどグラフに表示しない項目が変わってもフラグメントを作り直さない
+                    service_slice = {key: value for key, value in service_info.items()
+                                     if key not in VOLATILE_SERVICE_KEYS}
+                    graph.merge(self._get_fragment(
+                        fragment_key, service_slice,
+                        lambda info, name=service_name, lv=service_level: self._build_service_fragment(name, info, lv)
+                    ))
+
+            # 削除されたサービスのフラグメントを破棄する（詳細度ごとのフラグメントは残す）
+            for fragment_key in list(self._fragments):
+                if fragment_key.rsplit(':', 1)[0] not in used:
+                    del self._fragments[fragment_key]
+        return graph
+
+    def build_within_budget(self, project_info: Dict[str, Any], node_budget: int = DEFAULT_NODE_BUDGET,
+                            expanded: Iterable[str] = ()) -> Tuple[str, SystemGraph]:
+        """ノード数が上限に収まる最も詳細な詳細度でグラフを組み立てる
+
+        どの詳細度でも上限を超える場合は最も簡略な詳細度のグラフを返す。
+
+        Returns:
+            Tuple[str, SystemGraph]: 選ばれた詳細度とグラフ
+        """
+        expanded = set(expanded)
+        for level in DETAIL_LEVELS:
+            graph = self.build(project_info, level, expanded)
+            if len(graph.nodes) <= node_budget:
+                return level, graph
+        return level, graph
+
+    def _get_fragment(self, fragment_key: str, data: Any, build) -> GraphFragment:
+        digest = _slice_digest(data)
+        cached = self._fragments.get(fragment_key)
+        if cached is not None and cached[0] == digest:
+            self.fragments_reused += 1
+            return cached[1]
+        fragment = build(data)
+        self._fragments[fragment_key] = (digest, fragment)
+        self.fragments_built += 1
+        return fragment
+
+    def _build_host_fragment(self, host_apps: Dict[str, Any], level: str = "full") -> GraphFragment:
+        fragment = GraphFragment()
+        if level == "service":
+            label = f"Host Machine (Apps: {len(host_apps)}{_resource_summary(host_apps.values())})"
+            fragment.add_node(("section", "host"), label, "section")
+            return fragment
+
+        host_section_id = fragment.add_node(("section", "host"), "Host Machine", "section")
+        for app_name, app_info in host_apps.items():
+            app_id = fragment.add_node(("host_app", app_name), f"App: {app_name}", "host_app")
+            fragment.add_edge(host_section_id, app_id)
+            self._add_app_resources(fragment, app_id, ("host", app_name), app_info, level)
+        return fragment
+
+    def _build_service_fragment(self, service_name: str, service_info: Dict[str, Any],
+                                level: str = "full") -> GraphFragment:
+        fragment = GraphFragment()
+        docker_section_id = stable_node_id(("section", "docker"))
+        container_label = f"Container: {service_name}"
+        if "image" in service_info:
+            container_label += f" (Image: {service_info['image']})"
+        apps = service_info.get("apps", {})
+        if level == "service":
+            container_label += f" (Apps: {len(apps)}{_resource_summary(apps.values())})"
+        cont_id = fragment.add_node(("container", service_name), container_label, "container")
+        fragment.add_edge(docker_section_id, cont_id)
+        if level == "service":
+            return fragment
+
+        for app_name, app_info in apps.items():
+            app_label = f"App: {app_name}"
+            if "container_port" in app_info:
+                app_label += f" (Port: {app_info['container_port']})"
+            app_id = fragment.add_node(("app", service_name, app_name), app_label, "app")
+            fragment.add_edge(cont_id, app_id)
+            self._add_app_resources(fragment, app_id, ("service", service_name, app_name), app_info, level)
+        return fragment
+
+    def _add_app_resources(self, fragment: GraphFragment, app_id: str, owner: Tuple[str, ...],
+                           app_info: Dict[str, Any], level: str = "full") -> None:
+        """アプリケーションが使用するデータとデバイスのノードを追加する（ホストとコンテナで共通）"""
+        for data_root in app_info.get("data_roots", []):
+            data_id = fragment.add_node(("data", data_root), f"Data: {data_root}", "data")
+            fragment.add_edge(app_id, data_id)
+
+        devices = app_info.get("devices", {})
+        if level == "device_summary":
+            if devices:
+                summary = ", ".join(
+                    f"{device_name}×{len(device_info['target'])}" if "target" in device_info else device_name
+                    for device_name, device_info in devices.items()
+                )
+                dev_id = fragment.add_node(("devices",) + owner, f"Devices: {summary}", "device")
+                fragment.add_edge(app_id, dev_id)
+            return
+
+        for device_name, device_info in devices.items():
+            if "target" in device_info:
+                for target in device_info["target"]:
+                    dev_id = fragment.add_node(("device", device_name, target),
+                                               f"Device: {device_name} (Target: {target})", "device")
+                    fragment.add_edge(app_id, dev_id)
+            else:
+                dev_id = fragment.add_node(("device", device_name), f"Device: {device_name}", "device")
+                fragment.add_edge(app_id, dev_id)
+
+    def clear_cache(self) -> None:
+        """保持しているフラグメントを破棄する"""
+        with self._lock:
+            self._fragments.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        """フラグメントを作成した回数と再利用した回数を取得する"""
+        with self._lock:
+            return {'built': self.fragments_built, 'reused': self.fragments_reused}
+
+# シングルトンインスタンス
+graph_builder = GraphBuilder()
@@ -0,0 +1,240 @@
+"""
+システムグラフの全体・差分メッセージをSSE（Server-Sent Events）で配信するモジュール
+
+GraphEventChannelはpublish()で渡されたグラフからutils/graph_delta.pyの全体・差分メッセージを作成し、
+GET /api/eventsに接続し続けている購読者へ順に配信する。接続時（再接続時を含む）は、
+Last-Event-IDが最新の連番と一致しない限り最新のグラフ全体を最初に送信する。
+購読側（follow_graph_events）はGraphDeltaReceiverでメッセージを適用し、base_seqが飛んだ場合は
+Last-Event-IDを付けずに接続し直して全体を受信し直す（resync）。
+
+イベントの形式:
+    id: 4
+    event: delta
+    data: {"type": "delta", "seq": 4, "base_seq": 3, "hash": "...", "ops": [...]}
+"""
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from .graph_delta import GraphDeltaReceiver, content_hash, make_delta, make_full
+
+EVENTS_PATH = '/api/events'
+# 配信するメッセージがない場合にコメント行を送信する間隔（秒）
+HEARTBEAT_INTERVAL = 15.0
+# 購読者ごとに溜めておけるメッセージの数（超えた購読者は切断し、再接続時に全体を送信する）
+SUBSCRIBER_QUEUE_SIZE = 64
+# 接続が切れた場合に接続し直すまでの待ち時間（秒）
+RECONNECT_DELAY = 1.0
+
+def format_event(message: Dict[str, Any]) -> bytes:
+    """メッセージをSSEのイベントに変換する"""
+    data = json.dumps(message, ensure_ascii=False)
+    return f"id: {message['seq']}\nevent: {message['type']}\ndata: {data}\n\n".encode('utf-8')
+
+class GraphEventChannel:
+    """システムグラフの更新をSSEで配信するクラス
+
+    publish()はサーバーを起動していなくても最新の内容と連番を更新するため、
+    start()の後に接続した購読者も最新のグラフ全体から受信できる。
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, heartbeat: float = HEARTBEAT_INTERVAL):
+        self.host = host
+        self.port = port
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        self._content: Optional[str] = None
+        self._hash: Optional[str] = None
+        self._seq = 0
+        self._subscribers: List[queue.Queue] = []
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def publish(self, mermaid_content: str) -> Optional[Dict[str, Any]]:
+        """グラフを配信する
+
+        Returns:
+            Optional[Dict[str, Any]]: 配信したメッセージ。前回と同じ内容の場合はNone
+        """
+        digest = content_hash(mermaid_content)
+        with self._lock:
+            if digest == self._hash:
+                return None
+            seq = self._seq + 1
+            if self._content is None:
+                message = make_full(mermaid_content, seq)
+            else:
+                message = make_delta(self._content, mermaid_content, self._seq, seq)
+            self._content, self._hash, self._seq = mermaid_content, digest, seq
+            self.published += 1
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    # 追いつけない購読者は切断する（再接続時に全体を受信する）
+                    self._remove_subscriber(subscriber)
+                    self.dropped_subscribers += 1
+            return message
+
+    def _subscribe(self, last_event_id: Optional[str]) -> queue.Queue:
+        """購読者を登録し、必要な場合は最新のグラフ全体を最初のメッセージとして入れる"""
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            if self._content is not None and last_event_id != str(self._seq):
+                subscriber.put_nowait(make_full(self._content, self._seq))
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def _remove_subscriber(self, subscriber: queue.Queue) -> None:
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+            # 配信中のスレッドに切断を知らせる
+            while True:
+                try:
+                    subscriber.put_nowait(None)
+                    break
+                except queue.Full:
+                    subscriber.get_nowait()
+
+    def _unsubscribe(self, subscriber: queue.Queue) -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    @property
+    def url(self) -> Optional[str]:
+        """購読用のURL（サーバーを起動していない場合はNone）"""
+        if self._server is None:
+            return None
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{EVENTS_PATH}"
+
+    def start(self) -> str:
+        """サーバーを起動する（起動済みの場合は何もしない）
+
+        Returns:
+            str: 購読用のURL
+        """
+        with self._lock:
+            if self._server is None:
+                self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+                self._server.daemon_threads = True
+                threading.Thread(target=self._server.serve_forever, name="graph-events", daemon=True).start()
+        return self.url
+
+    def stop(self) -> None:
+        """サーバーを停止し、全ての購読者を切断する"""
+        with self._lock:
+            server, self._server = self._server, None
+            for subscriber in list(self._subscribers):
+                self._remove_subscriber(subscriber)
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    def _make_handler(self):
+        channel = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # 購読者がイベントを受信した時点で読み出せるよう、チャンク形式で送信する
+            protocol_version = 'HTTP/1.1'
+
+            def _write_chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path != EVENTS_PATH:
+                    self.send_error(404)
+                    return
+                subscriber = channel._subscribe(self.headers.get('Last-Event-ID'))
+                try:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+                    self.send_header('Cache-Control', 'no-cache')
+                    # ブラウザで表示しているビューアーのページからも購読できるようにする
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    self.wfile.flush()
+                    while True:
+                        try:
+                            message = subscriber.get(timeout=channel.heartbeat)
+                        except queue.Empty:
+                            self._write_chunk(b": keepalive\n\n")
+                            continue
+                        if message is None:
+                            break
+                        self._write_chunk(format_event(message))
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.close_connection = True
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+                finally:
+                    channel._unsubscribe(subscriber)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def _read_events(response: requests.Response, stop: threading.Event):
+    """SSEのレスポンスからメッセージを順に取り出す"""
+    data_lines = []
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if stop.is_set():
+            return
+        if line is None:
+            continue
+        if line == '':
+            if data_lines:
+                yield json.loads('\n'.join(data_lines))
+                data_lines = []
+        elif line.startswith('data:'):
+            data_lines.append(line[len('data:'):].lstrip(' '))
+
+def follow_graph_events(url: str, receiver: GraphDeltaReceiver, stop: threading.Event,
+                        on_update: Optional[Callable[[str], None]] = None,
+                        reconnect_delay: float = RECONNECT_DELAY, heartbeat: float = HEARTBEAT_INTERVAL) -> None:
+    """SSEでグラフの更新を購読し、receiverに適用する（stopがセットされるまで戻らない）
+
+    差分を適用できない場合（base_seqが飛んだ場合やハッシュが一致しない場合）は
+    Last-Event-IDを付けずに接続し直し、最新のグラフ全体を受信し直す。
+
+    Args:
+        url (str): GraphEventChannelの購読用のURL
+        receiver (GraphDeltaReceiver): メッセージを適用するオブジェクト
+        stop (threading.Event): 購読を終了する場合にセットする
+        on_update (Optional[Callable[[str], None]]): 適用後のグラフを受け取る関数
+    """
+    resync = False
+    with requests.Session() as session:
+        while not stop.is_set():
+            headers = {'Accept': 'text/event-stream'}
+            if receiver.seq is not None and not resync:
+                headers['Last-Event-ID'] = str(receiver.seq)
+            resync = False
+            try:
+                with session.get(url, headers=headers, stream=True, timeout=(2.0, heartbeat * 2)) as response:
+                    response.raise_for_status()
+                    for message in _read_events(response, stop):
+                        if not receiver.receive(message):
+                            resync = True
+                            break
+                        if on_update is not None:
+                            on_update(receiver.content)
+            except (requests.RequestException, ValueError) as e:
+                print(f"システムグラフの更新の購読が切断されました: {e}")
+                stop.wait(reconnect_delay)
+
+# シングルトンインスタンス
+graph_event_channel = GraphEventChannel()
@@ -1,8 +1,8 @@
-import json
 import flet as ft
 from .dialogs import show_error_dialog
-from pathlib import Path
 from .container_utils import parse_project_info
+from .project_info_store import get_project_info_store
+from .update_scheduler import request_update, flush_update
 
 def is_valid_ipv4(ip: str) -> bool:
     """IPv4アドレスの形式が正しいかチェックする"""
@@ -24,10 +24,9 @@ def ip_to_int(ip: str) -> int:
 
 def update_settings_json(docker_compose_dir, new_targets, service_name, app_name, device_type, page: ft.Page):
     """特定のアプリケーションのtargetを更新する"""
-    project_info_path = Path(docker_compose_dir) / 'project_info.json'
+    store = get_project_info_store(docker_compose_dir)
     try:
-        with project_info_path.open('r') as f:
-            settings = json.load(f)
+        settings = store.snapshot()
         
         if service_name == "host_machine":
             service = settings['desktop_apps']['host_machine']          
@@ -41,8 +40,7 @@ def update_settings_json(docker_compose_dir, new_targets, service_name, app_name
                 app['devices'][device_type]['target'] = new_targets
                 
                 # 更新した設定を保存
-                with project_info_path.open('w') as f:
-                    json.dump(settings, f, indent=2)
+                store.save(settings, delay=0)
                 
                 # container_infoディレクトリの更新
                 parse_project_info(docker_compose_dir)
@@ -55,60 +53,36 @@ def update_settings_json(docker_compose_dir, new_targets, service_name, app_name
 
 def get_ip_addresses(docker_compose_dir, service_name, app_name, device_type, page: ft.Page):
     """指定されたデバイスで利用可能なIPアドレスのリストを取得する"""
-    project_info_path = Path(docker_compose_dir) / 'project_info.json'
     try:
-        with project_info_path.open('r') as f:
-            settings = json.load(f)
-        
-        if (service_name in settings['services'] and 
-            app_name in settings['services'][service_name]['apps']):
-            app_info = settings['services'][service_name]['apps'][app_name]
-            if ('devices' in app_info and 
-                device_type in app_info['devices'] and 
-                'ip_addr' in app_info['devices'][device_type]):
-                return app_info['devices'][device_type]['ip_addr']
+        device_info = get_project_info_store(docker_compose_dir).get_device(service_name, app_name, device_type)
+        if device_info and 'ip_addr' in device_info:
+            return device_info['ip_addr']
     except Exception as e:
         show_error_dialog(page, "設定読み込みエラー", f"IPアドレスリストの取得に失敗しました: {e}")
     return []
 
 def get_current_targets(docker_compose_dir, service_name, app_name, device_type, page: ft.Page):
     """指定されたデバイスの現在のターゲットIPアドレスのリストを取得する"""
-    project_info_path = Path(docker_compose_dir) / 'project_info.json'
     try:
-        with project_info_path.open('r') as f:
-            settings = json.load(f)
-        
-        if (service_name in settings['services'] and 
-            app_name in settings['services'][service_name]['apps']):
-            app_info = settings['services'][service_name]['apps'][app_name]
-            if ('devices' in app_info and 
-                device_type in app_info['devices'] and 
-                'target' in app_info['devices'][device_type]):
-                return app_info['devices'][device_type]['target']
+        device_info = get_project_info_store(docker_compose_dir).get_device(service_name, app_name, device_type)
+        if device_info and 'target' in device_info:
+            return device_info['target']
     except Exception as e:
         show_error_dialog(page, "設定読み込みエラー", f"現在のターゲットの取得に失敗しました: {e}")
     return []
 
 def get_device_constraints(docker_compose_dir, service_name, app_name, device_type, page: ft.Page):
     """デバイスの接続数制限を取得する"""
-    project_info_path = Path(docker_compose_dir) / 'project_info.json'
     try:
-        with project_info_path.open('r') as f:
-            settings = json.load(f)
-        
-        if (service_name in settings['services'] and 
-            app_name in settings['services'][service_name]['apps']):
-            app_info = settings['services'][service_name]['apps'][app_name]
-            if ('devices' in app_info and 
-                device_type in app_info['devices'] and 
-                'num' in app_info['devices'][device_type]):
-                num_constraint = app_info['devices'][device_type]['num']
-                min_conn, max_conn_str, allow_duplicate_str = num_constraint.split(':')
-                return {
-                    'min_connections': int(min_conn),
-                    'max_connections': int(max_conn_str) if max_conn_str else None,
-                    'allow_duplicate': bool(int(allow_duplicate_str))
-                }
+        device_info = get_project_info_store(docker_compose_dir).get_device(service_name, app_name, device_type)
+        if device_info and 'num' in device_info:
+            num_constraint = device_info['num']
+            min_conn, max_conn_str, allow_duplicate_str = num_constraint.split(':')
+            return {
+                'min_connections': int(min_conn),
+                'max_connections': int(max_conn_str) if max_conn_str else None,
+                'allow_duplicate': bool(int(allow_duplicate_str))
+            }
     except Exception as e:
         show_error_dialog(page, "設定読み込みエラー", f"デバイス制約の取得に失敗しました: {e}")
     return None
@@ -168,14 +142,14 @@ def on_edit_ip_options(e, page: ft.Page, current_ip_addresses: list, build_conte
         error_text.value = message
         error_text.visible = True
         apply_button.disabled = True
-        page.update()
+        request_update(page)
 
     def clear_ip_validation_error():
         """エラーメッセージをクリアし、適用ボタンを有効化"""
         error_text.value = ""
         error_text.visible = False
         apply_button.disabled = False
-        page.update()
+        request_update(page)
 
     def validate_input(new_ip: str) -> tuple[bool, str]:
         """入力値を検証し、結果とエラーメッセージを返す"""
@@ -210,7 +184,7 @@ def on_edit_ip_options(e, page: ft.Page, current_ip_addresses: list, build_conte
                     alignment=ft.MainAxisAlignment.SPACE_BETWEEN
                 )
             )
-        page.update()
+        request_update(page)
 
     def toggle_input_visibility(show: bool):
         """入力フィールドとプラスボタンを切り替える"""
@@ -247,7 +221,7 @@ def on_edit_ip_options(e, page: ft.Page, current_ip_addresses: list, build_conte
                 on_click=lambda e: toggle_input_visibility(True)
             )
             clear_ip_validation_error()  # 入力フィールドを閉じるときにエラー状態をクリア
-        page.update()
+        request_update(page)
 
     def remove_ip_address(ip: str):
         """IPアドレスをリストから削除する"""
@@ -274,9 +248,8 @@ def on_edit_ip_options(e, page: ft.Page, current_ip_addresses: list, build_conte
         """変更をproject_info.jsonに保存する"""
         nonlocal ip_list
         try:
-            project_info_path = Path(build_context_path) / 'project_info.json'
-            with project_info_path.open('r') as f:
-                settings = json.load(f)
+            store = get_project_info_store(build_context_path)
+            settings = store.snapshot()
 
             # 指定されたデバイスのip_addrを更新（ソートして保存）
             sorted_ip_list = sorted(ip_list, key=ip_to_int)
@@ -294,8 +267,7 @@ def on_edit_ip_options(e, page: ft.Page, current_ip_addresses: list, build_conte
                         if 'devices' in app and device_type in app['devices']:
                             app['devices'][device_type]['ip_addr'] = sorted_ip_list
 
-            with project_info_path.open('w') as f:
-                json.dump(settings, f, indent=2)
+            store.save(settings, delay=0)
 
             # 設定を再パース
             parse_project_info(build_context_path)
@@ -307,7 +279,7 @@ def on_edit_ip_options(e, page: ft.Page, current_ip_addresses: list, build_conte
     def close_dialog(e):
         """ダイアログを閉じる"""
         dialog.open = False
-        page.update()
+        flush_update(page)
         page.overlay.remove(dialog)
 
     def on_apply(e, device_type):
@@ -364,4 +336,4 @@ def on_edit_ip_options(e, page: ft.Page, current_ip_addresses: list, build_conte
     # ダイアログを表示
     page.overlay.append(dialog)
     dialog.open = True
-    page.update()
+    flush_update(page)
@@ -1,14 +1,42 @@
 """
 Mermaidコンテナの管理機能を提供するモジュール
 """
+import os
+import shutil
 import subprocess
 import json
+import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import flet as ft
 from .dialogs import show_error_dialog, show_status
+from .docker_api import docker_client, DockerAPIUnavailable
+from .graph_delta import content_hash, make_delta, make_full
+from .graph_stream import graph_event_channel
+
+# ビューアーAPIのタイムアウト（接続, 読み込み）（秒）
+API_TIMEOUT = (2.0, 10.0)
+HEALTH_CHECK_TIMEOUT = (1.0, 5.0)
+CONTAINER_PORT = '8080/tcp'
+# Mermaidコンテナの起動方法（"lazy": グラフの表示時に起動, "eager": Mochimaki起動時に起動）
+STARTUP_MODE_ENV = 'MOCHIMAKI_MERMAID_STARTUP'
+
+def get_startup_mode() -> str:
+    """Mermaidコンテナの起動方法を取得する"""
+    mode = os.environ.get(STARTUP_MODE_ENV, 'lazy').strip().lower()
+    return mode if mode in ('lazy', 'eager') else 'lazy'
+
+def low_priority_command(cmd: list) -> list:
+    """コマンドをCPU・ディスクI/Oの優先度を下げて実行するコマンドに変換する"""
+    prefix = []
+    if shutil.which('nice'):
+        prefix += ['nice', '-n', '19']
+    if shutil.which('ionice'):
+        prefix += ['ionice', '-c3']
+    return prefix + cmd
 
 class MermaidContainerManager:
     """Mermaidコンテナの管理を行うクラス"""
@@ -19,35 +47,86 @@ class MermaidContainerManager:
         self.repo_url = "https://github.com/mochimaki/mermaid_viewer.git"
         self.repo_dir = Path.home() / "mermaid_viewer"
         self.api_base_url = "http://localhost"
+        # キープアライブ接続を使い回すセッション
+        self._session = requests.Session()
+        self._session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+        # (コンテナの識別情報, ホストポート)。コンテナが起動し直した場合のみ取得し直す
+        self._port_cache: Optional[Tuple[Optional[str], int]] = None
+        self._port_lock = threading.Lock()
+        self.port_lookups = 0
+        self._http_stats: Dict[str, Dict[str, float]] = {}
+        self._http_stats_lock = threading.Lock()
+        # 最後にビューアーへ送信したグラフ
+        self._push_lock = threading.Lock()
+        self._pushed_content: Optional[str] = None
+        self._pushed_hash: Optional[str] = None
+        self._pushed_seq = 0
+        self._seq = 0
+        self._delta_supported: Optional[bool] = None  # 未確認の場合はNone
+        self.pushes_full = 0
+        self.pushes_delta = 0
+        self.pushes_skipped = 0
+        self.resyncs = 0
+        # ビューアーが起動済みかどうか（未確認の場合はNone）と、起動前に要求されたグラフ
+        self._viewer_active: Optional[bool] = None
+        self._pending_graph: Optional[Tuple[str, str]] = None
+        self._rebuild_thread: Optional[threading.Thread] = None
         
     def ensure_container_running(self, page: ft.Page) -> bool:
         """Mermaidコンテナが起動していることを確認し、必要に応じて起動する"""
         try:
             # コンテナが存在するかチェック
             if not self._container_exists():
-                show_status(page, "Mermaidコンテナが存在しません。ビルドを開始します...")
-                if not self._build_container(page):
-                    return False
+                if self._image_exists():
+                    # ビルド済みのイメージで先に起動し、リポジトリの更新と再ビルドは後で低優先度で行う
+                    if not self._create_container(page):
+                        return False
+                    self.schedule_background_rebuild()
+                else:
+                    show_status(page, "Mermaidコンテナが存在しません。ビルドを開始します...")
+                    if not self._build_container(page):
+                        return False
+                self.invalidate_port()
+                self._reset_push_state()
             
             # コンテナが起動しているかチェック
             if not self._container_is_running():
                 show_status(page, "Mermaidコンテナを起動中...")
                 if not self._start_container(page):
                     return False
+                self.invalidate_port()
+                # 起動し直したビューアーはグラフを保持していないため、次回は全体を送信する
+                self._reset_push_state()
             
             # コンテナのヘルスチェック
             if not self._wait_for_container_ready(page):
                 return False
                 
             show_status(page, "Mermaidコンテナが正常に起動しました")
+            # 全体・差分メッセージを購読できるSSEの配信を開始する（URLは/api/updateで通知する）
+            graph_event_channel.start()
+            self._viewer_active = True
+            self._push_pending_graph()
             return True
             
         except Exception as e:
             show_error_dialog(page, "エラー", f"Mermaidコンテナの起動に失敗しました: {e}")
             return False
     
+    def is_viewer_installed(self) -> bool:
+        """クローンやビルドを行わずにビューアーを起動できるかどうか（コンテナかイメージが存在するか）"""
+        try:
+            return self._container_exists() or self._image_exists()
+        except OSError:
+            # dockerコマンドが見つからない場合
+            return False
+
     def _container_exists(self) -> bool:
         """コンテナが存在するかチェック"""
+        try:
+            return docker_client.inspect_container(self.container_name) is not None
+        except DockerAPIUnavailable:
+            pass
         try:
             result = subprocess.run(
                 ['docker', 'ps', '-a', '--filter', f'name={self.container_name}', '--format', '{{.Names}}'],
@@ -59,6 +138,12 @@ class MermaidContainerManager:
     
     def _container_is_running(self) -> bool:
         """コンテナが起動しているかチェック"""
+        try:
+            info = docker_client.inspect_container(self.container_name)
+            self._check_container_identity(info)
+            return bool(info and info.get('State', {}).get('Running'))
+        except DockerAPIUnavailable:
+            pass
         try:
             result = subprocess.run(
                 ['docker', 'ps', '--filter', f'name={self.container_name}', '--format', '{{.Names}}'],
@@ -83,23 +168,26 @@ class MermaidContainerManager:
                 except subprocess.CalledProcessError:
                     # 更新に失敗した場合は、リポジトリを再クローン
                     show_status(page, "リポジトリの更新に失敗しました。再クローンを実行中...")
-                    import shutil
                     shutil.rmtree(self.repo_dir)
                     subprocess.run(['git', 'clone', self.repo_url, str(self.repo_dir)], check=True)
             
             # イメージが存在するかチェック
-            result = subprocess.run(
-                ['docker', 'images', '--format', '{{.Repository}}', self.image_name],
-                capture_output=True, text=True
-            )
-            
-            if self.image_name not in result.stdout:
+            if not self._image_exists():
                 show_status(page, "Mermaidイメージをビルド中...")
                 subprocess.run(
                     ['docker', 'build', '-t', self.image_name, 'mermaid-container/'],
                     cwd=self.repo_dir, check=True
                 )
             
+            return self._create_container(page)
+            
+        except subprocess.CalledProcessError as e:
+            show_error_dialog(page, "ビルドエラー", f"Mermaidコンテナのビルドに失敗しました: {e}")
+            return False
+
+    def _create_container(self, page: ft.Page) -> bool:
+        """ビルド済みのイメージからコンテナを作成する"""
+        try:
             # コンテナを作成（dynamic port assignment）
             show_status(page, "Mermaidコンテナを作成中...")
             subprocess.run([
@@ -112,9 +200,53 @@ class MermaidContainerManager:
             return True
             
         except subprocess.CalledProcessError as e:
-            show_error_dialog(page, "ビルドエラー", f"Mermaidコンテナのビルドに失敗しました: {e}")
+            show_error_dialog(page, "作成エラー", f"Mermaidコンテナの作成に失敗しました: {e}")
             return False
+
+    def schedule_background_rebuild(self) -> None:
+        """リポジトリの更新とイメージの再ビルドをバックグラウンドで低優先度で行う
+
+        再ビルドしたイメージは次にコンテナを作成するときに使用される。
+        """
+        if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+            return
+        self._rebuild_thread = threading.Thread(target=self._rebuild_in_background, name="mermaid-rebuild", daemon=True)
+        self._rebuild_thread.start()
+
+    def _rebuild_in_background(self) -> None:
+        try:
+            if not self.repo_dir.exists():
+                subprocess.run(low_priority_command(['git', 'clone', self.repo_url, str(self.repo_dir)]),
+                               check=True, capture_output=True)
+            else:
+                result = subprocess.run(low_priority_command(['git', 'pull', 'origin', 'main']),
+                                        cwd=self.repo_dir, capture_output=True, text=True)
+                if result.returncode != 0:
+                    print(f"Mermaidリポジトリの更新に失敗しました（次回に再試行します）: {result.stderr.strip()}")
+                    return
+                if 'Already up to date' in result.stdout or 'Already up-to-date' in result.stdout:
+                    print("Mermaidリポジトリに更新はありません")
+                    return
+            subprocess.run(
+                low_priority_command(['docker', 'build', '-t', self.image_name, 'mermaid-container/']),
+                cwd=self.repo_dir, check=True, capture_output=True
+            )
+            print("Mermaidイメージをバックグラウンドで再ビルドしました（次回のコンテナ作成時に反映されます）")
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"Mermaidイメージのバックグラウンド再ビルドに失敗しました: {e}")
     
+    def _image_exists(self) -> bool:
+        """イメージが存在するかチェック"""
+        try:
+            return docker_client.image_exists(self.image_name)
+        except DockerAPIUnavailable:
+            pass
+        result = subprocess.run(
+            ['docker', 'images', '--format', '{{.Repository}}', self.image_name],
+            capture_output=True, text=True
+        )
+        return self.image_name in result.stdout
+
     def _start_container(self, page: ft.Page) -> bool:
         """コンテナを起動する"""
         try:
@@ -130,7 +262,7 @@ class MermaidContainerManager:
         while time.time() - start_time < timeout:
             try:
                 # ヘルスチェックAPIを呼び出し
-                response = requests.get(f"{self.api_base_url}:{self._get_container_port()}/api/health", timeout=5)
+                response = self._request('GET', '/api/health', timeout=HEALTH_CHECK_TIMEOUT)
                 if response.status_code == 200 and response.json().get('status') == 'healthy':
                     return True
             except (requests.RequestException, json.JSONDecodeError):
@@ -141,61 +273,236 @@ class MermaidContainerManager:
         return False
     
     def _get_container_port(self) -> int:
-        """コンテナのホストポートを取得"""
+        """コンテナのホストポートを取得（コンテナが起動し直すまではキャッシュを返す）"""
+        with self._port_lock:
+            if self._port_cache is None:
+                self._port_cache = self._resolve_container_port()
+            return self._port_cache[1]
+
+    def _check_container_identity(self, info: Optional[Dict[str, Any]]) -> None:
+        """コンテナが作り直された、または起動し直された場合はキャッシュしたポートを破棄する"""
+        with self._port_lock:
+            if self._port_cache is None or self._port_cache[0] is None:
+                return
+            identity = f"{info.get('Id', '')}@{info.get('State', {}).get('StartedAt', '')}" if info else None
+            if identity != self._port_cache[0]:
+                self._port_cache = None
+
+    def invalidate_port(self) -> None:
+        """キャッシュしたホストポートを破棄する"""
+        with self._port_lock:
+            self._port_cache = None
+
+    def _resolve_container_port(self) -> Tuple[Optional[str], int]:
+        """コンテナのホストポートを取得し、コンテナの識別情報（IDと起動時刻）と組にして返す"""
+        self.port_lookups += 1
+        try:
+            info = docker_client.inspect_container(self.container_name)
+            if info:
+                identity = f"{info.get('Id', '')}@{info.get('State', {}).get('StartedAt', '')}"
+                bindings = (info.get('NetworkSettings', {}).get('Ports') or {}).get(CONTAINER_PORT) or []
+                for binding in bindings:
+                    if binding.get('HostPort'):
+                        return identity, int(binding['HostPort'])
+                return identity, 8080  # デフォルトポート
+            return None, 8080  # デフォルトポート
+        except DockerAPIUnavailable:
+            pass
         try:
             result = subprocess.run([
-                'docker', 'port', self.container_name, '8080/tcp'
+                'docker', 'port', self.container_name, CONTAINER_PORT
             ], capture_output=True, text=True, check=True)
             
             # 出力例: "0.0.0.0:32768"
             port_str = result.stdout.strip().split(':')[-1]
-            return int(port_str)
+            return None, int(port_str)
         except (subprocess.CalledProcessError, ValueError, IndexError):
-            return 8080  # デフォルトポート
-    
-    def update_graph(self, mermaid_content: str, file_path: str, page: ft.Page) -> bool:
-        """システムグラフを更新する"""
-        try:
+            return None, 8080  # デフォルトポート
+
+    def _request(self, method: str, path: str, timeout=API_TIMEOUT, **kwargs) -> requests.Response:
+        """ビューアーのAPIを呼び出す
+
+        接続に失敗した場合はコンテナが起動し直してポートが変わった可能性があるため、
+        ポートを取得し直して1回だけ再試行する。
+        それでも接続できない場合やタイムアウトした場合は、コンテナがアプリの外で停止された可能性があるため、
+        次回はビューアーが起動済みかどうかをDockerに問い合わせ直す。
+        """
+        for attempt in range(2):
             port = self._get_container_port()
-            url = f"{self.api_base_url}:{port}/api/update"
-            
-            payload = {
-                "mermaid_content": mermaid_content,
-                "file_path": file_path,
-                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ")
-            }
-            
-            response = requests.post(url, json=payload, timeout=10)
-            if response.status_code == 200:
+            start_time = time.perf_counter()
+            try:
+                return self._session.request(method, f"{self.api_base_url}:{port}{path}", timeout=timeout, **kwargs)
+            except requests.ConnectionError:
+                self.invalidate_port()
+                if attempt == 1 or self._get_container_port() == port:
+                    self._viewer_active = None
+                    raise
+            except requests.Timeout:
+                self._viewer_active = None
+                raise
+            finally:
+                self._record_latency(f"{method} {path}", time.perf_counter() - start_time)
+
+    def _record_latency(self, key: str, elapsed: float) -> None:
+        # グラフの送信はワーカースレッド、統計の取得はUIスレッドから行われる
+        with self._http_stats_lock:
+            stats = self._http_stats.setdefault(key, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['calls'] += 1
+            stats['total_ms'] += elapsed * 1000
+            stats['max_ms'] = max(stats['max_ms'], elapsed * 1000)
+
+    def get_http_stats(self) -> Dict[str, Dict[str, float]]:
+        """API呼び出しごとの回数と所要時間（ミリ秒）の統計を取得する"""
+        result = {}
+        with self._http_stats_lock:
+            for key, stats in self._http_stats.items():
+                result[key] = dict(stats, avg_ms=stats['total_ms'] / stats['calls'] if stats['calls'] else 0.0)
+        result['port_lookups'] = {'calls': self.port_lookups}
+        return result
+    
+    def update_graph(self, mermaid_content: str, file_path: str, page: ft.Page, force: bool = False) -> bool:
+        """システムグラフを更新する
+
+        前回送信した内容と同じ場合は送信しない。ビューアーが差分の受信（/api/delta）に対応している場合は
+        前回からの差分のみを送信し、連番の不一致などで再送を要求された場合は全体を送信する。
+        グラフはビューアーの状態にかかわらずSSEの配信（graph_event_channel）にも渡す。
+
+        Args:
+            mermaid_content (str): Mermaidのグラフ定義
+            file_path (str): グラフ定義のファイルパス
+            page (ft.Page): ページオブジェクト（Noneの場合はエラーをコンソールに出力する）
+            force (bool): Trueの場合は内容が同じでも全体を送信する
+
+        Returns:
+            bool: ビューアーへ送信した場合はTrue。内容が同じため省略した場合、ビューアーの起動まで保留した場合、
+                送信に失敗した場合はFalse
+        """
+        graph_event_channel.publish(mermaid_content)
+        if not force and not self._is_viewer_active():
+            # ビューアーが起動するまでは送信せず、起動後に最新のグラフを送信する
+            self._pending_graph = (mermaid_content, file_path)
+            return False
+
+        digest = content_hash(mermaid_content)
+        with self._push_lock:
+            if not force and digest == self._pushed_hash:
+                self.pushes_skipped += 1
+                print("システムグラフに変更がないため送信を省略しました")
+                return False
+
+            try:
+                self._seq += 1
+                if not force and self._pushed_content is not None and self._delta_supported is not False:
+                    if self._push_delta(mermaid_content, digest):
+                        return True
+                return self._push_full(mermaid_content, digest, file_path, page)
+
+            except requests.RequestException as e:
+                error_msg = f"Mermaidコンテナとの通信に失敗しました: {e}"
+                if page:
+                    show_error_dialog(page, "通信エラー", error_msg)
+                else:
+                    print(f"通信エラー: {error_msg}")
+                return False
+
+    def _is_viewer_active(self) -> bool:
+        """ビューアーが起動済みかどうか
+
+        lazyモードではグラフの送信のためにコンテナを起動しない。
+        起動済みかどうかは最初の1回と通信に失敗した後にだけDockerに問い合わせ、
+        以降はensure_container_running()で更新する。
+        """
+        if self._viewer_active is None:
+            self._viewer_active = self._container_is_running()
+        return self._viewer_active
+
+    def _push_pending_graph(self) -> None:
+        """ビューアーの起動前に要求されたグラフを送信する"""
+        pending, self._pending_graph = self._pending_graph, None
+        if pending is not None:
+            self.update_graph(pending[0], pending[1], None)
+
+    def _reset_push_state(self) -> None:
+        with self._push_lock:
+            self._pushed_content = None
+            self._pushed_hash = None
+
+    def _remember_pushed(self, mermaid_content: str, digest: str) -> None:
+        self._pushed_content = mermaid_content
+        self._pushed_hash = digest
+        self._pushed_seq = self._seq
+
+    def _push_delta(self, mermaid_content: str, digest: str) -> bool:
+        """差分を送信する
+
+        Returns:
+            bool: ビューアーが差分を適用した場合はTrue。全体の送信が必要な場合はFalse
+        """
+        delta = make_delta(self._pushed_content, mermaid_content, self._pushed_seq, self._seq)
+        response = self._request('POST', '/api/delta', json=delta)
+        if response.status_code in (404, 405):
+            # 差分の受信に対応していないビューアー
+            self._delta_supported = False
+            return False
+        if response.status_code == 200:
+            try:
                 result = response.json()
-                if result.get('success'):
-                    if page:
-                        show_status(page, "システムグラフを更新しました")
-                    else:
-                        print("システムグラフを更新しました")
-                    return True
+            except ValueError:
+                result = {}
+            if result.get('success'):
+                self._delta_supported = True
+                self._remember_pushed(mermaid_content, digest)
+                self.pushes_delta += 1
+                return True
+        # 409やresync要求の場合は全体を送り直す
+        self.resyncs += 1
+        print(f"システムグラフの差分が適用されなかったため全体を再送します（seq={self._seq}, base_seq={self._pushed_seq}）")
+        return False
+
+    def _push_full(self, mermaid_content: str, digest: str, file_path: str, page: ft.Page) -> bool:
+        """グラフ全体を送信する"""
+        payload = make_full(mermaid_content, self._seq)
+        payload.update({
+            "file_path": file_path,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ")
+        })
+        if graph_event_channel.url:
+            payload["events_url"] = graph_event_channel.url
+
+        response = self._request('POST', '/api/update', json=payload)
+        if response.status_code == 200:
+            result = response.json()
+            if result.get('success'):
+                self._remember_pushed(mermaid_content, digest)
+                self.pushes_full += 1
+                if page:
+                    show_status(page, "システムグラフを更新しました")
                 else:
-                    error_msg = f"グラフの更新に失敗しました: {result.get('message', '不明なエラー')}"
-                    if page:
-                        show_error_dialog(page, "更新エラー", error_msg)
-                    else:
-                        print(f"更新エラー: {error_msg}")
-                    return False
+                    print("システムグラフを更新しました")
+                return True
             else:
-                error_msg = f"APIリクエストに失敗しました: {response.status_code}"
+                error_msg = f"グラフの更新に失敗しました: {result.get('message', '不明なエラー')}"
                 if page:
-                    show_error_dialog(page, "APIエラー", error_msg)
+                    show_error_dialog(page, "更新エラー", error_msg)
                 else:
-                    print(f"APIエラー: {error_msg}")
+                    print(f"更新エラー: {error_msg}")
                 return False
-                
-        except requests.RequestException as e:
-            error_msg = f"Mermaidコンテナとの通信に失敗しました: {e}"
+        else:
+            error_msg = f"APIリクエストに失敗しました: {response.status_code}"
             if page:
-                show_error_dialog(page, "通信エラー", error_msg)
+                show_error_dialog(page, "APIエラー", error_msg)
             else:
-                print(f"通信エラー: {error_msg}")
+                print(f"APIエラー: {error_msg}")
             return False
+
+    def get_push_stats(self) -> Dict[str, int]:
+        """グラフの送信回数の統計を取得する"""
+        return {
+            'full': self.pushes_full,
+            'delta': self.pushes_delta,
+            'skipped': self.pushes_skipped,
+            'resyncs': self.resyncs
+        }
     
     def open_graph_viewer(self, page: ft.Page) -> bool:
         """システムグラフビューアーをブラウザで開く"""
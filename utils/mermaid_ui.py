@@ -3,11 +3,26 @@ Mermaid関連のUI機能を提供するモジュール
 """
 import flet as ft
 import threading
-from .mermaid_container_manager import mermaid_container_manager
+from pathlib import Path
+from .mermaid_container_manager import mermaid_container_manager, get_startup_mode
+from .system_graph_viewer import (
+    SystemGraphViewer,
+    get_graph_viewer_mode,
+    toggle_group_expansion,
+    auto_generate_mermaid_file
+)
 from .dialogs import show_error_dialog, show_status
+from .update_scheduler import flush_update
 
 def initialize_mermaid_container(page: ft.Page):
-    """Mochimaki起動時にmermaidコンテナを初期化する"""
+    """Mochimaki起動時にmermaidコンテナを初期化する
+
+    MOCHIMAKI_MERMAID_STARTUP=eagerの場合のみ起動時にコンテナを起動する。
+    既定（lazy）ではシステムグラフボタンが押されるまで何もしない。
+    """
+    if get_startup_mode() != 'eager':
+        print("Mermaidコンテナはシステムグラフの表示時に起動します")
+        return
     try:
         # バックグラウンドでmermaidコンテナを起動
         def start_mermaid_container():
@@ -20,14 +35,68 @@ def initialize_mermaid_container(page: ft.Page):
     except Exception as e:
         print(f"Mermaidコンテナの初期化でエラーが発生: {e}")
 
+def show_embedded_graph(page: ft.Page):
+    """システムグラフをMermaidコンテナを使わずにアプリ内のダイアログで表示する"""
+    from .ui_utils import docker_compose_dir
+    if not docker_compose_dir:
+        show_status(page, "ビルドコンテキストが選択されていません。")
+        return
+
+    viewer = SystemGraphViewer()
+    if not viewer.load_project_info(Path(docker_compose_dir)):
+        show_error_dialog(page, "エラー", "プロジェクト情報の読み込みに失敗しました")
+        return
+
+    def close_dialog(e):
+        dialog.open = False
+        flush_update(page)
+        page.overlay.remove(dialog)
+
+    def on_node_click(node):
+        # コンテナのノードをクリックすると、そのサービスの展開表示を切り替える
+        if toggle_group_expansion(node, docker_compose_dir):
+            render()
+            flush_update(page)
+            auto_generate_mermaid_file()
+
+    def render():
+        graph_row.controls = [viewer.build_graph_control(on_node_click=on_node_click)]
+        dialog.title.value = f"システム構成グラフ（詳細度: {viewer.selected_level}）"
+
+    graph_row = ft.Row([], scroll=ft.ScrollMode.AUTO)
+    dialog = ft.AlertDialog(
+        title=ft.Text("システム構成グラフ"),
+        content=ft.Container(
+            content=ft.Column([graph_row], scroll=ft.ScrollMode.AUTO),
+            width=960,
+            height=600
+        ),
+        actions=[ft.TextButton("閉じる", on_click=close_dialog)]
+    )
+    render()
+    page.overlay.append(dialog)
+    dialog.open = True
+    flush_update(page)
+
 def on_system_graph_button_click(page: ft.Page):
     """システムグラフボタンがクリックされたときの処理"""
+    mode = get_graph_viewer_mode()
+    if mode == 'embedded' or (mode == 'auto' and not mermaid_container_manager.is_viewer_installed()):
+        try:
+            show_embedded_graph(page)
+        except Exception as e:
+            show_error_dialog(page, "エラー", f"システムグラフの表示に失敗しました: {e}")
+        return
     try:
         # mermaidコンテナが起動していることを確認
         if mermaid_container_manager.ensure_container_running(page):
             # システムグラフビューアーをブラウザで開く
             mermaid_container_manager.open_graph_viewer(page)
         else:
-            show_error_dialog(page, "エラー", "Mermaidコンテナの起動に失敗しました")
+            if mode == 'auto':
+                # コンテナを起動できない場合はアプリ内で表示する
+                show_embedded_graph(page)
+            else:
+                show_error_dialog(page, "エラー", "Mermaidコンテナの起動に失敗しました")
     except Exception as e:
         show_error_dialog(page, "エラー", f"システムグラフの表示に失敗しました: {e}") 
\ No newline at end of file
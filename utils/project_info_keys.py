@@ -0,0 +1,6 @@
+"""
+project_info.jsonの項目のうち、複数のモジュールで扱いを揃える必要があるものを定義するモジュール
+"""
+
+# コンテナの状態に応じて書き換えられ、docker-compose.ymlやシステム構成グラフの内容に影響しないサービスの項目
+VOLATILE_SERVICE_KEYS = ("id",)
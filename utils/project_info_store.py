@@ -0,0 +1,271 @@
+"""
+project_info.jsonの読み込みをプロセス全体で共有するモジュール
+"""
+import atexit
+import copy
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+from .file_utils import atomic_write_bytes
+
+PROJECT_INFO_FILE_NAME = 'project_info.json'
+# 短時間に続けて行われた保存をまとめて書き込むまでの待ち時間（秒）
+WRITE_COALESCE_DELAY = 0.2
+# まとめた書き込みに失敗した場合に再度書き込むまでの待ち時間（秒）
+WRITE_RETRY_DELAY = 5.0
+
+class ProjectInfoStore:
+    """ビルドコンテキストごとにproject_info.jsonのパース結果を保持するクラス
+
+    ファイルのst_mtime_nsとサイズが前回と同じであれば再読み込みを行わず、
+    変化していても内容のハッシュが同じであれば再パースを行わない。
+    load()が返す辞書は共有オブジェクトのため、呼び出し側で変更してはならない。
+    変更する場合はsnapshot()で複製を取得してからsave()で保存する。
+
+    save()は内容をすぐにメモリへ反映し、ファイルへの書き込みはWRITE_COALESCE_DELAY秒後に
+    まとめて行う。シリアライズ結果がディスク上の内容と同じ場合は書き込みを省略する。
+    コンテナIDの反映など状態の更新に伴う保存はまとめて書き込み、失敗した場合はWRITE_RETRY_DELAY秒後に再度書き込む。
+    ユーザーの操作による変更はdelay=0で保存し、書き込みの失敗を呼び出し側で扱えるようにする。
+    """
+    def __init__(self, project_info_path: Path):
+        self.path = Path(project_info_path)
+        self._lock = threading.RLock()
+        self._document: Optional[Dict[str, Any]] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._digest: Optional[str] = None
+        self._pending = False
+        self._flush_timer: Optional[threading.Timer] = None
+        self.loads = 0
+        self.parses = 0
+        self.reads_avoided = 0
+        self.writes = 0
+        self.writes_skipped = 0
+        self.writes_coalesced = 0
+
+    def _stat_signature(self) -> Tuple[int, int]:
+        """ファイルの(st_mtime_ns, st_size)を取得する"""
+        st = self.path.stat()
+        return st.st_mtime_ns, st.st_size
+
+    def load(self) -> Dict[str, Any]:
+        """project_info.jsonの内容を取得する
+
+        Returns:
+            Dict[str, Any]: パース済みのproject_info
+
+        Raises:
+            FileNotFoundError: ファイルが存在しない場合
+            ValueError: ファイルが空の場合
+            json.JSONDecodeError: JSONの解析に失敗した場合
+        """
+        with self._lock:
+            self.loads += 1
+            if self._pending:
+                # 未書き込みの変更がある場合はメモリ上の内容が最新
+                self.reads_avoided += 1
+                return self._document
+
+            try:
+                signature = self._stat_signature()
+            except FileNotFoundError:
+                raise FileNotFoundError(f"project_info.jsonが見つかりません: {self.path}")
+
+            if self._document is not None and signature == self._signature:
+                self.reads_avoided += 1
+                return self._document
+
+            if signature[1] == 0:
+                raise ValueError(f"project_info.jsonが空です: {self.path}")
+
+            raw = self.path.read_bytes()
+            digest = hashlib.sha256(raw).hexdigest()
+            if self._document is not None and digest == self._digest:
+                # mtimeだけが変化した場合（touchなど）は再パースしない
+                self._signature = signature
+                self.reads_avoided += 1
+                return self._document
+
+            document = json.loads(raw)
+            self.parses += 1
+            self._document = document
+            self._signature = signature
+            self._digest = digest
+            return document
+
+    def snapshot(self) -> Dict[str, Any]:
+        """変更用にproject_infoの複製を取得する"""
+        with self._lock:
+            return copy.deepcopy(self.load())
+
+    def save(self, document: Dict[str, Any], delay: float = WRITE_COALESCE_DELAY) -> None:
+        """project_infoを保存し、保持している内容を更新する
+
+        Args:
+            document (Dict[str, Any]): 保存するproject_info
+            delay (float): 書き込みまでの待ち時間（秒）。0以下の場合はすぐに書き込む
+        """
+        with self._lock:
+            if self._pending:
+                self.writes_coalesced += 1
+            self._document = document
+            self._pending = True
+            if delay <= 0:
+                self.flush()
+            elif self._flush_timer is None:
+                self._schedule_flush(delay)
+
+    def _schedule_flush(self, delay: float) -> None:
+        self._flush_timer = threading.Timer(delay, self._flush_in_background)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def flush(self) -> bool:
+        """未書き込みの変更をファイルへ書き込む
+
+        Returns:
+            bool: 実際に書き込んだ場合はTrue
+        """
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending:
+                return False
+            self._pending = False
+
+            data = json.dumps(self._document, indent=2, ensure_ascii=False).encode('utf-8')
+            digest = hashlib.sha256(data).hexdigest()
+            try:
+                on_disk_unchanged = self._stat_signature() == self._signature
+            except FileNotFoundError:
+                on_disk_unchanged = False
+            if digest == self._digest and on_disk_unchanged:
+                self.writes_skipped += 1
+                return False
+
+            try:
+                atomic_write_bytes(self.path, data)
+            except Exception as e:
+                # 変更を失わないよう、次回のflush()で再度書き込む
+                self._pending = True
+                print(f"project_info.jsonの書き込みに失敗しました: {e}")
+                raise
+            self._signature = self._stat_signature()
+            self._digest = digest
+            self.writes += 1
+            return True
+
+    def _flush_in_background(self) -> None:
+        """待ち時間の経過後に書き込む（失敗した場合は変更を保持し、WRITE_RETRY_DELAY秒後に再度書き込む）"""
+        try:
+            self.flush()
+        except Exception:
+            with self._lock:
+                if self._pending and self._flush_timer is None:
+                    self._schedule_flush(WRITE_RETRY_DELAY)
+
+    def invalidate(self) -> None:
+        """保持している内容を破棄し、次回のload()で必ず読み込み直す"""
+        with self._lock:
+            self.flush()
+            self._document = None
+            self._signature = None
+            self._digest = None
+
+    # --- 型付きアクセサ ---
+
+    def get_services(self) -> Dict[str, Dict[str, Any]]:
+        """サービス定義の辞書を取得する"""
+        return self.load().get('services', {}) or {}
+
+    def get_service(self, service_name: str) -> Optional[Dict[str, Any]]:
+        """指定したサービスの定義を取得する"""
+        return self.get_services().get(service_name)
+
+    def get_desktop_apps(self) -> Dict[str, Dict[str, Any]]:
+        """ホストマシンで実行するアプリケーションの辞書を取得する"""
+        return self.load().get('desktop_apps', {}).get('host_machine', {}).get('apps', {}) or {}
+
+    def get_apps(self, service_name: str) -> Dict[str, Dict[str, Any]]:
+        """サービスのアプリケーションの辞書を取得する
+
+        Args:
+            service_name (str): サービス名。"host_machine"の場合はデスクトップアプリを返す
+
+        Returns:
+            Dict[str, Dict[str, Any]]: アプリケーション名をキーとする辞書
+        """
+        if service_name == "host_machine":
+            return self.get_desktop_apps()
+        service = self.get_service(service_name)
+        if not service:
+            return {}
+        return service.get('apps', {}) or {}
+
+    def get_app(self, service_name: str, app_name: str) -> Optional[Dict[str, Any]]:
+        """アプリケーションの定義を取得する"""
+        return self.get_apps(service_name).get(app_name)
+
+    def get_devices(self, service_name: str, app_name: str) -> Dict[str, Dict[str, Any]]:
+        """アプリケーションのデバイス設定の辞書を取得する"""
+        app_info = self.get_app(service_name, app_name)
+        if not app_info:
+            return {}
+        return app_info.get('devices', {}) or {}
+
+    def get_device(self, service_name: str, app_name: str, device_type: str) -> Optional[Dict[str, Any]]:
+        """デバイス設定を取得する"""
+        return self.get_devices(service_name, app_name).get(device_type)
+
+    def get_stats(self) -> Dict[str, int]:
+        """読み込み回数と回避できた読み込み回数を取得する"""
+        with self._lock:
+            return {
+                'loads': self.loads,
+                'parses': self.parses,
+                'reads_avoided': self.reads_avoided,
+                'writes': self.writes,
+                'writes_skipped': self.writes_skipped,
+                'writes_coalesced': self.writes_coalesced
+            }
+
+_stores: Dict[str, ProjectInfoStore] = {}
+_stores_lock = threading.Lock()
+
+def get_project_info_store(build_context_path, file_name: str = PROJECT_INFO_FILE_NAME) -> ProjectInfoStore:
+    """ビルドコンテキストに対応するProjectInfoStoreを取得する
+
+    Args:
+        build_context_path: ビルドコンテキストのパス
+        file_name (str): プロジェクト情報ファイル名
+
+    Returns:
+        ProjectInfoStore: ビルドコンテキストごとに共有されるインスタンス
+    """
+    project_info_path = (Path(build_context_path) / file_name).resolve()
+    key = str(project_info_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ProjectInfoStore(project_info_path)
+            _stores[key] = store
+        return store
+
+def get_project_info_stats() -> Dict[str, Dict[str, int]]:
+    """全てのProjectInfoStoreの統計情報を取得する"""
+    with _stores_lock:
+        stores = dict(_stores)
+    return {key: store.get_stats() for key, store in stores.items()}
+
+@atexit.register
+def flush_all_project_info() -> None:
+    """全てのProjectInfoStoreの未書き込みの変更をファイルへ書き込む"""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        try:
+            store.flush()
+        except Exception as e:
+            print(f"project_info.jsonの書き込みに失敗しました: {store.path}: {e}")
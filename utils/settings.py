@@ -1,6 +1,12 @@
+import hashlib
 import json
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Tuple
 from .dialogs import show_error_dialog, show_status
+from .project_info_store import get_project_info_store
+from .git_cache import git_mirror_cache, resolve_remote_commit
 from pathlib import Path
 import shutil
 import os
@@ -16,16 +22,9 @@ def on_rm_error(func, path, _):
 
 def get_container_settings(docker_compose_dir, page):
     """project_info.jsonから設定を読み込む"""
-    project_info_path = Path(docker_compose_dir) / 'project_info.json'
     try:
-        if not project_info_path.exists():
-            raise FileNotFoundError(f"project_info.jsonが見つかりません: {project_info_path}")
-            
-        if project_info_path.stat().st_size == 0:
-            raise ValueError(f"project_info.jsonが空です: {project_info_path}")
-
-        with project_info_path.open('r') as f:
-            return json.load(f)
+        # 内容が変化していなければメモリ上の内容をそのまま返す
+        return get_project_info_store(docker_compose_dir).load()
             
     except FileNotFoundError as e:
         show_error_dialog(page, "ファイルが見つかりません", str(e))
@@ -40,77 +39,212 @@ def get_container_settings(docker_compose_dir, page):
         show_error_dialog(page, "エラー", f"予期せぬエラーが発生しました: {str(e)}")
         return None
 
-def clone_repositories(project_info: dict, docker_compose_dir: str, page) -> bool:
-    """リポジトリをクローンする"""
-    if 'repositories' not in project_info:
+# 同時に実行するクローンの数
+CLONE_MAX_WORKERS = 4
+# クローンに失敗した場合の方針（"fail_fast": 未開始のクローンを取りやめる, "continue": 残りのクローンを続ける）
+CLONE_POLICY_ENV = 'MOCHIMAKI_CLONE_POLICY'
+
+def get_clone_policy() -> str:
+    """クローンに失敗した場合の方針を取得する"""
+    policy = os.environ.get(CLONE_POLICY_ENV, 'fail_fast').strip().lower()
+    return policy if policy in ('fail_fast', 'continue') else 'fail_fast'
+
+def _clone_repository(repo_name: str, repo_info: dict, programs_dir: Path, on_progress, on_start) -> bool:
+    """プログラムのリポジトリを1つクローンする
+
+    Returns:
+        bool: クローンした場合はTrue。既に存在する場合はFalse
+    """
+    repo_dir = programs_dir / repo_name
+    if repo_dir.exists():
+        return False
+    on_start()
+    git_mirror_cache.clone(repo_info['url'], repo_dir, repo_info['branch'], on_progress=on_progress)
+    return True
+
+# 取得したDockerfileのコミットと内容のハッシュを記録するファイル
+DOCKERFILE_COMMIT_FILE = '.source_commit'
+
+class DockerfileModifiedError(Exception):
+    """取得後に変更されたDockerfileを更新しようとした場合の例外"""
+
+def _content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+def _read_dockerfile_source(commit_path: Path) -> Tuple[Optional[str], Optional[str]]:
+    """記録された取得元のコミットと内容のハッシュを読み込む（記録がない項目はNone）"""
+    if not commit_path.exists():
+        return None, None
+    lines = commit_path.read_text(encoding='utf-8').split()
+    commit = lines[0] if lines else None
+    content_hash = next((line[len('sha256:'):] for line in lines[1:] if line.startswith('sha256:')), None)
+    return commit, content_hash
+
+def _write_dockerfile_source(commit_path: Path, commit: str, content: bytes) -> None:
+    commit_path.write_text(f"{commit}\nsha256:{_content_hash(content)}\n", encoding='utf-8')
+
+def _record_unstamped_dockerfile(url: str, branch: str, remote_commit: str, dockerfile_path: Path,
+                                 commit_path: Path, on_progress) -> None:
+    """取得元の記録がないDockerfileを、上書きせずにリモートのブランチの内容と比較する
+
+    手元で変更されたかどうかを判断できないため、リモートの内容と同じ場合のみ取得元を記録し、
+    異なる場合は例外とする（ファイルを取得し直す場合は削除してから開く）。
+
+    Raises:
+        DockerfileModifiedError: リモートのブランチの内容と異なる場合
+    """
+    commit, content = git_mirror_cache.read_file(url, branch, 'Dockerfile', remote_commit, on_progress=on_progress)
+    current = dockerfile_path.read_bytes()
+    if content != current:
+        raise DockerfileModifiedError(
+            f"{dockerfile_path}は取得元の記録がなく、リモートの内容と異なるため更新しませんでした"
+            "（取得し直す場合はDockerfileを削除してください）"
+        )
+    _write_dockerfile_source(commit_path, commit, current)
+
+def _fetch_dockerfile(dockerfile_name: str, dockerfile_info: dict, dockerfiles_dir: Path, on_progress, on_start,
+                      update: bool = False) -> bool:
+    """Dockerfileを1つ取得する
+
+    リポジトリ全体はクローンせず、ミラーまたは浅い部分クローンからDockerfileだけを読み出す。
+    取得済みのDockerfileはupdateがTrueの場合のみ更新し、リモートのブランチのコミットが
+    前回取得したコミットと同じ場合やリモートに接続できない場合はそのまま使用する。
+    取得元の記録がないDockerfileは上書きせず、リモートのブランチの内容と同じ場合のみ取得元を記録する。
+
+    Returns:
+        bool: 取得（更新）した場合はTrue。取得済みのDockerfileをそのまま使用した場合はFalse
+
+    Raises:
+        DockerfileModifiedError: 更新しようとしたDockerfileが取得後に変更されている場合
+    """
+    dockerfile_dir = dockerfiles_dir / dockerfile_name
+    dockerfile_dir.mkdir(exist_ok=True)
+    dockerfile_path = dockerfile_dir / 'Dockerfile'
+    commit_path = dockerfile_dir / DOCKERFILE_COMMIT_FILE
+
+    # 以前の方式で残った一時ディレクトリを削除
+    temp_dir = dockerfile_dir / '.temp'
+    if temp_dir.exists():
+        shutil.rmtree(temp_dir, onerror=on_rm_error)
+
+    url, branch = dockerfile_info['url'], dockerfile_info['branch']
+    remote_commit = None
+    if dockerfile_path.exists():
+        if not update:
+            return False
+        recorded_commit, recorded_hash = _read_dockerfile_source(commit_path)
+        # 取得時の内容と一致しない（手元で変更された）Dockerfileは上書きしない
+        if recorded_hash is not None and _content_hash(dockerfile_path.read_bytes()) != recorded_hash:
+            raise DockerfileModifiedError(f"{dockerfile_path}は取得後に変更されているため、更新しませんでした")
+        remote_commit = resolve_remote_commit(url, branch)
+        if remote_commit is None or remote_commit == recorded_commit:
+            return False
+        if recorded_hash is None:
+            _record_unstamped_dockerfile(url, branch, remote_commit, dockerfile_path, commit_path, on_progress)
+            return False
+
+    on_start()
+    commit, content = git_mirror_cache.read_file(url, branch, 'Dockerfile', remote_commit, on_progress=on_progress)
+    if content is None:
+        print(f"{dockerfile_name}のリポジトリにDockerfileがありません: {url} ({branch})")
+        return False
+
+    # 書き込み途中のDockerfileが使われないよう、一時ファイルに書き込んでから置き換える
+    temp_path = dockerfile_dir / 'Dockerfile.tmp'
+    temp_path.write_bytes(content)
+    os.replace(temp_path, dockerfile_path)
+    _write_dockerfile_source(commit_path, commit, content)
+    return True
+
+def clone_sources(project_info: dict, docker_compose_dir: str, page, policy: Optional[str] = None,
+                  max_workers: int = CLONE_MAX_WORKERS, update_dockerfiles: bool = False) -> bool:
+    """プログラムのリポジトリとDockerfileを並行して取得する
+
+    Args:
+        project_info (dict): プロジェクト情報
+        docker_compose_dir (str): ビルドコンテキストのパス
+        page: ページオブジェクト
+        policy (Optional[str]): "fail_fast"または"continue"（省略時は環境変数MOCHIMAKI_CLONE_POLICY、既定はfail_fast）
+        max_workers (int): 同時に実行するクローンの数
+        update_dockerfiles (bool): Trueの場合は取得済みのDockerfileもリモートの更新を確認して取得し直す
+
+    Returns:
+        bool: 全て取得できた場合はTrue
+    """
+    policy = policy or get_clone_policy()
+    jobs = []
+    if project_info.get('repositories'):
+        programs_dir = Path(docker_compose_dir) / 'programs'
+        programs_dir.mkdir(exist_ok=True)
+        for repo_name, repo_info in project_info['repositories'].items():
+            if not (programs_dir / repo_name).exists():
+                jobs.append((repo_name, lambda progress, start, n=repo_name, i=repo_info:
+                             _clone_repository(n, i, programs_dir, progress, start)))
+    if project_info.get('dockerfiles'):
+        dockerfiles_dir = Path(docker_compose_dir) / 'dockerfiles'
+        dockerfiles_dir.mkdir(exist_ok=True)
+        for dockerfile_name, dockerfile_info in project_info['dockerfiles'].items():
+            if update_dockerfiles or not (dockerfiles_dir / dockerfile_name / 'Dockerfile').exists():
+                jobs.append((f"{dockerfile_name}のDockerfile",
+                             lambda progress, start, n=dockerfile_name, i=dockerfile_info:
+                             _fetch_dockerfile(n, i, dockerfiles_dir, progress, start, update_dockerfiles)))
+    if not jobs:
         return True
 
-    programs_dir = Path(docker_compose_dir) / 'programs'
-    programs_dir.mkdir(exist_ok=True)
-    
-    for repo_name, repo_info in project_info['repositories'].items():
-        repo_dir = programs_dir / repo_name
-        if not repo_dir.exists():
+    total = len(jobs)
+    aborted = threading.Event()
+    errors = []
+
+    def run_job(label, job):
+        if aborted.is_set():
+            return None
+        # 取得が必要と分かった時点でステータスを表示する
+        return job(lambda phase, percent: show_status(page, f"{label}: {phase} {percent}%"),
+                   lambda: show_status(page, f"{label}をクローン中..."))
+
+    completed = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total)), thread_name_prefix="clone") as executor:
+        futures = {executor.submit(run_job, label, job): label for label, job in jobs}
+        for future in as_completed(futures):
+            label = futures[future]
+            completed += 1
             try:
-                show_status(page, f"{repo_name}をクローン中...")
-                subprocess.run(
-                    ['git', 'clone', '-b', repo_info['branch'], repo_info['url'], str(repo_dir)],
-                    check=True
-                )
-                show_status(page, f"{repo_name}をクローンしました")
+                if not future.result():
+                    continue
+                show_status(page, f"[{completed}/{total}] {label}をクローンしました")
             except subprocess.CalledProcessError as e:
-                show_error_dialog(page, "エラー", f"{repo_name}のクローンに失敗しました: {str(e)}")
-                return False
+                errors.append(f"{label}のクローンに失敗しました: {e.stderr or e}")
+            except Exception as e:
+                errors.append(f"{label}の処理中にエラーが発生しました: {str(e)}")
+            if errors and policy == 'fail_fast':
+                # 開始前のクローンは取りやめる（実行中のクローンは完了を待つ）
+                aborted.set()
+                for pending in futures:
+                    pending.cancel()
+
+    if errors:
+        show_error_dialog(page, "エラー", "\n".join(errors))
+        return False
     return True
 
+def clone_repositories(project_info: dict, docker_compose_dir: str, page) -> bool:
+    """リポジトリをクローンする"""
+    if 'repositories' not in project_info:
+        return True
+    return clone_sources({'repositories': project_info['repositories']}, docker_compose_dir, page)
+
 def clone_dockerfiles(project_info: dict, docker_compose_dir: str, page) -> bool:
     """Dockerfileをクローンする"""
     if 'dockerfiles' not in project_info:
         return True
+    return clone_sources({'dockerfiles': project_info['dockerfiles']}, docker_compose_dir, page)
 
-    dockerfiles_dir = Path(docker_compose_dir) / 'dockerfiles'
-    dockerfiles_dir.mkdir(exist_ok=True)
-    
-    for dockerfile_name, dockerfile_info in project_info['dockerfiles'].items():
-        dockerfile_dir = dockerfiles_dir / dockerfile_name
-        dockerfile_dir.mkdir(exist_ok=True)
-        dockerfile_path = dockerfile_dir / 'Dockerfile'
-        
-        if not dockerfile_path.exists():
-            try:
-                show_status(page, f"{dockerfile_name}のDockerfileをクローン中...")
-                
-                # 一時的なディレクトリでクローン
-                temp_dir = dockerfile_dir / '.temp'
-                temp_dir.mkdir(exist_ok=True)
-                
-                # リポジトリをクローン（sparse-checkout用）
-                subprocess.run(
-                    ['git', 'clone', '--no-checkout', '-b', dockerfile_info['branch'], dockerfile_info['url'], str(temp_dir)],
-                    check=True
-                )
-                
-                # sparse-checkoutを設定
-                subprocess.run(['git', 'sparse-checkout', 'init', '--cone'], cwd=temp_dir, check=True)
-                subprocess.run(['git', 'sparse-checkout', 'set', 'Dockerfile'], cwd=temp_dir, check=True)
-                
-                # ファイルをチェックアウト
-                subprocess.run(['git', 'checkout'], cwd=temp_dir, check=True)
-                
-                # Dockerfileを目的の場所に移動
-                temp_dockerfile = temp_dir / 'Dockerfile'
-                if temp_dockerfile.exists():
-                    temp_dockerfile.rename(dockerfile_path)
-                
-                # 一時ディレクトリを削除
-                shutil.rmtree(temp_dir, onerror=on_rm_error)
-                
-                show_status(page, f"{dockerfile_name}のDockerfileをクローンしました")
-                
-            except subprocess.CalledProcessError as e:
-                show_error_dialog(page, "エラー", f"{dockerfile_name}のDockerfileのクローンに失敗しました: {str(e)}")
-                return False
-            except Exception as e:
-                show_error_dialog(page, "エラー", f"{dockerfile_name}の処理中にエラーが発生しました: {str(e)}")
-                return False
-    return True
+def update_dockerfiles(project_info: dict, docker_compose_dir: str, page) -> bool:
+    """取得済みのDockerfileをリモートのブランチの最新の内容に更新する
+
+    取得後に手元で変更されたDockerfileは上書きせず、エラーとして表示する。
+    """
+    if 'dockerfiles' not in project_info:
+        return True
+    return clone_sources({'dockerfiles': project_info['dockerfiles']}, docker_compose_dir, page,
+                         policy='continue', update_dockerfiles=True)
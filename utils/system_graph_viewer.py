@@ -1,121 +1,179 @@
 import flet as ft
-import json
+import flet.canvas as cv
 import os
 import traceback
 import asyncio
+import threading
+import time
 from pathlib import Path
+from typing import Callable, Dict, Optional, Set
+from .project_info_store import get_project_info_store
+from .graph_layout import get_layout, NODE_WIDTH, NODE_HEIGHT
+from .graph_model import SystemGraph, GraphNode, graph_builder, render_mermaid, DETAIL_LEVELS, DEFAULT_NODE_BUDGET
+
+# カードの更新が続いている間はグラフを再生成せず、最後の更新からこの時間（秒）後に1回だけ生成する
+GRAPH_DEBOUNCE_DELAY = 0.25
+# システムグラフの表示方法（"container": Mermaidコンテナ, "embedded": アプリ内で描画,
+# "auto": Mermaidコンテナのイメージかコンテナがあればコンテナ、なければアプリ内で描画）
+GRAPH_VIEWER_ENV = 'MOCHIMAKI_GRAPH_VIEWER'
+# アプリ内で描画する場合のノードの色（MermaidのclassDefと同じ色）
+NODE_COLORS = {
+    'host': '#2d3748',
+    'section': '#38a169',
+    'docker_section': '#3182ce',
+    'app': '#805ad5',
+    'host_app': '#805ad5',
+    'device': '#d69e2e',
+    'container': '#38a169',
+    'data': '#2f855a',
+}
+
+# グラフの詳細度（"auto"の場合はノード数がDEFAULT_NODE_BUDGET以下になる最も詳細な詳細度を選ぶ）
+GRAPH_DETAIL_ENV = 'MOCHIMAKI_GRAPH_DETAIL'
+# ビルドコンテキストごとの、詳細度にかかわらず全て表示するサービス名（ホストマシンは"host_machine"）
+_expanded_groups: Dict[str, Set[str]] = {}
+
+def get_graph_detail_level() -> str:
+    """グラフの詳細度の設定を取得する"""
+    level = os.environ.get(GRAPH_DETAIL_ENV, 'auto').strip().lower()
+    return level if level == 'auto' or level in DETAIL_LEVELS else 'auto'
+
+def get_expanded_groups(docker_compose_dir) -> Set[str]:
+    """ビルドコンテキストで展開表示しているサービス名を取得する（別のビルドコンテキストとは共有しない）"""
+    if docker_compose_dir is None:
+        return set()
+    return _expanded_groups.setdefault(str(Path(docker_compose_dir).resolve()), set())
+
+def toggle_group_expansion(node: GraphNode, docker_compose_dir) -> bool:
+    """コンテナ（ホストマシン）のノードの展開表示を切り替える
+
+    Args:
+        node (GraphNode): クリックされたノード
+        docker_compose_dir: ノードを表示しているビルドコンテキストのパス
+
+    Returns:
+        bool: 切り替えた場合はTrue。展開できないノードの場合はFalse
+    """
+    if node.key[0] == "container":
+        group = node.key[1]
+    elif node.key == ("section", "host"):
+        group = "host_machine"
+    else:
+        return False
+    expanded_groups = get_expanded_groups(docker_compose_dir)
+    if group in expanded_groups:
+        expanded_groups.discard(group)
+    else:
+        expanded_groups.add(group)
+    return True
+
+def get_graph_viewer_mode() -> str:
+    """システムグラフの表示方法を取得する"""
+    mode = os.environ.get(GRAPH_VIEWER_ENV, 'container').strip().lower()
+    return mode if mode in ('container', 'embedded', 'auto') else 'container'
 
 class SystemGraphViewer:
-    def __init__(self):
+    def __init__(self, detail_level: Optional[str] = None, node_budget: int = DEFAULT_NODE_BUDGET):
         self.project_info = None
+        self.docker_compose_dir = None
+        self.detail_level = detail_level or get_graph_detail_level()
+        self.node_budget = node_budget
+        self.selected_level: Optional[str] = None
 
     def load_project_info(self, docker_compose_dir: Path):
         """docker_compose_dirからproject_info.jsonを読み込む"""
         try:
-            project_info_path = docker_compose_dir / "project_info.json"
-            with open(project_info_path, 'r', encoding='utf-8') as f:
-                self.project_info = json.load(f)
+            self.project_info = get_project_info_store(docker_compose_dir).load()
+            self.docker_compose_dir = docker_compose_dir
             return True
         except Exception as e:
             print(f"プロジェクト情報の読み込みエラー: {e}")
             return False
 
+    def build_graph_model(self, graph_type: str = "unified") -> SystemGraph:
+        """project_infoからグラフのモデルを組み立てる（変更のないサービスの部分グラフは再利用する）"""
+        if graph_type != "unified":
+            return SystemGraph()
+        expanded_groups = get_expanded_groups(self.docker_compose_dir)
+        if self.detail_level == 'auto':
+            self.selected_level, graph = graph_builder.build_within_budget(
+                self.project_info, self.node_budget, expanded_groups
+            )
+            return graph
+        self.selected_level = self.detail_level
+        return graph_builder.build(self.project_info, self.detail_level, expanded_groups)
+
+    def _build_graph(self, graph_type: str):
+        """project_infoからノードと辺のリストを作成する
+
+        Returns:
+            tuple: ([(ノードID, ラベル, 種類)], [(始点ID, 終点ID)])
+        """
+        graph = self.build_graph_model(graph_type)
+        return graph.node_list(), graph.edge_list()
+
     def _generate_mermaid_string(self, title: str, graph_type: str):
-        node_list = []
-        edge_list = []
-        node_id_map = {}
-        node_counter = 0
-
-        def add_node(label, ntype):
-            nonlocal node_counter
-            key = (label, ntype)
-            if key not in node_id_map:
-                node_id = f"N{node_counter}"
-                node_id_map[key] = node_id
-                node_list.append((node_id, label, ntype))
-                node_counter += 1
-            return node_id_map[key]
-
-        if graph_type == "unified":
-            # 統合されたシステム構成図
-            # Host Machine Apps
-            host_apps = self.project_info.get("desktop_apps", {}).get("host_machine", {}).get("apps", {})
-            if host_apps:
-                host_section_id = add_node("Host Machine", "section")
-                
-                for app_name, app_info in host_apps.items():
-                    app_id = add_node(f"App: {app_name}", "host_app")
-                    edge_list.append((host_section_id, app_id))
-                    if "data_roots" in app_info:
-                        for data_root in app_info["data_roots"]:
-                            data_id = add_node(f"Data: {data_root}", "data")
-                            edge_list.append((app_id, data_id))
-                    if "devices" in app_info:
-                        for device_name, device_info in app_info["devices"].items():
-                            if "target" in device_info:
-                                for target in device_info["target"]:
-                                    device_label = f"Device: {device_name} (Target: {target})"
-                                    dev_id = add_node(device_label, "device")
-                                    edge_list.append((app_id, dev_id))
-                            else:
-                                dev_id = add_node(f"Device: {device_name}", "device")
-                                edge_list.append((app_id, dev_id))
-            
-            # Services
-            services = self.project_info.get("services", {})
-            if services:
-                services_section_id = add_node("Docker", "docker_section")
-                
-                for service_name, service_info in services.items():
-                    container_label = f"Container: {service_name}"
-                    if "image" in service_info:
-                        container_label += f" (Image: {service_info['image']})"
-                    cont_id = add_node(container_label, "container")
-                    edge_list.append((services_section_id, cont_id))
-                    
-                    if "apps" in service_info:
-                        for app_name, app_info in service_info["apps"].items():
-                            app_label = f"App: {app_name}"
-                            if "container_port" in app_info:
-                                app_label += f" (Port: {app_info['container_port']})"
-                            app_id = add_node(app_label, "app")
-                            edge_list.append((cont_id, app_id))
-                            
-                            if "data_roots" in app_info:
-                                for data_root in app_info["data_roots"]:
-                                    data_id = add_node(f"Data: {data_root}", "data")
-                                    edge_list.append((app_id, data_id))
-                            if "devices" in app_info:
-                                for device_name, device_info in app_info["devices"].items():
-                                    if "target" in device_info:
-                                        for target in device_info["target"]:
-                                            device_label = f"Device: {device_name} (Target: {target})"
-                                            dev_id = add_node(device_label, "device")
-                                            edge_list.append((app_id, dev_id))
-                                    else:
-                                        dev_id = add_node(f"Device: {device_name}", "device")
-                                        edge_list.append((app_id, dev_id))
-        
+        node_list, edge_list = self._build_graph(graph_type)
+
         # Mermaid定義生成
-        lines = ["%%{init: {'theme': 'dark'}}%%"]
-        lines.append("graph TD")
-        for node_id, label, ntype in node_list:
-            lines.append(f'    {node_id}["{label}"]')
-            lines.append(f'    class {node_id} {ntype};')
-        for src, dst in edge_list:
-            lines.append(f'    {src} --> {dst}')
-        # classDefでスタイル共通化
-        lines.append('    classDef host fill:#2d3748,stroke:#e2e8f0,stroke-width:2px,color:#ffffff;')
-        lines.append('    classDef section fill:#38a169,stroke:#e2e8f0,stroke-width:3px,color:#ffffff;')
-        lines.append('    classDef docker_section fill:#3182ce,stroke:#e2e8f0,stroke-width:1px,color:#ffffff;')
-        lines.append('    classDef app fill:#805ad5,stroke:#e2e8f0,stroke-width:1px,color:#ffffff;')
-        lines.append('    classDef host_app fill:#805ad5,stroke:#e2e8f0,stroke-width:3px,color:#ffffff;')
-        lines.append('    classDef device fill:#d69e2e,stroke:#e2e8f0,stroke-width:1px,color:#ffffff;')
-        lines.append('    classDef container fill:#38a169,stroke:#e2e8f0,stroke-width:1px,color:#ffffff;')
-        lines.append('    classDef data fill:#2f855a,stroke:#e2e8f0,stroke-width:1px,color:#ffffff;')
-        mermaid_body = "\n".join(lines)
+        mermaid_body = render_mermaid(node_list, edge_list)
         return mermaid_body, len(node_list), len(edge_list)
 
+    def build_graph_control(self, graph_type: str = "unified",
+                            on_node_click: Optional[Callable[[GraphNode], None]] = None) -> ft.Control:
+        """グラフをレイヤー状に配置し、Fletのコントロールとして描画する
+
+        Args:
+            graph_type (str): グラフの種類
+            on_node_click: ノードがクリックされたときに呼び出す関数（省略可）
+
+        Returns:
+            ft.Control: 辺を描いたCanvasとノードを重ねたStack
+        """
+        graph = self.build_graph_model(graph_type)
+        edge_list = graph.edge_list()
+        layout = get_layout([node.id for node in graph.nodes], edge_list)
+
+        # 辺は始点の下端中央から終点の上端中央へ引く
+        shapes = []
+        edge_paint = ft.Paint(color=ft.Colors.GREY_500, stroke_width=1.5, style=ft.PaintingStyle.STROKE)
+        for src, dst in edge_list:
+            x1, y1 = layout.positions[src]
+            x2, y2 = layout.positions[dst]
+            start = (x1 + NODE_WIDTH / 2, y1 + NODE_HEIGHT)
+            end = (x2 + NODE_WIDTH / 2, y2)
+            shapes.append(cv.Line(start[0], start[1], end[0], end[1], paint=edge_paint))
+            # 矢印
+            shapes.append(cv.Path(
+                [
+                    cv.Path.MoveTo(end[0], end[1]),
+                    cv.Path.LineTo(end[0] - 5, end[1] - 8),
+                    cv.Path.LineTo(end[0] + 5, end[1] - 8),
+                    cv.Path.Close(),
+                ],
+                paint=ft.Paint(color=ft.Colors.GREY_500, style=ft.PaintingStyle.FILL)
+            ))
+
+        controls = [cv.Canvas(shapes, width=layout.width, height=layout.height)]
+        for node in graph.nodes:
+            node_id, label, ntype = node.id, node.label, node.ntype
+            x, y = layout.positions[node_id]
+            controls.append(ft.Container(
+                content=ft.Text(label, size=11, color=ft.Colors.WHITE, text_align=ft.TextAlign.CENTER,
+                                max_lines=2, overflow=ft.TextOverflow.ELLIPSIS, tooltip=label),
+                left=x,
+                top=y,
+                width=NODE_WIDTH,
+                height=NODE_HEIGHT,
+                alignment=ft.alignment.center,
+                padding=4,
+                bgcolor=NODE_COLORS.get(ntype, ft.Colors.GREY_700),
+                border=ft.border.all(1, '#e2e8f0'),
+                border_radius=ft.border_radius.all(6),
+                on_click=(lambda e, n=node: on_node_click(n)) if on_node_click else None,
+            ))
+        return ft.Stack(controls, width=layout.width, height=layout.height)
+
     def generate_system_graph(self, docker_compose_dir: Path, output_path: str = "output_mermaid.txt"):
         """システム構成グラフを生成してファイルに出力する"""
         try:
@@ -195,8 +253,81 @@ async def main(page: ft.Page):
         page.add(ft.Text(f"致命的なエラーが発生しました:\n{tb}", font_family="monospace"))
         await page.update_async()
 
+class SystemGraphWorker:
+    """システム構成グラフの再生成をバックグラウンドで行うクラス
+
+    mark_dirty()で再生成を要求すると、最後の要求からdebounce秒後に
+    ワーカースレッドで1回だけグラフを生成し、Mermaidコンテナへ送信する。
+    project_infoはProjectInfoStoreのメモリ上の内容を使用する。
+    """
+    def __init__(self, debounce: float = GRAPH_DEBOUNCE_DELAY):
+        self.debounce = debounce
+        self._cond = threading.Condition()
+        self._dirty_path: Optional[Path] = None
+        self._dirty_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._last_content: Dict[str, str] = {}
+        self.requested = 0
+        self.generated = 0
+
+    def mark_dirty(self, docker_compose_path: Path) -> None:
+        """グラフの再生成を要求する"""
+        with self._cond:
+            self.requested += 1
+            self._dirty_path = Path(docker_compose_path)
+            self._dirty_at = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="system-graph-worker", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._dirty_path is None:
+                    self._cond.wait()
+                # 要求が続いている間は待機する
+                while True:
+                    remaining = self._dirty_at + self.debounce - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                docker_compose_path = self._dirty_path
+                self._dirty_path = None
+            try:
+                self._regenerate(docker_compose_path)
+            except Exception as e:
+                print(f"Mermaidファイル自動生成でエラーが発生: {e}")
+
+    def _regenerate(self, docker_compose_path: Path, output_path: str = "output_mermaid.txt") -> None:
+        viewer = SystemGraphViewer()
+        if not viewer.load_project_info(docker_compose_path):
+            print("Mermaidファイル自動生成エラー: プロジェクト情報の読み込みに失敗しました")
+            return
+        mermaid_content, nodes, edges = viewer._generate_mermaid_string("System Configuration", "unified")
+        self.generated += 1
+
+        # 内容が変わっていない場合はファイルを書き直さない
+        output_file_path = docker_compose_path / output_path
+        key = str(output_file_path)
+        if self._last_content.get(key) != mermaid_content or not output_file_path.exists():
+            with open(output_file_path, "w", encoding="utf-8") as f:
+                f.write(mermaid_content)
+            self._last_content[key] = mermaid_content
+            print(f"Mermaidファイル自動生成: システム構成グラフを {output_file_path} に出力しました。ノード: {nodes}, エッジ: {edges}"
+                  f"（要求 {self.requested}回, 生成 {self.generated}回）")
+
+        # Mermaidコンテナに通知を送信
+        notify_mermaid_container(docker_compose_path, mermaid_content)
+
+# シングルトンインスタンス
+system_graph_worker = SystemGraphWorker()
+
 def auto_generate_mermaid_file():
-    """システム構成のMermaidファイルを自動生成する"""
+    """システム構成のMermaidファイルの再生成を要求する
+
+    生成はsystem_graph_workerがバックグラウンドでまとめて行うため、この関数はすぐに戻る。
+    """
     # docker_compose_dirはui_utils.pyで定義されているグローバル変数
     # この関数はui_utils.pyから呼び出されることを想定
     try:
@@ -207,42 +338,41 @@ def auto_generate_mermaid_file():
         docker_compose_path = Path(docker_compose_dir) if docker_compose_dir else None
         
         if docker_compose_path and docker_compose_path.exists():
-            viewer = SystemGraphViewer()
-            success, message = viewer.generate_system_graph(docker_compose_path)
-            if success:
-                print(f"Mermaidファイル自動生成: {message}")
-                
-                # Mermaidコンテナに通知を送信
-                notify_mermaid_container(docker_compose_path)
-            else:
-                print(f"Mermaidファイル自動生成エラー: {message}")
+            system_graph_worker.mark_dirty(docker_compose_path)
     except Exception as e:
         print(f"Mermaidファイル自動生成でエラーが発生: {e}")
 
-def notify_mermaid_container(docker_compose_path: Path):
-    """Mermaidコンテナにシステムグラフの更新を通知する"""
+def notify_mermaid_container(docker_compose_path: Path, mermaid_content: Optional[str] = None):
+    """Mermaidコンテナにシステムグラフの更新を通知する
+
+    Args:
+        docker_compose_path (Path): ビルドコンテキストのパス
+        mermaid_content (Optional[str]): 送信するグラフ。省略した場合はoutput_mermaid.txtから読み込む
+    """
     try:
         from .mermaid_container_manager import mermaid_container_manager
         
-        # output_mermaid.txtの内容を読み込み
         mermaid_file_path = docker_compose_path / "output_mermaid.txt"
-        if mermaid_file_path.exists():
+        if mermaid_content is None:
+            # output_mermaid.txtの内容を読み込み
+            if not mermaid_file_path.exists():
+                print("output_mermaid.txtが見つかりません")
+                return
             with open(mermaid_file_path, 'r', encoding='utf-8') as f:
                 mermaid_content = f.read()
             
-            # Mermaidコンテナに更新を送信
-            # ページオブジェクトがないため、エラーハンドリングは最小限に
-            try:
-                mermaid_container_manager.update_graph(
-                    mermaid_content, 
-                    str(mermaid_file_path), 
-                    None  # ページオブジェクトなし
-                )
+        # Mermaidコンテナに更新を送信
+        # ページオブジェクトがないため、エラーハンドリングは最小限に
+        try:
+            pushed = mermaid_container_manager.update_graph(
+                mermaid_content, 
+                str(mermaid_file_path), 
+                None  # ページオブジェクトなし
+            )
+            if pushed:
                 print("Mermaidコンテナにシステムグラフの更新を通知しました")
-            except Exception as e:
-                print(f"Mermaidコンテナへの通知に失敗: {e}")
-        else:
-            print("output_mermaid.txtが見つかりません")
+        except Exception as e:
+            print(f"Mermaidコンテナへの通知に失敗: {e}")
             
     except Exception as e:
         print(f"Mermaidコンテナ通知でエラーが発生: {e}")
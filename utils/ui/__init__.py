@@ -1,7 +1,15 @@
 """
 UI関連のユーティリティモジュール
 """
-from .container_operations import get_container_status, wait_for_container, container_info_manager, wait_for_signal_file
+from .container_operations import (
+    get_container_status,
+    wait_for_container,
+    container_info_manager,
+    wait_for_signal_file,
+    async_wait_for_container,
+    async_wait_for_signal_file
+)
+from .async_runner import run_async
 from .ui_components import get_container_control_icon, set_card_color
 from .desktop_apps import setup_desktop_apps_directory, get_app_status, on_app_control
 from .ip_utils import create_error_text, show_error_message, update_all_dropdowns
@@ -16,6 +24,9 @@ __all__ = [
     'on_open_browser_click',
     'wait_for_container',
     'wait_for_signal_file',
+    'async_wait_for_container',
+    'async_wait_for_signal_file',
+    'run_async',
     'create_error_text',
     'show_error_message',
     'update_all_dropdowns',
@@ -2,14 +2,13 @@
 アプリケーション関連のユーティリティ関数を提供するモジュール
 """
 from pathlib import Path
-import json
+from ..project_info_store import get_project_info_store
 
 def update_container_info_in_project_info(docker_compose_dir, container_info):
     """project_info.jsonにコンテナIDとイメージ情報を反映する"""
-    project_info_path = Path(docker_compose_dir) / 'project_info.json'
+    store = get_project_info_store(docker_compose_dir)
     try:
-        with project_info_path.open('r') as f:
-            settings = json.load(f)
+        settings = store.snapshot()
         
         # servicesの各サービスに対してコンテナIDとイメージを更新
         if 'services' in settings:
@@ -28,9 +27,8 @@ def update_container_info_in_project_info(docker_compose_dir, container_info):
                             service_info['image'] = container['image']
                         break
         
-        # 更新した設定を保存
-        with project_info_path.open('w') as f:
-            json.dump(settings, f, indent=2)
+        # 更新した設定を保存（状態の更新のたびに呼ばれるため、続けて行われた保存はまとめて書き込む）
+        store.save(settings)
             
         print("コンテナIDとイメージ情報をproject_info.jsonに反映しました")
         
@@ -0,0 +1,36 @@
+"""
+バックグラウンドのasyncioイベントループでコルーチンを実行する関数を提供するモジュール
+
+Fletのイベントハンドラは同期関数として呼び出されるため、待機処理をハンドラ内で行うと
+そのスレッドが長時間占有される。ここで起動する1つのイベントループに処理を渡すことで、
+多数のコンテナの起動待ちを1スレッドで並行して扱う。
+"""
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Coroutine, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """バックグラウンドで動作するイベントループを取得する（初回呼び出し時に起動する）"""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="mochimaki-async", daemon=True)
+            thread.start()
+            _loop = loop
+        return _loop
+
+def run_async(coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+    """コルーチンをバックグラウンドのイベントループで実行する
+
+    Args:
+        coro: 実行するコルーチン
+
+    Returns:
+        concurrent.futures.Future: 結果を受け取るFuture。cancel()で処理をキャンセルできる
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
@@ -2,6 +2,7 @@
 コンテナ操作に関する関数を提供するモジュール
 """
 from typing import Dict, Any
+import asyncio
 import subprocess
 import time
 import flet as ft
@@ -11,16 +12,99 @@ import os
 import re
 from ..container_utils import extract_service_name, parse_project_info
 from ..dialogs import show_error_dialog
+from ..project_info_store import get_project_info_store
+from ..docker_api import docker_client, compose_project_name, parse_inspect_ports, DockerAPIUnavailable
 from .app_utils import update_container_info_in_project_info
+from .signal_watcher import get_signal_watcher
 
 class ContainerInfoManager:
     """コンテナ情報を管理するクラス"""
     def __init__(self):
         self._containers_info: Dict[str, Dict[str, Any]] = {}
     
+    def _fetch_with_api(self, docker_compose_dir: str) -> tuple:
+        """Docker Engine APIでサービスとコンテナ情報を取得する
+
+        docker-compose.ymlはproject_info.jsonのservicesから生成されるため、
+        サービスの一覧はproject_info.jsonから取得する。
+
+        Raises:
+            DockerAPIUnavailable: APIを利用できない場合
+        """
+        services = list(get_project_info_store(docker_compose_dir).get_services().keys())
+        containers = docker_client.list_compose_containers(compose_project_name(docker_compose_dir))
+        container_info = [
+            {
+                'name': container['name'],
+                'id': container['id'],
+                'ports': container['ports'],
+                'state': container['state'],
+                'image': container['image'],
+                'docker_compose_dir': docker_compose_dir
+            }
+            for container in containers
+        ]
+        return services, container_info
+
+    def _fetch_with_cli(self, docker_compose_dir: str) -> tuple:
+        """docker-composeコマンドでサービスとコンテナ情報を取得する"""
+        # docker-compose.ymlで定義されているサービスを取得
+        result = subprocess.run(['docker-compose', 'config', '--services'], 
+                                capture_output=True, text=True, check=True)
+        services = result.stdout.strip().split('\n')
+        services = [s for s in services if s]
+
+        # 実際のコンテナ情報を取得（イメージ情報を含める）
+        result = subprocess.run([
+            'docker-compose',
+            'ps',
+            '-a',
+            '--format', 
+            '{"Name":"{{ .Name }}","ID":"{{ .ID }}","State":"{{ .State }}","Ports":"{{ .Ports }}","Image":"{{ .Image }}"}'
+        ], capture_output=True, text=True, check=True)
+        
+        compose_output = result.stdout
+        
+        container_info = []
+        json_data = '[' + ','.join(line for line in compose_output.strip().split('\n') if line.strip()) + ']'
+
+        if json_data:
+            try:
+                containers = json.loads(json_data)
+                for container in containers:
+                    name = container.get('Name', '')
+                    short_id = container.get('ID', '')
+                    state = container.get('State', '')
+                    ports_str = container.get('Ports', '')
+                    image = container.get('Image', '')  # イメージ情報を取得
+                    
+                    # ポート情報をパース
+                    ports = {}
+                    if ports_str:
+                        port_matches = re.findall(r'(\d+)->(\d+)/tcp', ports_str)
+                        for host_port, container_port in port_matches:
+                            ports[int(container_port)] = int(host_port)
+                    
+                    container_info.append({
+                        'name': name,
+                        'id': short_id,
+                        'ports': ports,
+                        'state': state,
+                        'image': image,  # イメージ情報を追加
+                        'docker_compose_dir': docker_compose_dir
+                    })
+            except json.JSONDecodeError as e:
+                print(f"JSONデコードエラー。データ: {json_data}. エラー: {e}")
+            except Exception as e:
+                print(f"コンテナ情報のパースエラー。データ: {json_data}. エラー: {e}")
+        return services, container_info
+
     def get_container_info(self, docker_compose_dir: str, page: ft.Page) -> list:
         """
         コンテナ情報を取得する
+
+        Docker Engine APIが利用できる場合は1回のAPI呼び出しで取得し、
+        利用できない場合はdocker-composeコマンドにフォールバックする。
         
         Args:
             docker_compose_dir: docker-compose.ymlが存在するディレクトリのパス
@@ -34,56 +118,12 @@ class ContainerInfoManager:
             
             # プロジェクト名を取得（ディレクトリ名）
             project_name = Path(docker_compose_dir).name
-            
-            # docker-compose.ymlで定義されているサービスを取得
-            result = subprocess.run(['docker-compose', 'config', '--services'], 
-                                    capture_output=True, text=True, check=True)
-            services = result.stdout.strip().split('\n')
-            services = [s for s in services if s]
-
-            # 実際のコンテナ情報を取得（イメージ情報を含める）
-            result = subprocess.run([
-                'docker-compose',
-                'ps',
-                '-a',
-                '--format', 
-                '{"Name":"{{ .Name }}","ID":"{{ .ID }}","State":"{{ .State }}","Ports":"{{ .Ports }}","Image":"{{ .Image }}"}'
-            ], capture_output=True, text=True, check=True)
-            
-            compose_output = result.stdout
-            
-            container_info = []
-            json_data = '[' + ','.join(line for line in compose_output.strip().split('\n') if line.strip()) + ']'
-
-            if json_data:
-                try:
-                    containers = json.loads(json_data)
-                    for container in containers:
-                        name = container.get('Name', '')
-                        short_id = container.get('ID', '')
-                        state = container.get('State', '')
-                        ports_str = container.get('Ports', '')
-                        image = container.get('Image', '')  # イメージ情報を取得
-                        
-                        # ポート情報をパース
-                        ports = {}
-                        if ports_str:
-                            port_matches = re.findall(r'(\d+)->(\d+)/tcp', ports_str)
-                            for host_port, container_port in port_matches:
-                                ports[int(container_port)] = int(host_port)
-                        
-                        container_info.append({
-                            'name': name,
-                            'id': short_id,
-                            'ports': ports,
-                            'state': state,
-                            'image': image,  # イメージ情報を追加
-                            'docker_compose_dir': docker_compose_dir
-                        })
-                except json.JSONDecodeError as e:
-                    print(f"JSONデコードエラー。データ: {json_data}. エラー: {e}")
-                except Exception as e:
-                    print(f"コンテナ情報のパースエラー。データ: {json_data}. エラー: {e}")
+
+            try:
+                services, container_info = self._fetch_with_api(docker_compose_dir)
+            except DockerAPIUnavailable as e:
+                print(f"Docker Engine APIを利用できないため、docker-composeコマンドを使用します: {e}")
+                services, container_info = self._fetch_with_cli(docker_compose_dir)
 
             # サービスリストにないコンテナを追加
             for service in services:
@@ -91,11 +131,9 @@ class ContainerInfoManager:
                     # project_info.jsonから既存のimage情報を取得
                     image = ''
                     try:
-                        project_info_path = Path(docker_compose_dir) / 'project_info.json'
-                        with project_info_path.open('r') as f:
-                            project_info = json.load(f)
-                            if service in project_info.get('services', {}):
-                                image = project_info['services'][service].get('image', '')
+                        service_info = get_project_info_store(docker_compose_dir).get_service(service)
+                        if service_info:
+                            image = service_info.get('image', '')
                     except Exception as e:
                         print(f"project_info.jsonからimage情報の取得に失敗: {e}")
 
@@ -125,6 +163,44 @@ class ContainerInfoManager:
             show_error_dialog(page, "エラー", f"予期せぬエラーが発生しました: {e}")
             return []
 
+    def refresh_container(self, container_name: str, docker_compose_dir: str) -> Dict[str, Any]:
+        """1つのコンテナの情報をDocker Engine APIから取得して更新する
+
+        既存の辞書を書き換えるため、カードなどが保持している参照にも反映される。
+
+        Args:
+            container_name (str): コンテナ名
+            docker_compose_dir (str): docker-compose.ymlが存在するディレクトリのパス
+
+        Returns:
+            Dict[str, Any]: 更新したコンテナ情報。管理対象外のコンテナの場合はNone
+
+        Raises:
+            DockerAPIUnavailable: APIを利用できない場合
+        """
+        container = self._containers_info.get(container_name)
+        if container is None:
+            return None
+
+        info = docker_client.inspect_container(container_name)
+        previous_id = container.get('id', '')
+        if info is None:
+            # コンテナが削除された
+            container.update({'id': '', 'ports': {}, 'state': 'not created'})
+        else:
+            container.update({
+                'id': info.get('Id', '')[:12],
+                'ports': parse_inspect_ports(info.get('NetworkSettings', {}).get('Ports')),
+                'state': info.get('State', {}).get('Status', ''),
+                'image': info.get('Config', {}).get('Image', '') or container.get('image', '')
+            })
+
+        if container['id'] != previous_id:
+            # 再作成や削除でコンテナIDが変わった場合はproject_info.jsonにも反映
+            update_container_info_in_project_info(docker_compose_dir, list(self._containers_info.values()))
+            parse_project_info(docker_compose_dir)
+        return container
+
 # シングルトンインスタンス
 container_info_manager = ContainerInfoManager()
 
@@ -141,14 +217,11 @@ def get_container_status(container: Dict[str, Any]) -> str:
     if state in ["starting", "起動処理中"]:
         return "起動処理中"
     if state == "running":
-        # シグナルファイルの存在を確認
+        # シグナルファイルの存在を確認（監視中のインデックスを参照）
         service_name = extract_service_name(container['name'], container['docker_compose_dir'])
         if service_name:
-            signal_dir = Path(container['docker_compose_dir']) / 'signal' / service_name
-            if signal_dir.exists():
-                for signal_file in signal_dir.glob('*_startup_signal.txt'):
-                    if signal_file.exists():
-                        return "起動中"
+            if get_signal_watcher(container['docker_compose_dir']).is_service_ready(service_name):
+                return "起動中"
             return "起動処理中"
         return "起動処理中"
     elif state == "exited":
@@ -171,6 +244,14 @@ def wait_for_container(container_name, docker_compose_dir, timeout=60):
     """
     start_time = time.time()
     while time.time() - start_time < timeout:
+        try:
+            info = docker_client.inspect_container(container_name)
+            if info and info.get('State', {}).get('Running'):
+                return True
+            time.sleep(1)
+            continue
+        except DockerAPIUnavailable:
+            pass
         try:
             result = subprocess.run(
                 ['docker', 'inspect', '-f', '{{.State.Running}}', container_name],
@@ -197,16 +278,94 @@ def wait_for_signal_file(container_name: str, docker_compose_dir: str, timeout:
     Returns:
         bool: シグナルファイルが生成された場合はTrue、タイムアウトした場合はFalse
     """
-    start_time = time.time()
     service_name = extract_service_name(container_name, docker_compose_dir)
     if not service_name:
         return False
-        
-    signal_dir = Path(docker_compose_dir) / 'signal' / service_name
-    while time.time() - start_time < timeout:
-        if signal_dir.exists():
-            for signal_file in signal_dir.glob('*_startup_signal.txt'):
-                if signal_file.exists():
-                    return True
-        time.sleep(1)
-    return False 
\ No newline at end of file
+    return get_signal_watcher(docker_compose_dir).wait_for_service(service_name, timeout)
+
+
+async def _is_container_running_async(container_name: str, docker_compose_dir: str) -> bool:
+    """コンテナが起動しているかをイベントループを止めずに確認する"""
+    loop = asyncio.get_running_loop()
+    try:
+        info = await loop.run_in_executor(None, docker_client.inspect_container, container_name)
+        return bool(info and info.get('State', {}).get('Running'))
+    except DockerAPIUnavailable:
+        pass
+
+    process = await asyncio.create_subprocess_exec(
+        'docker', 'inspect', '-f', '{{.State.Running}}', container_name,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        cwd=docker_compose_dir
+    )
+    try:
+        stdout, _ = await process.communicate()
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.kill()
+        raise
+    return process.returncode == 0 and stdout.decode().strip() == 'true'
+
+async def async_wait_for_container(container_name: str, docker_compose_dir: str,
+                                   timeout: float = 60, interval: float = 1.0) -> bool:
+    """コンテナの起動を非同期に待機する
+
+    wait_for_containerの非同期版。待機中はスレッドを占有せず、
+    呼び出し側のタスクをキャンセルすると待機も中断される。
+
+    Args:
+        container_name (str): コンテナ名
+        docker_compose_dir (str): docker-compose.ymlが存在するディレクトリのパス
+        timeout (float): タイムアウト時間（秒）
+        interval (float): 状態を確認する間隔（秒）
+
+    Returns:
+        bool: コンテナが起動した場合はTrue、タイムアウトした場合はFalse
+    """
+    async def poll():
+        while not await _is_container_running_async(container_name, docker_compose_dir):
+            await asyncio.sleep(interval)
+
+    try:
+        await asyncio.wait_for(poll(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+async def async_wait_for_signal_file(container_name: str, docker_compose_dir: str,
+                                     timeout: float = 300) -> bool:
+    """シグナルファイルの生成を非同期に待機する
+
+    wait_for_signal_fileの非同期版。SignalWatcherからの通知で完了するため、ポーリングは行わない。
+
+    Args:
+        container_name (str): コンテナ名
+        docker_compose_dir (str): docker-compose.ymlが存在するディレクトリのパス
+        timeout (float): タイムアウト時間（秒）
+
+    Returns:
+        bool: シグナルファイルが生成された場合はTrue、タイムアウトした場合はFalse
+    """
+    service_name = extract_service_name(container_name, docker_compose_dir)
+    if not service_name:
+        return False
+
+    watcher = get_signal_watcher(docker_compose_dir)
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+
+    def listener(service, app, is_ready):
+        if service == service_name and is_ready:
+            loop.call_soon_threadsafe(lambda: ready.done() or ready.set_result(True))
+
+    watcher.add_listener(listener)
+    try:
+        if watcher.is_service_ready(service_name):
+            return True
+        await asyncio.wait_for(ready, timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        watcher.remove_listener(listener)
@@ -10,6 +10,7 @@ import os
 import signal
 from ..file_utils import create_symlink
 from ..dialogs import show_status, show_error_dialog
+from ..update_scheduler import request_update
 
 def get_app_status(app_name: str, desktop_processes: Dict[str, Any]) -> str:
     """アプリケーションの状態を確認"""
@@ -144,4 +145,4 @@ def on_app_control(e, app_name, app_info, button, page, desktop_processes, docke
         except Exception as e:
             show_error_dialog(page, "エラー", f"アプリケーションの起動に失敗しました: {e}")
     
-    page.update() 
\ No newline at end of file
+    request_update(page) 
\ No newline at end of file
@@ -3,6 +3,7 @@ IP設定に関する関数を提供するモジュール
 """
 import flet as ft
 from ..ip_settings import validate_ip_selections
+from ..update_scheduler import request_update
 
 def create_error_text():
     """エラーメッセージ用のテキストコントロールを作成"""
@@ -18,14 +19,14 @@ def show_error_message(error_text, scrollable_container, message, page):
     error_text.value = message
     error_text.visible = True
     scrollable_container.border = ft.border.all(1, ft.Colors.RED_400)
-    page.update()
+    request_update(page)
 
 def clear_error_message(error_text, scrollable_container, page):
     """エラーメッセージをクリア"""
     error_text.value = ""
     error_text.visible = False
     scrollable_container.border = ft.border.all(1, ft.Colors.GREY_400)
-    page.update()
+    request_update(page)
 
 def update_all_dropdowns(ip_dropdowns_column, error_text, scrollable_container, apply_button, min_connections, max_connections, allow_duplicate, page):
     """全てのドロップダウンの選択肢と色を更新"""
@@ -112,7 +113,7 @@ def update_all_dropdowns(ip_dropdowns_column, error_text, scrollable_container,
         else:
             scrollable_container.border = ft.border.all(1, ft.Colors.GREY_400)
 
-        page.update()
+        request_update(page)
 
     except Exception as e:
         print(f"update_all_dropdowns でエラーが発生: {e}")
\ No newline at end of file
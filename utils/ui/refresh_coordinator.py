@@ -0,0 +1,113 @@
+"""
+同じ処理の重複実行を防ぐシングルフライト制御を提供するモジュール
+
+実行中に同じ処理が要求された場合は実行中の処理の完了を待って結果を共有する。
+新しい要求で古い処理を置き換える場合は、古い処理にキャンセルを通知し、
+その処理が段階の区切りで終了するのを待ってから新しい処理を開始する。
+"""
+import threading
+from typing import Any, Callable, Dict, Optional
+
+class RefreshCancelled(Exception):
+    """処理が新しい要求に置き換えられた場合の例外"""
+
+class RefreshToken:
+    """実行中の処理にキャンセルを通知するためのトークン"""
+    def __init__(self, generation: int):
+        self.generation = generation
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """キャンセルを通知する"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self) -> None:
+        """キャンセルされていればRefreshCancelledを送出する（処理の段階の区切りで呼び出す）"""
+        if self._cancelled.is_set():
+            raise RefreshCancelled(f"処理 #{self.generation} は新しい要求に置き換えられました")
+
+class _Flight:
+    def __init__(self, token: RefreshToken):
+        self.token = token
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """処理を同時に1つだけ実行するクラス"""
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._current: Optional[_Flight] = None
+        self._generation = 0
+        self.started = 0
+        self.joined = 0
+        self.superseded = 0
+
+    def run(self, func: Callable[[RefreshToken], Any], supersede: bool = False) -> Any:
+        """処理を実行する
+
+        Args:
+            func: トークンを引数に取る処理。段階の区切りでtoken.check()を呼び出す
+            supersede (bool): Trueの場合は実行中の処理をキャンセルして新しく実行する。
+                Falseの場合は実行中の処理があればその完了を待って結果を返す
+
+        Returns:
+            Any: 処理の戻り値
+
+        Raises:
+            RefreshCancelled: この処理が後から来た要求に置き換えられた場合
+        """
+        previous = None
+        with self._lock:
+            current = self._current
+            if current is not None and not supersede:
+                self.joined += 1
+                flight = current
+                joined = True
+            else:
+                joined = False
+                if current is not None:
+                    current.token.cancel()
+                    previous = current
+                    self.superseded += 1
+                self._generation += 1
+                flight = _Flight(RefreshToken(self._generation))
+                self._current = flight
+                self.started += 1
+
+        if joined:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            if previous is not None:
+                # 古い処理が区切りで終了するのを待ってから開始する
+                previous.done.wait()
+            flight.token.check()
+            flight.result = func(flight.token)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._current is flight:
+                    self._current = None
+            flight.done.set()
+
+    def is_running(self) -> bool:
+        """処理が実行中かどうか"""
+        with self._lock:
+            return self._current is not None
+
+    def get_stats(self) -> Dict[str, int]:
+        """実行・合流・置き換えの回数を取得する"""
+        with self._lock:
+            return {'started': self.started, 'joined': self.joined, 'superseded': self.superseded}
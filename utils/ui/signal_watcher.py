@@ -0,0 +1,349 @@
+"""
+signalディレクトリを監視し、アプリケーションの起動完了状態をメモリ上に保持するモジュール
+
+コンテナ内のアプリケーションは起動時に signal/<サービス名>/<アプリ名>_startup_signal.txt を生成する。
+Linuxではinotifyでディレクトリを監視し、それ以外の環境ではポーリングで変化を検出する。
+inotifyのウォッチを追加できないサービスのディレクトリ（ウォッチ数の上限など）はポーリングで確認する。
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+SIGNAL_SUFFIX = '_startup_signal.txt'
+
+# inotifyの定数（linux/inotify.h）
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+_WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+_EVENT_HEADER = struct.Struct('iIII')
+
+def _app_name_from_signal_file(file_name: str) -> Optional[str]:
+    """シグナルファイル名からアプリケーション名を取り出す"""
+    if file_name.endswith(SIGNAL_SUFFIX):
+        return file_name[:-len(SIGNAL_SUFFIX)]
+    return None
+
+class SignalWatcher:
+    """signalディレクトリを監視し、サービスごと・アプリケーションごとの起動完了状態を保持するクラス
+
+    リスナーは(サービス名, アプリケーション名, シグナルファイルが存在するか)を引数に、
+    監視スレッドから呼び出される。
+    """
+    def __init__(self, build_context_path, poll_interval: float = 1.0):
+        self.signal_dir = Path(build_context_path) / 'signal'
+        self.poll_interval = poll_interval
+        self._index: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[str, str, bool], None]] = []
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.mode = None
+
+    # --- 状態の参照 ---
+
+    def is_service_ready(self, service_name: str) -> bool:
+        """サービスのシグナルファイルが1つ以上存在するかどうか"""
+        with self._lock:
+            return bool(self._index.get(service_name))
+
+    def is_app_ready(self, service_name: str, app_name: str) -> bool:
+        """アプリケーションのシグナルファイルが存在するかどうか"""
+        with self._lock:
+            return app_name in self._index.get(service_name, ())
+
+    def get_ready_apps(self, service_name: str) -> Set[str]:
+        """シグナルファイルが存在するアプリケーション名の集合を取得する"""
+        with self._lock:
+            return set(self._index.get(service_name, ()))
+
+    # --- リスナー ---
+
+    def add_listener(self, listener: Callable[[str, str, bool], None]) -> None:
+        """シグナルファイルの生成・削除を通知するリスナーを登録する"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, str, bool], None]) -> None:
+        """リスナーの登録を解除する"""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _notify(self, service_name: str, app_name: str, ready: bool) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(service_name, app_name, ready)
+            except Exception as e:
+                print(f"シグナル通知の処理中にエラーが発生: {e}")
+
+    def _set_app(self, service_name: str, app_name: str, ready: bool) -> None:
+        """インデックスを更新し、変化があればリスナーに通知する"""
+        with self._lock:
+            apps = self._index.setdefault(service_name, set())
+            if ready == (app_name in apps):
+                return
+            if ready:
+                apps.add(app_name)
+            else:
+                apps.discard(app_name)
+        self._notify(service_name, app_name, ready)
+
+    def _set_service(self, service_name: str, app_names: Set[str]) -> None:
+        """サービスのシグナルファイル一覧をまとめて反映する"""
+        with self._lock:
+            current = set(self._index.get(service_name, ()))
+        for app_name in app_names - current:
+            self._set_app(service_name, app_name, True)
+        for app_name in current - app_names:
+            self._set_app(service_name, app_name, False)
+
+    # --- ディスクの走査 ---
+
+    def _scan_service(self, service_name: str) -> Set[str]:
+        app_names = set()
+        try:
+            with os.scandir(self.signal_dir / service_name) as entries:
+                for entry in entries:
+                    app_name = _app_name_from_signal_file(entry.name)
+                    if app_name and entry.is_file():
+                        app_names.add(app_name)
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        return app_names
+
+    def rescan(self) -> None:
+        """signalディレクトリ全体を走査してインデックスを作り直す"""
+        services = set()
+        try:
+            with os.scandir(self.signal_dir) as entries:
+                services = {entry.name for entry in entries if entry.is_dir()}
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            known = set(self._index)
+        for service_name in services | known:
+            self._set_service(service_name, self._scan_service(service_name) if service_name in services else set())
+
+    # --- 操作 ---
+
+    def clear_service(self, service_name: str) -> None:
+        """サービスのシグナルファイルを削除する"""
+        service_dir = self.signal_dir / service_name
+        for app_name in self._scan_service(service_name) | self.get_ready_apps(service_name):
+            try:
+                (service_dir / f"{app_name}{SIGNAL_SUFFIX}").unlink()
+            except FileNotFoundError:
+                pass
+            self._set_app(service_name, app_name, False)
+
+    def wait_for_service(self, service_name: str, timeout: Optional[float] = None) -> bool:
+        """サービスのシグナルファイルが生成されるまで待機する（同期版）"""
+        ready_event = threading.Event()
+
+        def listener(service, app, ready):
+            if service == service_name and ready:
+                ready_event.set()
+
+        self.add_listener(listener)
+        try:
+            if self.is_service_ready(service_name):
+                return True
+            return ready_event.wait(timeout)
+        finally:
+            self.remove_listener(listener)
+
+    # --- 監視スレッド ---
+
+    def start(self) -> None:
+        """監視を開始する"""
+        if self._thread is not None:
+            return
+        self.signal_dir.mkdir(exist_ok=True)
+        self.rescan()
+
+        inotify_fd = _open_inotify() if sys.platform.startswith('linux') else None
+        if inotify_fd is not None:
+            self.mode = 'inotify'
+            target = lambda: self._run_inotify(inotify_fd)
+        else:
+            self.mode = 'polling'
+            target = self._run_polling
+        self._thread = threading.Thread(target=target, name="signal-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """監視を停止する"""
+        self._stop_event.set()
+
+    def _run_polling(self) -> None:
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.rescan()
+            except Exception as e:
+                print(f"signalディレクトリの走査中にエラーが発生: {e}")
+
+    def _run_inotify(self, fd: int) -> None:
+        watches: Dict[int, Optional[str]] = {}  # wd -> サービス名（signalディレクトリ自体はNone）
+        # ウォッチを追加できなかったためポーリングで確認するサービス名
+        polled: Set[str] = set()
+
+        def add_watch(path: Path, service_name: Optional[str]) -> None:
+            wd = _libc.inotify_add_watch(fd, os.fsencode(str(path)), _WATCH_MASK)
+            if wd >= 0:
+                watches[wd] = service_name
+                polled.discard(service_name)
+                return
+            error = ctypes.get_errno()
+            if service_name is None:
+                # signalディレクトリ自体を監視できない場合は全体をポーリングに切り替える
+                raise OSError(error, f"{path}を監視できません: {os.strerror(error)}")
+            if error == errno.ENOENT:
+                # ウォッチを追加する前にディレクトリが削除された場合
+                return
+            if service_name not in polled:
+                print(f"{path}をinotifyで監視できないため、ポーリングで確認します: {os.strerror(error)} (errno={error})")
+                polled.add(service_name)
+
+        def poll_unwatched() -> None:
+            for service_name in list(polled):
+                service_dir = self.signal_dir / service_name
+                if not service_dir.is_dir():
+                    polled.discard(service_name)
+                    self._set_service(service_name, set())
+                    continue
+                # ウォッチを追加できた場合は以降inotifyで監視する
+                add_watch(service_dir, service_name)
+                self._set_service(service_name, self._scan_service(service_name))
+
+        def watch_all() -> None:
+            add_watch(self.signal_dir, None)
+            try:
+                with os.scandir(self.signal_dir) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            add_watch(Path(entry.path), entry.name)
+            except FileNotFoundError:
+                pass
+            # ウォッチ登録前に生成されたファイルを取りこぼさないよう走査する
+            self.rescan()
+
+        try:
+            watch_all()
+            last_poll = time.monotonic()
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([fd], [], [], min(0.5, self.poll_interval))
+                if polled and time.monotonic() - last_poll >= self.poll_interval:
+                    last_poll = time.monotonic()
+                    poll_unwatched()
+                if not readable:
+                    continue
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                    offset += _EVENT_HEADER.size
+                    name = data[offset:offset + name_len].rstrip(b'\0').decode('utf-8', errors='replace')
+                    offset += name_len
+
+                    if mask & IN_Q_OVERFLOW:
+                        self.rescan()
+                        continue
+                    if mask & IN_IGNORED:
+                        watches.pop(wd, None)
+                        continue
+                    if wd not in watches:
+                        continue
+
+                    service_name = watches[wd]
+                    if service_name is None:
+                        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                            # signalディレクトリ自体が削除された場合は作り直して監視し直す
+                            self.signal_dir.mkdir(exist_ok=True)
+                            watch_all()
+                        elif mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                            add_watch(self.signal_dir / name, name)
+                            self._set_service(name, self._scan_service(name))
+                        elif mask & IN_ISDIR and mask & (IN_DELETE | IN_MOVED_FROM):
+                            self._set_service(name, set())
+                        continue
+
+                    app_name = _app_name_from_signal_file(name)
+                    if app_name is None:
+                        continue
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._set_app(service_name, app_name, True)
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        self._set_app(service_name, app_name, False)
+        except Exception as e:
+            print(f"inotifyによる監視に失敗したため、ポーリングに切り替えます: {e}")
+            self.mode = 'polling'
+            self._run_polling()
+        finally:
+            os.close(fd)
+
+_libc = None
+
+def _open_inotify() -> Optional[int]:
+    """inotifyのファイルディスクリプタを作成する。利用できない場合はNone"""
+    global _libc
+    try:
+        if _libc is None:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            _libc = libc
+        fd = _libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        return fd if fd >= 0 else None
+    except (OSError, AttributeError):
+        return None
+
+_watchers: Dict[str, SignalWatcher] = {}
+_watchers_lock = threading.Lock()
+
+def get_signal_watcher(build_context_path) -> SignalWatcher:
+    """ビルドコンテキストに対応するSignalWatcherを取得する（初回呼び出し時に監視を開始する）"""
+    key = str(Path(build_context_path).resolve())
+    with _watchers_lock:
+        watcher = _watchers.get(key)
+        if watcher is None:
+            watcher = SignalWatcher(build_context_path)
+            _watchers[key] = watcher
+            watcher.start()
+        return watcher
+
+def stop_other_signal_watchers(build_context_path) -> None:
+    """指定したビルドコンテキスト以外のSignalWatcherの監視を停止して破棄する
+
+    ビルドコンテキストを切り替えたときに、以前のビルドコンテキストの監視スレッドが残らないようにする。
+    """
+    key = str(Path(build_context_path).resolve())
+    with _watchers_lock:
+        stale = [other for other in _watchers if other != key]
+        watchers = [_watchers.pop(other) for other in stale]
+    for watcher in watchers:
+        watcher.stop()
@@ -2,8 +2,8 @@
 UIコンポーネントに関する関数を提供するモジュール
 """
 import flet as ft
-from pathlib import Path
 from ..container_utils import extract_service_name
+from .signal_watcher import get_signal_watcher
 
 def get_container_control_icon(state, container_data=None):
     """コンテナの状態に応じたコントロールアイコンを取得する
@@ -21,11 +21,8 @@ def get_container_control_icon(state, container_data=None):
         if container_data and 'docker_compose_dir' in container_data:
             service_name = extract_service_name(container_data['name'], container_data['docker_compose_dir'])
             if service_name:
-                signal_dir = Path(container_data['docker_compose_dir']) / 'signal' / service_name
-                if signal_dir.exists():
-                    for signal_file in signal_dir.glob('*_startup_signal.txt'):
-                        if signal_file.exists():
-                            return ft.Icons.STOP_CIRCLE
+                if get_signal_watcher(container_data['docker_compose_dir']).is_service_ready(service_name):
+                    return ft.Icons.STOP_CIRCLE
                 return ft.Icons.HOURGLASS_EMPTY  # 起動処理中
         return ft.Icons.HOURGLASS_EMPTY  # 起動処理中
     elif state.lower() in ["exited", "not created", ""]:  # 停止中や未生成の状態を追加
@@ -1,19 +1,26 @@
 import flet as ft
 from typing import Dict, Any
 from .container_utils import extract_service_name, parse_project_info
-from .settings import get_container_settings, clone_repositories, clone_dockerfiles
+from .settings import get_container_settings, clone_sources, update_dockerfiles
 from .dialogs import show_status, show_error_dialog
 from .ip_settings import update_settings_json, on_edit_ip_options
 from .generate_docker_compose import DockerComposeGenerator
+from .wheelhouse import wheelhouse_builder, is_wheelhouse_enabled
 from .system_graph_viewer import auto_generate_mermaid_file
+from .project_info_store import get_project_info_store
+from .update_scheduler import request_update, flush_update
+from .docker_api import DockerEventSubscriber, DockerAPIUnavailable, compose_project_name
+from .ui.signal_watcher import get_signal_watcher, stop_other_signal_watchers
+from .ui.refresh_coordinator import SingleFlight, RefreshCancelled, RefreshToken
 from .ui import (
     get_container_status,
     get_container_control_icon,
     set_card_color,
     get_required_data_roots,
     on_open_browser_click,
-    wait_for_container,
-    wait_for_signal_file,
+    async_wait_for_container,
+    async_wait_for_signal_file,
+    run_async,
     create_error_text,
     show_error_message,
     update_all_dropdowns,
@@ -23,15 +30,95 @@ from .ui import (
     container_info_manager
 )
 from pathlib import Path
+import asyncio
 import subprocess
-import json
+import threading
 
 # グローバル変数の定義
 docker_compose_dir = Path(__file__).parent.parent.parent / "docker-compose"
 desktop_processes = {}
+pending_startups = {}
+container_event_subscriber = None
+signal_listener = None
+
+def prepare_wheelhouse(service_name: str, page: ft.Page) -> None:
+    """サービスの仮想環境にインストールするパッケージのホイールをホスト側に作成する
+
+    作成済みの場合やイメージがまだビルドされていない場合は何もしない。
+    作成に失敗した場合や時間内に作成できなかった場合も起動は続け、コンテナはパッケージインデックスからインストールする
+    （ホイールを使用しない場合は環境変数MOCHIMAKI_WHEELHOUSEに0を設定する）。
+    """
+    if not is_wheelhouse_enabled():
+        return
+    try:
+        wheelhouse_builder.ensure_root()
+        generator = DockerComposeGenerator(str(Path(docker_compose_dir) / 'project_info.json'))
+        for image, program_dirs in generator.wheelhouse_requirements(service_name):
+            built = []
+
+            def on_build():
+                built.append(True)
+                show_status(page, f"{service_name}のパッケージのホイールを作成中...")
+
+            wheelhouse = wheelhouse_builder.ensure(
+                image, program_dirs, on_build=on_build,
+                on_progress=lambda line: show_status(page, f"{service_name}のホイールを作成中: {line}")
+            )
+            if wheelhouse is None and built:
+                show_status(page, f"{service_name}のホイールを作成できなかったため、パッケージインデックスからインストールします")
+    except Exception as e:
+        print(f"ホイールの作成中にエラーが発生しました: {e}")
+        show_status(page, f"{service_name}のホイールを作成できなかったため、パッケージインデックスからインストールします")
+
+async def _start_container_async(container, service_name, page, container_list, get_settings_func):
+    """コンテナの起動から起動完了までをイベントループ上で待機する"""
+    loop = asyncio.get_running_loop()
+    container_name = container['name']
+
+    # ホイールを作成してから起動する（以降の起動ではネットワークを使わずにインストールできる）
+    await loop.run_in_executor(None, prepare_wheelhouse, service_name, page)
+
+    process = await asyncio.create_subprocess_exec(
+        'docker-compose', 'up', '-d', service_name, cwd=str(docker_compose_dir)
+    )
+    try:
+        returncode = await process.wait()
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.kill()
+        raise
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, ['docker-compose', 'up', '-d', service_name])
+
+    if not await async_wait_for_container(container_name, docker_compose_dir):
+        show_status(page, f"コンテナ {container_name} の起動がタイムアウトしました。")
+        return
+
+    show_status(page, f"コンテナ {container_name} の起動処理を開始しました。")
+
+    # シグナルファイルの生成を待機
+    if not await async_wait_for_signal_file(container_name, docker_compose_dir):
+        show_status(page, f"コンテナ {container_name} の起動完了を確認できませんでした（タイムアウト）。")
+        return
+
+    show_status(page, f"コンテナ {container_name} の起動処理が完了しました。")
+
+    def refresh_card():
+        with card_update_lock:
+            # コンテナ情報を再取得
+            container_info_manager.get_container_info(docker_compose_dir, page)
+            # 更新されたコンテナ情報を使用してカードを更新
+            if container_name in container_info_manager._containers_info:
+                update_apps_card(container_name, container_list, page, get_settings_func)
+        request_update(page)
+
+    # UIの更新はイベントループを止めないようスレッドプールで実行
+    await loop.run_in_executor(None, refresh_card)
 
 def start_container(container, page, container_list, get_settings_func):
     """コンテナを起動する
+
+    起動完了までの待機はバックグラウンドのイベントループで行い、この関数はすぐに戻る。
     
     Args:
         container (Dict[str, Any]): コンテナ情報
@@ -47,34 +134,38 @@ def start_container(container, page, container_list, get_settings_func):
         if not service_name:
             raise ValueError("サービス名の抽出に失敗しました")
 
-        subprocess.check_call(['docker-compose', 'up', '-d', service_name], cwd=docker_compose_dir)
-        
-        if wait_for_container(container['name'], docker_compose_dir):
-            show_status(page, f"コンテナ {container['name']} の起動処理を開始しました。")
-            
-            # シグナルファイルの生成を待機
-            def check_signal_file():
-                if wait_for_signal_file(container['name'], docker_compose_dir):
-                    show_status(page, f"コンテナ {container['name']} の起動処理が完了しました。")
-                    # コンテナ情報を再取得
-                    container_info_manager.get_container_info(docker_compose_dir, page)
-                    # 更新されたコンテナ情報を使用してカードを更新
-                    if container['name'] in container_info_manager._containers_info:
-                        update_apps_card(container['name'], container_list, page, get_settings_func)
-                    page.update()
-                else:
-                    # シグナルファイルが生成されていない場合は、再度チェック
-                    page.after(1000, check_signal_file)
-            
-            # 初回のチェックを開始
-            check_signal_file()
-        else:
-            show_status(page, f"コンテナ {container['name']} の起動がタイムアウトしました。")
-            return
+        # 同じコンテナの起動待ちが残っていればキャンセル
+        cancel_container_startup(container['name'])
+
+        future = run_async(_start_container_async(container, service_name, page, container_list, get_settings_func))
+        pending_startups[container['name']] = future
+
+        def on_done(f):
+            if pending_startups.get(container['name']) is f:
+                del pending_startups[container['name']]
+            if f.cancelled():
+                return
+            error = f.exception()
+            if error is not None:
+                show_status(page, f"起動エラー: {error}")
+                request_update(page)
+
+        future.add_done_callback(on_done)
 
     except Exception as e:
         show_status(page, f"起動エラー: {e}")
-        page.update()
+        request_update(page)
+
+def cancel_container_startup(container_name: str) -> bool:
+    """実行中のコンテナ起動待ちをキャンセルする
+
+    Returns:
+        bool: キャンセルした場合はTrue
+    """
+    future = pending_startups.pop(container_name, None)
+    if future is not None and not future.done():
+        return future.cancel()
+    return False
 
 def stop_container(container, page, container_list, get_settings_func):
     """コンテナを停止する
@@ -87,6 +178,7 @@ def stop_container(container, page, container_list, get_settings_func):
     """
     try:
         show_status(page, f"コンテナ {container['name']} を停止中...")
+        cancel_container_startup(container['name'])
 
         # サービス名を抽出
         service_name = extract_service_name(container['name'], docker_compose_dir)
@@ -95,18 +187,19 @@ def stop_container(container, page, container_list, get_settings_func):
 
         subprocess.check_call(['docker-compose', 'stop', service_name], cwd=docker_compose_dir)
         
-        # コンテナ情報を再取得
-        container_info_manager.get_container_info(docker_compose_dir, page)
-        
-        # 更新されたコンテナ情報を使用してカードを更新
-        if container['name'] in container_info_manager._containers_info:
-            update_apps_card(container['name'], container_list, page, get_settings_func)
+        with card_update_lock:
+            # コンテナ情報を再取得
+            container_info_manager.get_container_info(docker_compose_dir, page)
+
+            # 更新されたコンテナ情報を使用してカードを更新
+            if container['name'] in container_info_manager._containers_info:
+                update_apps_card(container['name'], container_list, page, get_settings_func)
         
         show_status(page, f"コンテナ {container['name']} を停止しました。")
-        page.update()
+        request_update(page)
     except Exception as e:
         show_status(page, f"停止エラー: {e}")
-        page.update()
+        request_update(page)
 
 def on_control_button_click(e, container, page, container_list, get_settings_func):
     """コンテナの起動/停止ボタンがクリックされたときの処理
@@ -125,7 +218,7 @@ def on_control_button_click(e, container, page, container_list, get_settings_fun
         # 起動処理中の状態に即時変更しUIを更新
         container['state'] = 'starting'
         update_apps_card(container['name'], container_list, page, get_settings_func)
-        page.update()
+        request_update(page)
         # 非同期で起動処理
         start_container(container, page, container_list, get_settings_func)
     else:
@@ -189,227 +282,135 @@ def delete_signal_files(container_name: str, docker_compose_dir: Path) -> None:
     """
     service_name = extract_service_name(container_name, docker_compose_dir)
     if service_name:
-        signal_dir = Path(docker_compose_dir) / 'signal' / service_name
-        if signal_dir.exists():
-            for signal_file in signal_dir.glob('*_startup_signal.txt'):
-                signal_file.unlink()
-
-def update_apps_card(container_name: str, container_list: ft.Column, page: ft.Page, get_settings_func):
-    """アプリケーションカードを更新する"""
-    try:
-        # 設定情報を取得
-        settings = get_settings_func(docker_compose_dir, page)
-        if not settings:
-            return
-
-        is_desktop = container_name == "host_machine"
-
-        # コンテナ情報を取得
-        container = None if is_desktop else container_info_manager._containers_info[container_name]
-
-        def find_target_card():
-            """対象のカードを探す"""
-            if is_desktop:
-                if container_list.controls:
-                    return container_list.controls[0]
-            else:
-                
-                # コンテナが停止したことを確認し、シグナルファイルを消去
-                if container['state'].lower() in ['exited', 'not created']:
-                    delete_signal_files(container_name, docker_compose_dir)
-
-                for control in container_list.controls:
-                    if isinstance(control, ft.Card) and control.data and control.data.get('name') == container_name:
-                        return control
-            return None
-
-        def get_apps_dict(container_info=None):
-            """アプリケーション情報を取得"""
-            if is_desktop:
-                if 'desktop_apps' not in settings:
-                    return None
-                return settings['desktop_apps'].get('host_machine', {}).get('apps', {})
-            else:
-                service_name = extract_service_name(container_info['name'], docker_compose_dir)
-                if not service_name:
-                    raise ValueError("サービス名の抽出に失敗しました")
-                return settings['services'][service_name]['apps']
-
-        def create_app_panel(app_name: str, app_info: Dict[str, Any]):
-            """アプリケーションパネルを作成"""
-            # アプリケーション名のテキスト
-            app_name_text = ft.Text(
-                f"アプリケーション: {app_name}",
-                size=14,
-                weight=ft.FontWeight.BOLD,
-                tooltip=f"プログラム: {Path(app_info['main']).name if is_desktop else app_info.get('app', '不明')}"
-            )
-
-            # コントロールボタンまたはブラウザボタンの作成
-            control_elements = []
-            if is_desktop:
-                current_state = get_app_status(app_name, desktop_processes)
-                control_elements.append(
-                    ft.IconButton(
-                        icon=ft.Icons.STOP if current_state == "running" else ft.Icons.PLAY_ARROW,
-                        tooltip="起動/停止",
-                        on_click=lambda e, name=app_name, info=app_info, btn=None: 
-                            on_app_control(e, name, info, e.control, page, desktop_processes, docker_compose_dir)
-                    )
-                )
-            else:
-                container_port = app_info.get('container_port', '')
-                host_port = ''
-                if container_port and int(container_port) in container['ports']:
-                    host_port = container['ports'][int(container_port)]
-                control_elements.extend([
-                    ft.Text(f"ポート: {container_port}->{host_port}" if host_port else "ポート: 未割当"),
-                    ft.IconButton(
-                        icon=ft.Icons.OPEN_IN_BROWSER,
-                        tooltip="ブラウザで開く",
-                        on_click=lambda e, name=container['name'], port=container_port: 
-                            on_open_browser_click(e, name, port, container_info_manager._containers_info),
-                        disabled=container['state'].lower() != "running" or not host_port
-                    )
-                ])
-
-            # データルートを取得
-            data_roots = get_required_data_roots(app_info)
-
-            # アプリケーションカード
-            return ft.Card(
-                content=ft.Container(
-                    content=ft.Column([
-                        ft.Row([
-                            ft.Column([app_name_text] + 
-                                    ([control_elements[0]] if is_desktop else [control_elements[0]]), 
-                                    expand=True),
-                            control_elements[-1] if not is_desktop else ft.Container()
-                        ]),
-                        # デバイスパネル
-                        ft.ExpansionPanelList(
-                            controls=[
-                                ft.ExpansionPanel(
-                                    header=ft.ListTile(
-                                        title=ft.Text("デバイス設定", size=12, weight=ft.FontWeight.BOLD),
-                                    ),
-                                    content=ft.Column([
-                                        ft.Container(
-                                            content=ft.Row([
-                                                ft.Column([
-                                                    ft.Text(f"デバイス: {device_type}", size=12, weight=ft.FontWeight.BOLD),
-                                                    ft.Text(f"IPアドレス: {', '.join(device_info.get('target', []) or ['未設定'])}", size=12)
-                                                ], expand=True),
-                                                ft.IconButton(
-                                                    icon=ft.Icons.SETTINGS,
-                                                    tooltip="IPアドレス設定",
-                                                    on_click=lambda e, a=app_name, d=device_type: 
-                                                        show_ip_setting_dialog(page, 
-                                                                            "host_machine" if is_desktop else container, 
-                                                                            a, d, container_list)
-                                                )
-                                            ]),
-                                            padding=5,
-                                            bgcolor=ft.Colors.GREY_700,
-                                            border_radius=ft.border_radius.all(5)
-                                        )
-                                        for device_type, device_info in app_info.get('devices', {}).items()
-                                    ], spacing=5),
-                                    bgcolor=ft.Colors.TRANSPARENT,
-                                    expanded=False
-                                )
-                            ] if app_info.get('devices') else [],
-                            elevation=0,
-                            spacing=0
-                        ),
-                        # データ設定パネル
-                        ft.ExpansionPanelList(
-                            controls=[
-                                ft.ExpansionPanel(
-                                    header=ft.ListTile(
-                                        title=ft.Text("データ設定", size=12, weight=ft.FontWeight.BOLD),
-                                    ),
-                                    content=ft.Column([
-                                        ft.Container(
-                                            content=ft.Row([
-                                                ft.Column([
-                                                    ft.Text(f"データ: {data_root}", size=12, weight=ft.FontWeight.BOLD),
-                                                    ft.Text(
-                                                        f"パス: {next((path for path in app_info.get('data_roots', []) if data_root in path), '未設定')}", 
-                                                        size=12
-                                                    )
-                                                ], expand=True),
-                                                ft.IconButton(
-                                                    icon=ft.icons.FOLDER_OPEN,
-                                                    tooltip="パスを設定",
-                                                    on_click=lambda e, container_name=container_name, a=app_name, d=data_root: 
-                                                        show_data_path_dialog(e, page, container_name, a, d, container_list)
-                                                )
-                                            ]),
-                                            padding=5,
-                                            bgcolor=ft.Colors.GREY_700,
-                                            border_radius=ft.border_radius.all(5)
-                                        )
-                                        for data_root in data_roots
-                                    ], spacing=5),
-                                    bgcolor=ft.Colors.TRANSPARENT,
-                                    expanded=False
-                                )
-                            ] if data_roots else [],
-                            elevation=0,
-                            spacing=0
-                        )
-                    ]),
-                    padding=10,
-                    bgcolor=ft.Colors.SURFACE_CONTAINER_HIGHEST,
-                    border_radius=ft.border_radius.all(5)
-                ),
-                margin=ft.margin.only(left=10, right=10, top=5, bottom=5)
+        watcher = get_signal_watcher(docker_compose_dir)
+        if watcher.get_ready_apps(service_name):
+            watcher.clear_service(service_name)
+
+def _find_target_card(container_name: str, container_list: ft.Column):
+    """対象のカードを探す"""
+    if container_name == "host_machine":
+        if container_list.controls:
+            return container_list.controls[0]
+        return None
+    for control in container_list.controls:
+        if isinstance(control, ft.Card) and control.data and control.data.get('name') == container_name:
+            return control
+    return None
+
+def _build_card_model(container_name: str, container, apps_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """カードの表示内容（ビューモデル）を作成する
+
+    コンテナ → アプリケーション → デバイス/データの階層をキー付きの辞書で表す。
+    """
+    is_desktop = container_name == "host_machine"
+    model = {'header': {}, 'color_state': "desktop" if is_desktop else container['state'], 'apps': {}}
+    if not is_desktop:
+        model['header'] = {
+            'icon': get_container_control_icon(container['state'], container),
+            'name': f"コンテナ名: {container['name']}",
+            'image_tooltip': f"イメージ: {container.get('image', '未設定')}",
+            'id': f"コンテナID: {container['id'] or '未生成'}",
+            'status': f"状態: {get_container_status(container)}",
+        }
+
+    for app_name, app_info in apps_dict.items():
+        app_model = {
+            'tooltip': f"プログラム: {Path(app_info['main']).name if is_desktop else app_info.get('app', '不明')}",
+            'devices': {
+                device_type: f"IPアドレス: {', '.join(device_info.get('target', []) or ['未設定'])}"
+                for device_type, device_info in app_info.get('devices', {}).items()
+            },
+            'data': {
+                data_root: f"パス: {next((path for path in app_info.get('data_roots', []) if data_root in path), '未設定')}"
+                for data_root in get_required_data_roots(app_info)
+            },
+        }
+        if is_desktop:
+            app_model['control_icon'] = (
+                ft.Icons.STOP if get_app_status(app_name, desktop_processes) == "running" else ft.Icons.PLAY_ARROW
             )
-
-        # カードを探す
-        target_card = find_target_card()
-        if not target_card:
-            return
-
-        # アプリケーション情報の取得
-        apps_dict = get_apps_dict(container)
-        if not apps_dict:
-            return
-
-        # アプリケーションパネルのリストを作成
-        app_panels = [create_app_panel(app_name, app_info) for app_name, app_info in apps_dict.items()]
-
-        # メインカードの内容を作成
+        else:
+            container_port = app_info.get('container_port', '')
+            host_port = ''
+            if container_port and int(container_port) in container['ports']:
+                host_port = container['ports'][int(container_port)]
+            app_model['container_port'] = container_port
+            app_model['port_text'] = f"ポート: {container_port}->{host_port}" if host_port else "ポート: 未割当"
+            app_model['browser_disabled'] = container['state'].lower() != "running" or not host_port
+        model['apps'][app_name] = app_model
+    return model
+
+def _app_structure(app_model: Dict[str, Any]) -> tuple:
+    """アプリケーションカードの構造（デバイスとデータのキー）を取得する"""
+    return tuple(app_model['devices']), tuple(app_model['data'])
+
+class CardView:
+    """1枚のカードのコントロールへの参照と、表示中のビューモデルを保持するクラス
+
+    ビューモデルを比較し、変化したText/Icon/色のプロパティのみを書き換える。
+    デバイスやデータの構成が変わったアプリケーションのカードのみを作り直し、
+    その場合も展開状態は引き継ぐ。
+    """
+    def __init__(self, container_name: str, card: ft.Card, page: ft.Page, container_list: ft.Column):
+        self.container_name = container_name
+        self.is_desktop = container_name == "host_machine"
+        self.card = card
+        self.page = page
+        self.container_list = container_list
+        self.model = None
+        self.header_refs: Dict[str, Any] = {}
+        self.app_refs: Dict[str, Dict[str, Any]] = {}
+        self.apps_column = None
+
+    def _current_container(self):
+        return container_info_manager._containers_info.get(self.container_name)
+
+    def _on_control_click(self, e):
+        container = self._current_container()
+        if container is not None:
+            on_control_button_click(e, container, self.page, self.container_list, get_container_settings)
+
+    def _on_app_control_click(self, e, app_name: str):
+        # 最新のアプリケーション設定で起動する
+        app_info = get_project_info_store(docker_compose_dir).get_app("host_machine", app_name)
+        if app_info is not None:
+            on_app_control(e, app_name, app_info, e.control, self.page, desktop_processes, docker_compose_dir)
+
+    def _on_ip_setting_click(self, e, app_name: str, device_type: str):
+        container = "host_machine" if self.is_desktop else self._current_container()
+        if container is not None:
+            show_ip_setting_dialog(self.page, container, app_name, device_type, self.container_list)
+
+    # --- 描画 ---
+
+    def render(self, model: Dict[str, Any]) -> None:
+        """カード全体を作成する"""
         header_row = ft.Row([])
-        if is_desktop:
+        if self.is_desktop:
             header_row.controls.append(
                 ft.Column([
                     ft.Text("Desktop Apps", size=16, weight=ft.FontWeight.BOLD),
                 ], expand=True)
             )
         else:
+            header = model['header']
+            self.header_refs = {
+                'icon': ft.IconButton(icon=header['icon'], tooltip="起動/停止", on_click=self._on_control_click),
+                'name': ft.Text(header['name'], size=16, weight=ft.FontWeight.BOLD, tooltip=header['image_tooltip']),
+                'id': ft.Text(header['id']),
+                'status': ft.Text(header['status']),
+            }
             header_row.controls.extend([
-                ft.IconButton(
-                    icon=get_container_control_icon(container['state'], container),
-                    tooltip="起動/停止",
-                    on_click=lambda e, c=container: on_control_button_click(e, c, page, container_list, get_container_settings)
-                ),
+                self.header_refs['icon'],
                 ft.VerticalDivider(width=1),
-                ft.Column([
-                    ft.Text(
-                        f"コンテナ名: {container['name']}", 
-                        size=16, 
-                        weight=ft.FontWeight.BOLD,
-                        tooltip=f"イメージ: {container.get('image', '未設定')}"
-                    ),
-                    ft.Text(f"コンテナID: {container['id'] or '未生成'}"),
-                    ft.Text(f"状態: {get_container_status(container)}"),
-                ], expand=True)
+                ft.Column([self.header_refs['name'], self.header_refs['id'], self.header_refs['status']], expand=True)
             ])
 
-        # カード内容の更新
-        target_card.content = ft.Container(
+        self.app_refs = {app_name: self._render_app(app_name, app_model)
+                         for app_name, app_model in model['apps'].items()}
+        self.apps_column = ft.Column(controls=[refs['card'] for refs in self.app_refs.values()], spacing=5)
+
+        self.card.content = ft.Container(
             content=ft.Column([
                 header_row,
                 ft.ExpansionPanelList(
@@ -418,10 +419,7 @@ def update_apps_card(container_name: str, container_list: ft.Column, page: ft.Pa
                             header=ft.ListTile(
                                 title=ft.Text("アプリケーション", size=14, weight=ft.FontWeight.BOLD),
                             ),
-                            content=ft.Column(
-                                controls=app_panels,
-                                spacing=5
-                            ),
+                            content=self.apps_column,
                             bgcolor=ft.Colors.TRANSPARENT,
                             expanded=True
                         )
@@ -432,18 +430,280 @@ def update_apps_card(container_name: str, container_list: ft.Column, page: ft.Pa
             ]),
             padding=10
         )
+        set_card_color(self.card, model['color_state'])
+        self.model = model
+
+    def _render_app(self, app_name: str, app_model: Dict[str, Any], expanded: Dict[str, bool] = None) -> Dict[str, Any]:
+        """アプリケーションカードを作成する"""
+        expanded = expanded or {}
+        refs: Dict[str, Any] = {
+            'name': ft.Text(
+                f"アプリケーション: {app_name}",
+                size=14,
+                weight=ft.FontWeight.BOLD,
+                tooltip=app_model['tooltip']
+            ),
+            'devices': {},
+            'data': {},
+        }
+
+        # コントロールボタンまたはブラウザボタンの作成
+        if self.is_desktop:
+            refs['control'] = ft.IconButton(
+                icon=app_model['control_icon'],
+                tooltip="起動/停止",
+                on_click=lambda e, name=app_name: self._on_app_control_click(e, name)
+            )
+            title_column = ft.Column([refs['name'], refs['control']], expand=True)
+            trailing = ft.Container()
+        else:
+            refs['port'] = ft.Text(app_model['port_text'])
+            refs['browser'] = ft.IconButton(
+                icon=ft.Icons.OPEN_IN_BROWSER,
+                tooltip="ブラウザで開く",
+                on_click=lambda e, name=self.container_name, port=app_model['container_port']:
+                    on_open_browser_click(e, name, port, container_info_manager._containers_info),
+                disabled=app_model['browser_disabled']
+            )
+            title_column = ft.Column([refs['name'], refs['port']], expand=True)
+            trailing = refs['browser']
+
+        device_rows = []
+        for device_type, ip_text in app_model['devices'].items():
+            refs['devices'][device_type] = ft.Text(ip_text, size=12)
+            device_rows.append(ft.Container(
+                content=ft.Row([
+                    ft.Column([
+                        ft.Text(f"デバイス: {device_type}", size=12, weight=ft.FontWeight.BOLD),
+                        refs['devices'][device_type]
+                    ], expand=True),
+                    ft.IconButton(
+                        icon=ft.Icons.SETTINGS,
+                        tooltip="IPアドレス設定",
+                        on_click=lambda e, a=app_name, d=device_type: self._on_ip_setting_click(e, a, d)
+                    )
+                ]),
+                padding=5,
+                bgcolor=ft.Colors.GREY_700,
+                border_radius=ft.border_radius.all(5)
+            ))
+
+        data_rows = []
+        for data_root, path_text in app_model['data'].items():
+            refs['data'][data_root] = ft.Text(path_text, size=12)
+            data_rows.append(ft.Container(
+                content=ft.Row([
+                    ft.Column([
+                        ft.Text(f"データ: {data_root}", size=12, weight=ft.FontWeight.BOLD),
+                        refs['data'][data_root]
+                    ], expand=True),
+                    ft.IconButton(
+                        icon=ft.icons.FOLDER_OPEN,
+                        tooltip="パスを設定",
+                        on_click=lambda e, container_name=self.container_name, a=app_name, d=data_root:
+                            show_data_path_dialog(e, self.page, container_name, a, d, self.container_list)
+                    )
+                ]),
+                padding=5,
+                bgcolor=ft.Colors.GREY_700,
+                border_radius=ft.border_radius.all(5)
+            ))
+
+        # デバイスパネル
+        refs['device_panel'] = ft.ExpansionPanel(
+            header=ft.ListTile(
+                title=ft.Text("デバイス設定", size=12, weight=ft.FontWeight.BOLD),
+            ),
+            content=ft.Column(device_rows, spacing=5),
+            bgcolor=ft.Colors.TRANSPARENT,
+            expanded=expanded.get('devices', False)
+        )
+        # データ設定パネル
+        refs['data_panel'] = ft.ExpansionPanel(
+            header=ft.ListTile(
+                title=ft.Text("データ設定", size=12, weight=ft.FontWeight.BOLD),
+            ),
+            content=ft.Column(data_rows, spacing=5),
+            bgcolor=ft.Colors.TRANSPARENT,
+            expanded=expanded.get('data', False)
+        )
+
+        refs['card'] = ft.Card(
+            content=ft.Container(
+                content=ft.Column([
+                    ft.Row([title_column, trailing]),
+                    ft.ExpansionPanelList(
+                        controls=[refs['device_panel']] if device_rows else [],
+                        elevation=0,
+                        spacing=0
+                    ),
+                    ft.ExpansionPanelList(
+                        controls=[refs['data_panel']] if data_rows else [],
+                        elevation=0,
+                        spacing=0
+                    )
+                ]),
+                padding=10,
+                bgcolor=ft.Colors.SURFACE_CONTAINER_HIGHEST,
+                border_radius=ft.border_radius.all(5)
+            ),
+            margin=ft.margin.only(left=10, right=10, top=5, bottom=5)
+        )
+        return refs
+
+    # --- 差分の反映 ---
+
+    def reconcile(self, model: Dict[str, Any]) -> int:
+        """新しいビューモデルとの差分のみをコントロールに反映する
+
+        Returns:
+            int: 変更したプロパティ・コントロールの数
+        """
+        old = self.model
+        changes = 0
+
+        if not self.is_desktop:
+            old_header, header = old['header'], model['header']
+            refs = self.header_refs
+            if header['icon'] != old_header['icon']:
+                refs['icon'].icon = header['icon']
+                changes += 1
+            if header['name'] != old_header['name']:
+                refs['name'].value = header['name']
+                changes += 1
+            if header['image_tooltip'] != old_header['image_tooltip']:
+                refs['name'].tooltip = header['image_tooltip']
+                changes += 1
+            for key in ('id', 'status'):
+                if header[key] != old_header[key]:
+                    refs[key].value = header[key]
+                    changes += 1
+
+        app_refs = {}
+        for app_name, app_model in model['apps'].items():
+            refs = self.app_refs.get(app_name)
+            old_app = old['apps'].get(app_name)
+            if refs is None or _app_structure(old_app) != _app_structure(app_model):
+                expanded = {}
+                if refs is not None:
+                    expanded = {'devices': refs['device_panel'].expanded, 'data': refs['data_panel'].expanded}
+                refs = self._render_app(app_name, app_model, expanded)
+                changes += 1
+            else:
+                changes += self._reconcile_app(refs, old_app, app_model)
+            app_refs[app_name] = refs
+        self.app_refs = app_refs
+
+        app_cards = [refs['card'] for refs in app_refs.values()]
+        if app_cards != self.apps_column.controls:
+            self.apps_column.controls = app_cards
+            changes += 1
+
+        if model['color_state'] != old['color_state']:
+            set_card_color(self.card, model['color_state'])
+            changes += 1
+
+        self.model = model
+        return changes
+
+    def _reconcile_app(self, refs: Dict[str, Any], old: Dict[str, Any], new: Dict[str, Any]) -> int:
+        changes = 0
+        if new['tooltip'] != old['tooltip']:
+            refs['name'].tooltip = new['tooltip']
+            changes += 1
+        if self.is_desktop:
+            if new['control_icon'] != old['control_icon']:
+                refs['control'].icon = new['control_icon']
+                changes += 1
+        else:
+            if new['port_text'] != old['port_text']:
+                refs['port'].value = new['port_text']
+                changes += 1
+            if new['browser_disabled'] != old['browser_disabled']:
+                refs['browser'].disabled = new['browser_disabled']
+                changes += 1
+            if new['container_port'] != old['container_port']:
+                port = new['container_port']
+                refs['browser'].on_click = lambda e, name=self.container_name, port=port: \
+                    on_open_browser_click(e, name, port, container_info_manager._containers_info)
+        for device_type, ip_text in new['devices'].items():
+            if ip_text != old['devices'][device_type]:
+                refs['devices'][device_type].value = ip_text
+                changes += 1
+        for data_root, path_text in new['data'].items():
+            if path_text != old['data'][data_root]:
+                refs['data'][data_root].value = path_text
+                changes += 1
+        return changes
+
+# コンテナ名 -> 表示中のカード
+card_views: Dict[str, CardView] = {}
+# カードとコンテナ情報の更新を直列化するロック
+# （UIのイベントハンドラ、Dockerイベントの購読、シグナルファイルの監視のスレッドから呼び出される）
+card_update_lock = threading.RLock()
+
+def update_apps_card(container_name: str, container_list: ft.Column, page: ft.Page, get_settings_func):
+    """アプリケーションカードを更新する
+
+    同じカードを2回目以降に更新する場合は、前回のビューモデルとの差分のみを反映する。
+    """
+    with card_update_lock:
+        _update_apps_card(container_name, container_list, page, get_settings_func)
+
+def _update_apps_card(container_name: str, container_list: ft.Column, page: ft.Page, get_settings_func):
+    try:
+        # 設定情報を取得
+        settings = get_settings_func(docker_compose_dir, page)
+        if not settings:
+            return
 
-        # カードの色を設定
+        is_desktop = container_name == "host_machine"
+
+        # コンテナ情報を取得
+        container = None if is_desktop else container_info_manager._containers_info[container_name]
+
+        # コンテナが停止したことを確認し、シグナルファイルを消去
+        if not is_desktop and container['state'].lower() in ['exited', 'not created']:
+            delete_signal_files(container_name, docker_compose_dir)
+
+        # カードを探す
+        target_card = _find_target_card(container_name, container_list)
+        if not target_card:
+            return
+
+        # アプリケーション情報の取得
         if is_desktop:
-            set_card_color(target_card, "desktop")
+            if 'desktop_apps' not in settings:
+                return
+            apps_dict = settings['desktop_apps'].get('host_machine', {}).get('apps', {})
         else:
+            service_name = extract_service_name(container['name'], docker_compose_dir)
+            if not service_name:
+                raise ValueError("サービス名の抽出に失敗しました")
+            apps_dict = settings['services'][service_name]['apps']
+        if not apps_dict:
+            return
+
+        model = _build_card_model(container_name, container, apps_dict)
+
+        view = card_views.get(container_name)
+        if view is None or view.card is not target_card:
+            # 新しく作成されたカードは全体を描画する
+            view = CardView(container_name, target_card, page, container_list)
+            view.render(model)
+            card_views[container_name] = view
+            changed = True
+        else:
+            changed = view.reconcile(model) > 0
+
+        if not is_desktop:
             target_card.data = container
-            set_card_color(target_card, container['state'])
 
-        page.update()
+        if changed:
+            request_update(page)
 
-        # システムグラフを自動生成
-        auto_generate_mermaid_file()
+            # システムグラフを自動生成
+            auto_generate_mermaid_file()
 
     except Exception as e:
         print(f"カードの更新でエラーが発生: {e}")
@@ -525,7 +785,7 @@ def show_ip_setting_dialog(page: ft.Page, container, app_name, device_type, cont
                 ip_dropdowns_column.controls.remove(row_container)
                 update_all_dropdowns(ip_dropdowns_column, error_text, scrollable_container, apply_button, 
                                    min_connections, max_connections, allow_duplicate, page)
-                page.update()
+                request_update(page)
 
             def on_change(e):
                 update_all_dropdowns(ip_dropdowns_column, error_text, scrollable_container, apply_button, 
@@ -574,7 +834,7 @@ def show_ip_setting_dialog(page: ft.Page, container, app_name, device_type, cont
             scrollable_container.content.scroll_to(offset=-1)
             update_all_dropdowns(ip_dropdowns_column, error_text, scrollable_container, apply_button, 
                                min_connections, max_connections, allow_duplicate, page)
-            page.update()
+            request_update(page)
 
         def on_apply(e):
             """変更を適用してダイアログを閉じる"""
@@ -615,7 +875,7 @@ def show_ip_setting_dialog(page: ft.Page, container, app_name, device_type, cont
             """ダイアログを閉じる"""
             dialog.open = False
             page.overlay.remove(dialog)
-            page.update()
+            flush_update(page)
 
         # 既存のターゲットIPアドレスの行を作成
         for target in current_targets:
@@ -684,7 +944,7 @@ def show_ip_setting_dialog(page: ft.Page, container, app_name, device_type, cont
         # ダイアログを表示
         page.overlay.append(dialog)
         dialog.open = True
-        page.update()
+        flush_update(page)
 
     except Exception as e:
         show_error_dialog(page, "エラー", f"IPアドレス設定ダイアログの表示に失敗しました: {e}")
@@ -707,9 +967,8 @@ def show_data_path_dialog(e, page, container_name: str, app_name: str, data_root
                     return
 
                 # project_info.jsonを読み込む
-                project_info_path = Path(docker_compose_dir) / 'project_info.json'
-                with project_info_path.open('r', encoding='utf-8') as f:
-                    project_info = json.load(f)
+                store = get_project_info_store(docker_compose_dir)
+                project_info = store.snapshot()
 
                 # コンテナ名からアプリケーションの種類を判断
                 is_desktop = container_name == "host_machine"
@@ -751,8 +1010,7 @@ def show_data_path_dialog(e, page, container_name: str, app_name: str, data_root
                                 data_roots.append(e.path)
 
                 # project_info.jsonを保存
-                with project_info_path.open('w', encoding='utf-8') as f:
-                    json.dump(project_info, f, indent=2, ensure_ascii=False)
+                store.save(project_info, delay=0)
 
                 # コンテナアプリの場合のみparse_project_infoを実行
                 if not is_desktop:
@@ -771,7 +1029,7 @@ def show_data_path_dialog(e, page, container_name: str, app_name: str, data_root
             on_result=on_dialog_result
         )
         page.overlay.append(file_picker)
-        page.update()
+        flush_update(page)
         file_picker.get_directory_path()
 
     except Exception as e:
@@ -787,6 +1045,8 @@ def on_container_dialog_result(e: ft.FilePickerResultEvent, page: ft.Page, conta
     if e.path:
         docker_compose_dir = e.path
         page.title = Path(e.path).name
+        # 以前のビルドコンテキストのシグナルファイルの監視を停止する
+        stop_other_signal_watchers(docker_compose_dir)
         
         try:
             # project_info.jsonの読み込みと検証
@@ -795,15 +1055,10 @@ def on_container_dialog_result(e: ft.FilePickerResultEvent, page: ft.Page, conta
                 show_error_dialog(page, "エラー", "project_info.jsonが見つかりません")
                 return
 
-            with project_info_path.open('r', encoding='utf-8') as f:
-                project_info = json.load(f)
-
-            # リポジトリのクローン処理
-            if not clone_repositories(project_info, docker_compose_dir, page):
-                return
+            project_info = get_project_info_store(docker_compose_dir).load()
 
-            # Dockerfileのクローン処理
-            if not clone_dockerfiles(project_info, docker_compose_dir, page):
+            # リポジトリとDockerfileのクローン処理（並行して実行する）
+            if not clone_sources(project_info, docker_compose_dir, page):
                 return
 
             # デスクトップアプリのディレクトリ構成を設定
@@ -815,50 +1070,177 @@ def on_container_dialog_result(e: ft.FilePickerResultEvent, page: ft.Page, conta
             if 'services' in project_info and project_info['services']:
                 generator = DockerComposeGenerator(str(project_info_path))
                 docker_compose_path = Path(docker_compose_dir) / 'docker-compose.yml'
-                generator.save(str(docker_compose_path))
-                show_status(page, "docker-compose.ymlを生成しました")
+                if generator.save(str(docker_compose_path)):
+                    show_status(page, "docker-compose.ymlを生成しました")
+                else:
+                    show_status(page, "docker-compose.ymlは最新です")
+                # requirements.txtの競合はdocker-compose.ymlを生成しなかった場合も表示する
+                conflicts = [c for c in generator.requirement_conflicts if c['definite']]
+                if conflicts:
+                    packages = ", ".join(f"{c['service']}/{c['venv']}: {c['package']}" for c in conflicts)
+                    show_status(page, f"requirements.txtのバージョン指定が競合しています: {packages}")
             
-            refresh_container_status(page, container_list)
+            refresh_container_status(page, container_list, supersede=True)
+
+            # コンテナの状態変化をDockerイベントとシグナルファイルの監視で受け取る
+            if 'services' in project_info and project_info['services']:
+                start_container_event_subscription(page, container_list)
+                start_signal_watch(page, container_list)
 
         except Exception as e:
             show_error_dialog(page, "エラー", f"セットアップに失敗しました: {str(e)}")
             return
 
-def refresh_container_status(page, container_list):
+def on_update_dockerfiles_click(page: ft.Page):
+    """選択中のビルドコンテキストのDockerfileをリモートの最新の内容に更新する"""
+    project_info_path = Path(docker_compose_dir) / 'project_info.json'
+    if not project_info_path.exists():
+        show_error_dialog(page, "エラー", "ビルドコンテキストが選択されていません")
+        return
+    try:
+        project_info = get_project_info_store(docker_compose_dir).load()
+        if not project_info.get('dockerfiles'):
+            show_status(page, "更新するDockerfileがありません")
+            return
+        show_status(page, "Dockerfileの更新を確認中...")
+        if update_dockerfiles(project_info, docker_compose_dir, page):
+            show_status(page, "Dockerfileの更新を確認しました（変更を反映するにはイメージを再ビルドしてください）")
+    except Exception as e:
+        show_error_dialog(page, "エラー", f"Dockerfileの更新に失敗しました: {str(e)}")
+
+def start_signal_watch(page: ft.Page, container_list: ft.Column):
+    """シグナルファイルの生成を監視し、起動が完了したコンテナのカードをすぐに更新する"""
+    global signal_listener
+    build_context = docker_compose_dir
+    watcher = get_signal_watcher(build_context)
+    if signal_listener is not None:
+        signal_listener[0].remove_listener(signal_listener[1])
+        signal_listener = None
+
+    def on_signal(service_name: str, app_name: str, ready: bool):
+        if not ready or docker_compose_dir != build_context:
+            return
+        container_name = f"{Path(build_context).name}-{service_name}-1"
+        if container_name in container_info_manager._containers_info:
+            update_apps_card(container_name, container_list, page, get_container_settings)
+
+    watcher.add_listener(on_signal)
+    signal_listener = (watcher, on_signal)
+
+def start_container_event_subscription(page: ft.Page, container_list: ft.Column):
+    """Dockerイベントを購読し、状態が変化したコンテナのカードのみを更新する
+
+    ビルドコンテキストごとに1つの購読を保持し、コンテキストが変わった場合は以前の購読を停止する。
+    """
+    global container_event_subscriber
+    if container_event_subscriber is not None:
+        container_event_subscriber.stop()
+        container_event_subscriber = None
+
+    build_context = docker_compose_dir
+
+    def on_event(container_name: str, action: str, event: Dict[str, Any]):
+        if docker_compose_dir != build_context:
+            return
+        try:
+            with card_update_lock:
+                if container_info_manager.refresh_container(container_name, build_context) is not None:
+                    update_apps_card(container_name, container_list, page, get_container_settings)
+        except DockerAPIUnavailable as e:
+            print(f"コンテナ情報の取得に失敗: {e}")
+
+    def on_resync():
+        # 再接続までに取りこぼしたイベントを補うため、全コンテナの情報を取得し直す
+        # （ユーザーの操作による更新と重ならないよう、refresh_flightを通して実行する）
+        if docker_compose_dir != build_context:
+            return
+        refresh_container_status(page, container_list)
+
+    subscriber = DockerEventSubscriber(compose_project_name(build_context), on_event, on_resync)
+    if subscriber.start():
+        container_event_subscriber = subscriber
+
+# 状態の更新処理は同時に1つだけ実行する
+refresh_flight = SingleFlight("refresh_container_status")
+
+def refresh_container_status(page, container_list, supersede: bool = False):
+    """コンテナの状態を取得し、カードの一覧を作り直す
+
+    更新処理の実行中に呼び出された場合は、実行中の処理の完了を待つ。
+    supersede=Trueの場合は実行中の処理を段階の区切りで打ち切り、新しく更新し直す。
+
+    Args:
+        page (ft.Page): ページオブジェクト
+        container_list (ft.Column): コンテナリスト
+        supersede (bool): 実行中の更新処理を置き換える場合はTrue
+    """
     global docker_compose_dir
     if not docker_compose_dir:
         show_status(page, "ビルドコンテキストが選択されていません。")
-        page.update()
+        request_update(page)
         return
 
+    try:
+        refresh_flight.run(
+            lambda token: _refresh_container_status(page, container_list, token),
+            supersede=supersede
+        )
+    except RefreshCancelled as e:
+        # 新しい更新処理が結果を表示するため、ここでは何もしない
+        print(e)
+
+def _refresh_container_status(page, container_list, token: RefreshToken):
     try:
         show_status(page, "情報を更新中...")
 
         settings = get_container_settings(docker_compose_dir, page)
         if not settings:
             return
-
-        container_list.controls.clear()
-
-        # デスクトップカードを先頭に追加
-        if 'desktop_apps' in settings:
-            desktop_card = create_apps_card("desktop", settings['desktop_apps'], page, container_list, get_container_settings)
-            container_list.controls.append(desktop_card)
-            update_apps_card("host_machine", container_list, page, get_container_settings)
-
-        # コンテナサービスが存在する場合のみコンテナ関連の処理を実行
-        if 'services' in settings and settings['services']:
-            parse_project_info(docker_compose_dir)
-            containers = container_info_manager.get_container_info(docker_compose_dir, page)
-
-            if containers:
-                for container in containers:
-                    container_card = create_apps_card("container", container, page, container_list, get_container_settings)
-                    container_list.controls.append(container_card)
-                    update_apps_card(container['name'], container_list, page, get_container_settings)
+        token.check()
+
+        # コンテナ情報の置き換えとカードの照合の間に、イベントによるカードの更新が割り込まないようにする
+        with card_update_lock:
+            containers = []
+            # コンテナサービスが存在する場合のみコンテナ関連の処理を実行
+            if 'services' in settings and settings['services']:
+                parse_project_info(docker_compose_dir)
+                token.check()
+                containers = container_info_manager.get_container_info(docker_compose_dir, page) or []
+                token.check()
+
+            # 表示中のカードはそのまま使い（展開状態やスクロール位置を保つ）、
+            # 追加されたコンテナのカードのみを作成し、なくなったコンテナのカードを取り除く
+            shown = {id(control) for control in container_list.controls}
+
+            def reuse_card(name):
+                view = card_views.get(name)
+                return view.card if view is not None and id(view.card) in shown else None
+
+            names = []
+            cards = []
+            # デスクトップカードを先頭に配置
+            if 'desktop_apps' in settings:
+                names.append("host_machine")
+                cards.append(reuse_card("host_machine")
+                             or create_apps_card("desktop", settings['desktop_apps'], page, container_list, get_container_settings))
+            for container in containers:
+                names.append(container['name'])
+                cards.append(reuse_card(container['name'])
+                             or create_apps_card("container", container, page, container_list, get_container_settings))
+
+            for name in list(card_views):
+                if name not in names:
+                    del card_views[name]
+            if [id(card) for card in cards] != [id(control) for control in container_list.controls]:
+                container_list.controls = cards
+
+            for name in names:
+                update_apps_card(name, container_list, page, get_container_settings)
 
         show_status(page, "情報を更新しました。")
-        page.update()
+        request_update(page)
 
+    except RefreshCancelled:
+        raise
     except Exception as e:
-        show_error_dialog(page, "エラー", f"情報の更新中にエラーが発生しました: {e}")
\ No newline at end of file
+        show_error_dialog(page, "エラー", f"情報の更新中にエラーが発生しました: {e}")
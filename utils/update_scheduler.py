@@ -0,0 +1,87 @@
+"""
+page.update()の呼び出しをまとめて行うスケジューラを提供するモジュール
+
+ステータス表示やカードの更新のたびにpage.update()を呼び出す代わりに、
+ページを更新待ちとして記録し、1フレーム（FRAME_INTERVAL秒）に1回だけ反映する。
+ダイアログの表示など、すぐに画面へ反映する必要がある場合はflush_update()を使う。
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+# 更新待ちのページを反映するまでの間隔（秒）
+FRAME_INTERVAL = 0.033
+
+class UpdateScheduler:
+    """page.update()を1フレームに1回にまとめるクラス
+
+    request_update()で記録されたページは、最初の要求からinterval秒後に
+    タイマースレッドからまとめて更新される。
+    """
+    def __init__(self, interval: float = FRAME_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._dirty: List[Any] = []
+        self._timer: Optional[threading.Timer] = None
+        self.requested = 0
+        self.flushed = 0
+
+    def request_update(self, page) -> None:
+        """ページを更新待ちとして記録する
+
+        Args:
+            page (ft.Page): 更新するページ。Noneの場合は何もしない
+        """
+        if page is None:
+            return
+        with self._lock:
+            self.requested += 1
+            if not any(dirty is page for dirty in self._dirty):
+                self._dirty.append(page)
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self, page=None) -> None:
+        """更新待ちのページをすぐに反映する
+
+        Args:
+            page (ft.Page): 更新待ちでなくても必ず更新するページ（省略可）
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pages = self._dirty
+            self._dirty = []
+        if page is not None and not any(dirty is page for dirty in pages):
+            pages.append(page)
+
+        for dirty in pages:
+            try:
+                dirty.update()
+            except Exception as e:
+                print(f"画面の更新中にエラーが発生: {e}")
+        if pages:
+            with self._lock:
+                self.flushed += len(pages)
+
+    def get_stats(self) -> Dict[str, int]:
+        """要求された更新回数と実際に反映した回数を取得する"""
+        with self._lock:
+            return {'requested': self.requested, 'flushed': self.flushed}
+
+# シングルトンインスタンス
+update_scheduler = UpdateScheduler()
+
+def request_update(page) -> None:
+    """ページを更新待ちとして記録する（次のフレームでまとめて反映される）"""
+    update_scheduler.request_update(page)
+
+def flush_update(page=None) -> None:
+    """更新待ちのページと指定したページをすぐに反映する"""
+    update_scheduler.flush(page)
+
+def get_update_stats() -> Dict[str, int]:
+    """要求された更新回数と実際に反映した回数を取得する（比がpage.update()をまとめた割合になる）"""
+    return update_scheduler.get_stats()
@@ -0,0 +1,202 @@
+"""
+コンテナの仮想環境にインストールするパッケージのホイールをホスト側に作成して保持するモジュール
+
+仮想環境ごとに ~/.cache/mochimaki/wheels/<ハッシュ> にホイールを作成し、
+docker-compose.ymlでコンテナの /opt/wheelhouse に読み取り専用でマウントする。
+ハッシュはコンテナ内で仮想環境を作り直すかどうかの判定に使うハッシュと同じく、
+Pythonのバージョンとrequirements.txtの内容から求めるため、コンテナ側はハッシュから
+ホイールのディレクトリを特定し、pip install --no-index --find-linksでネットワークを使わずにインストールする。
+ホイールがまだ作成されていない場合、コンテナ側はパッケージインデックスからインストールする。
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from .file_utils import get_cache_path
+
+# ホイールを使用しない場合は0を設定する
+WHEELHOUSE_ENV = 'MOCHIMAKI_WHEELHOUSE'
+# コンテナ内でホイールのディレクトリをマウントする場所
+CONTAINER_WHEELHOUSE_DIR = '/opt/wheelhouse'
+# ホイールの作成が完了したことを表すファイル（ホイールのディレクトリの中に作成）
+COMPLETE_MARKER = '.complete'
+# ホイールの作成を打ち切るまでの時間（秒）。打ち切った場合はコンテナがパッケージインデックスからインストールする
+BUILD_TIMEOUT = 600
+
+def is_wheelhouse_enabled() -> bool:
+    """ホイールを使用するかどうか"""
+    return os.environ.get(WHEELHOUSE_ENV, '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+def get_wheelhouse_root() -> Path:
+    """ホイールのディレクトリを置くディレクトリのパスを取得する（作成はWheelhouseBuilder.ensure()で行う）"""
+    return get_cache_path('wheels')
+
+def requirements_hash(python_version: str, requirement_files: List[Path]) -> str:
+    """Pythonのバージョンとrequirements.txtの内容からハッシュを求める
+
+    コンテナ内の「{ echo ${FULL_VERSION}; cat <requirements.txt>...; } | sha256sum」と同じ値になる。
+    """
+    digest = hashlib.sha256(f"{python_version}\n".encode('utf-8'))
+    for path in requirement_files:
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+class WheelhouseBuilder:
+    """イメージのpipでホイールを作成するクラス
+
+    同じハッシュへの操作はロックで直列化する（異なるハッシュは並行して処理できる）。
+    """
+    def __init__(self):
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._python_versions: Dict[str, str] = {}
+
+    def _get_lock(self, key: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get_python_version(self, image: str) -> Optional[str]:
+        """イメージのPythonのバージョン（例: 3.11.4）を取得する
+
+        Returns:
+            Optional[str]: バージョン。イメージがない場合やPythonを実行できない場合はNone
+        """
+        image_id = self._image_id(image)
+        if image_id is None:
+            return None
+        version = self._python_versions.get(image_id)
+        if version is not None:
+            return version
+        try:
+            result = subprocess.run(
+                ['docker', 'run', '--rm', '--entrypoint', 'python3', image, '--version'],
+                capture_output=True, text=True, check=True
+            )
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"{image}のPythonのバージョンを取得できませんでした: {getattr(e, 'stderr', '') or e}")
+            return None
+        # python3 --versionの出力は「Python 3.11.4」
+        version = (result.stdout or result.stderr).strip()
+        if version.startswith('Python '):
+            version = version[len('Python '):]
+        self._python_versions[image_id] = version
+        return version
+
+    def _image_id(self, image: str) -> Optional[str]:
+        try:
+            result = subprocess.run(['docker', 'image', 'inspect', '--format', '{{.Id}}', image],
+                                    capture_output=True, text=True, check=True)
+        except (subprocess.CalledProcessError, OSError):
+            return None
+        return result.stdout.strip() or None
+
+    def ensure_root(self) -> Path:
+        """ホイールのディレクトリを置くディレクトリを作成する
+
+        docker-composeがマウント元を作成すると所有者がrootになり、ホイールを作成できなくなるため、
+        コンテナを起動する前に呼び出す。
+        """
+        root = get_wheelhouse_root()
+        root.mkdir(parents=True, exist_ok=True)
+        return root
+
+    def ensure(self, image: str, program_dirs: List[Path],
+               on_build: Optional[Callable[[], None]] = None,
+               on_progress: Optional[Callable[[str], None]] = None,
+               timeout: float = BUILD_TIMEOUT) -> Optional[Path]:
+        """仮想環境1つ分のホイールを作成する（作成済みの場合は何もしない）
+
+        Args:
+            image (str): サービスのイメージ名
+            program_dirs (List[Path]): 仮想環境を使用するアプリケーションのプログラムのディレクトリ（ホスト側）。
+                各ディレクトリのrequirements.txtをコンテナ内と同じ順序で指定する
+            on_build: ホイールの作成を開始する前に呼び出す関数
+            on_progress: pipが処理中のパッケージ（「Collecting numpy」など）を受け取る関数
+            timeout (float): 作成を打ち切るまでの時間（秒）
+
+        Returns:
+            Optional[Path]: ホイールのディレクトリ。イメージがない場合や作成に失敗した場合、
+                時間内に作成できなかった場合はNone
+        """
+        self.ensure_root()
+        requirement_files = [Path(program_dir) / 'requirements.txt' for program_dir in program_dirs]
+        if not all(path.exists() for path in requirement_files):
+            return None
+        python_version = self.get_python_version(image)
+        if python_version is None:
+            return None
+
+        key = requirements_hash(python_version, requirement_files)
+        wheelhouse = get_wheelhouse_root() / key
+        with self._get_lock(key):
+            if (wheelhouse / COMPLETE_MARKER).exists():
+                return wheelhouse
+            if on_build is not None:
+                on_build()
+
+            # 作成途中のホイールをコンテナが使わないよう、一時ディレクトリに作成してから名前を変更する
+            temp = wheelhouse.with_name(f"{key}.tmp-{os.getpid()}-{threading.get_ident()}")
+            shutil.rmtree(wheelhouse, ignore_errors=True)
+            temp.mkdir(parents=True)
+            container_name = f"mochimaki-wheelhouse-{key[:12]}-{os.getpid()}"
+            cmd = ['docker', 'run', '--rm', '--name', container_name, '-e', 'HOME=/tmp', '-v', f"{temp}:/wheels"]
+            if hasattr(os, 'getuid'):
+                # 作成されるファイルの所有者をホストのユーザーにする
+                cmd += ['--user', f"{os.getuid()}:{os.getgid()}"]
+            requirement_args = []
+            for index, program_dir in enumerate(program_dirs):
+                # requirements.txtの中の-r（相対パス）を解決できるようディレクトリごとマウントする
+                cmd += ['-v', f"{Path(program_dir).resolve()}:/src/{index}:ro"]
+                requirement_args += ['-r', f"/src/{index}/requirements.txt"]
+            cmd += ['--entrypoint', 'python3', image, '-m', 'pip', 'wheel', '--no-cache-dir',
+                    '--wheel-dir', '/wheels'] + requirement_args
+            try:
+                self._run_pip_wheel(cmd, container_name, on_progress, timeout)
+                (temp / COMPLETE_MARKER).write_text(f"{python_version}\n", encoding='utf-8')
+                os.replace(temp, wheelhouse)
+                return wheelhouse
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"ホイールの作成に失敗しました: {image}: {getattr(e, 'stderr', '') or e}")
+                shutil.rmtree(temp, ignore_errors=True)
+                return None
+
+    def _run_pip_wheel(self, cmd: List[str], container_name: str, on_progress: Optional[Callable[[str], None]],
+                       timeout: float) -> None:
+        """pip wheelを実行し、処理中のパッケージをon_progressで通知する
+
+        Raises:
+            subprocess.CalledProcessError: pipが失敗した場合や時間内に終わらなかった場合（stderrに出力を格納する）
+        """
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            # dockerコマンドを終了してもコンテナは止まらないため、コンテナも停止する
+            subprocess.run(['docker', 'kill', container_name], capture_output=True)
+            process.kill()
+        killer = threading.Timer(timeout, kill)
+        killer.daemon = True
+        killer.start()
+        output = []
+        try:
+            for line in process.stdout:
+                line = line.strip()
+                if not line:
+                    continue
+                output.append(line)
+                if on_progress is not None and line.startswith(('Collecting ', 'Building wheel for ', 'Saved ')):
+                    on_progress(line)
+            returncode = process.wait()
+        finally:
+            killer.cancel()
+        if returncode != 0:
+            if timed_out.is_set():
+                output.append(f"{timeout:.0f}秒以内に完了しなかったため打ち切りました")
+            raise subprocess.CalledProcessError(returncode, cmd, stderr='\n'.join(output[-20:]))
+
+# シングルトンインスタンス
+wheelhouse_builder = WheelhouseBuilder()